@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from agents import provenance
+from agents.bulk_verify import BulkVerifier, main
+
+
+@pytest.fixture
+def key_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "prov.pem")
+    monkeypatch.setattr(provenance, "_managers", {})
+    monkeypatch.setattr(provenance, "KEY_PATH", path)
+    return path
+
+
+def _pairs(n):
+    keys = provenance.get_key_manager()
+    pairs = []
+    for i in range(n):
+        h = f"{i:064x}"
+        pairs.append((h, keys.sign(bytes.fromhex(h)).hex()))
+    return pairs
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_results_are_in_order_and_bad_pairs_fail(key_path, workers):
+    pairs = _pairs(20)
+    pairs[3] = (pairs[3][0], pairs[4][1])  # signature of another hash
+    pairs[7] = (pairs[7][0], "zz")
+    v = BulkVerifier(workers=workers, chunk_size=4, key_path=key_path)
+    try:
+        results = v.verify_all(pairs)
+    finally:
+        v.shutdown()
+    assert results == [i not in (3, 7) for i in range(20)]
+
+
+def test_repeat_audit_is_served_from_cache(key_path):
+    pairs = _pairs(10)
+    v = BulkVerifier(workers=1, chunk_size=3, key_path=key_path)
+    assert all(v.verify_all(pairs))
+    assert all(v.verify_all(pairs))
+    assert v.stats()["verified"] == 10 and v.stats()["cache_hits"] == 10
+
+
+def test_aggregate_items_and_missing_key(key_path, tmp_path):
+    hashes = [f"{i:064x}" for i in range(3)]
+    signed = provenance.sign_batch_hex(hashes)
+    items = [{"content_hash": h, "signature": signed["signature"], "merkle_root": signed["root"], "proof": p} for h, p in zip(hashes, signed["proofs"])]
+    items.append({**items[0], "proof": signed["proofs"][1]})
+    assert BulkVerifier(workers=1, key_path=key_path).verify_all(items) == [True, True, True, False]
+    no_key = BulkVerifier(workers=1, key_path=str(tmp_path / "none.pem"))
+    assert no_key.verify_all(items) == [False] * 4
+
+
+def test_cli_streams_json_lines(key_path, tmp_path, capsys):
+    pairs = _pairs(3)
+    src = tmp_path / "pairs.jsonl"
+    src.write_text("\n".join(json.dumps({"content_hash": h, "signature": s}) for h, s in pairs) + "\n" + json.dumps([pairs[0][0], "00"]) + "\n")
+    assert main([str(src), "--workers", "1", "--key", key_path]) == 1
+    out = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [o["ok"] for o in out] == [True, True, True, False]
+    assert out[0]["content_hash"] == pairs[0][0]
+
+
+def test_verify_batch_endpoint(key_path):
+    from fastapi.testclient import TestClient
+    from agents import bulk_verify, provenance_server
+
+    bulk_verify._verifier = BulkVerifier(workers=1)
+    pairs = _pairs(4)
+    items = [{"content_hash": h, "signature": s} for h, s in pairs] + [{"content_hash": pairs[0][0], "signature": pairs[1][1]}]
+    res = TestClient(provenance_server.app).post("/verify/batch", json={"items": items}).json()
+    assert res == {"results": [True, True, True, True, False], "failed": 1}
+    bulk_verify._verifier = None
+
+
+def test_shared_verifier_survives_rotation_and_concurrent_eviction(key_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    pairs = _pairs(20)
+    v = BulkVerifier(workers=2, chunk_size=2, cache_size=5, key_path=key_path)
+    try:
+        stream = v.verify_many(pairs)
+        assert next(stream) is True
+        # a key rotation swaps the pool while the stream above still holds it
+        pool, _ = v._acquire(v._keys.keyring.pems(), "rotated")
+        v._release(pool)
+        assert all(stream)
+        with ThreadPoolExecutor(max_workers=4) as ex:
+            results = list(ex.map(lambda _: v.verify_all(pairs), range(4)))
+        assert results == [[True] * 20] * 4
+        assert len(v.cache) == 5
+    finally:
+        v.shutdown()
@@ -0,0 +1,182 @@
+import os
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from agents import provenance
+from agents.provenance import KeyManager
+
+HASH = "ab" * 32
+
+
+def _write_key(path):
+    priv = ec.generate_private_key(ec.SECP256R1())
+    path.write_bytes(priv.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+
+
+def test_key_is_parsed_once_across_signs_and_verifies(tmp_path):
+    keys = KeyManager(str(tmp_path / "prov.pem"), check_interval=0)
+    sigs = [keys.sign(bytes.fromhex(HASH)) for _ in range(5)]
+    assert all(keys.verify(bytes.fromhex(HASH), s) for s in sigs)
+    assert b"BEGIN PUBLIC KEY" in keys.public_pem()
+    assert keys.loads == 1  # generated once, never re-read while unchanged
+
+
+def test_key_reloads_when_file_changes(tmp_path):
+    path = tmp_path / "prov.pem"
+    _write_key(path)
+    keys = KeyManager(str(path), check_interval=0)
+    pem, etag = keys.public_pem(), keys.etag()
+    _write_key(path)
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert keys.public_pem() != pem and keys.etag() != etag
+    assert keys.loads == 2
+
+
+def test_verify_without_key_file_is_false(tmp_path):
+    keys = KeyManager(str(tmp_path / "missing.pem"), check_interval=0)
+    assert keys.verify(b"x", b"y") is False
+    assert keys.public_pem() is None
+    assert not (tmp_path / "missing.pem").exists()
+
+
+def test_pubkey_endpoint_serves_etag_and_304(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from agents import provenance_server
+
+    monkeypatch.setattr(provenance, "_managers", {})
+    monkeypatch.setattr(provenance, "KEY_PATH", str(tmp_path / "prov.pem"))
+    client = TestClient(provenance_server.app)
+    assert client.get("/pubkey").status_code == 404
+
+    sig = client.post("/sign", json={"content_hash": HASH}).json()["signature"]
+    assert client.post("/verify", json={"content_hash": HASH, "signature": sig}).json() == {"ok": True}
+    first = client.get("/pubkey")
+    assert first.status_code == 200 and "BEGIN PUBLIC KEY" in first.json()["pubkey_pem"]
+    assert first.json()["algorithm"] == "ecdsa-p256" and len(first.json()["key_id"]) == 8
+    etag = first.headers["etag"]
+    again = client.get("/pubkey", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.headers["etag"] == etag
+
+
+def test_sign_batch_aggregate_and_individual(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from agents import provenance_server
+
+    monkeypatch.setattr(provenance, "_managers", {})
+    monkeypatch.setattr(provenance, "KEY_PATH", str(tmp_path / "prov.pem"))
+    client = TestClient(provenance_server.app)
+    hashes = [f"{i:064x}" for i in range(5)]
+
+    agg = client.post("/sign/batch", json={"content_hashes": hashes}).json()
+    assert len(agg["proofs"]) == 5
+    for h, proof in zip(hashes, agg["proofs"]):
+        body = {"content_hash": h, "signature": agg["signature"], "merkle_root": agg["root"], "proof": proof}
+        assert client.post("/verify", json=body).json() == {"ok": True}
+    forged = {"content_hash": hashes[0], "signature": agg["signature"], "merkle_root": agg["root"], "proof": agg["proofs"][1]}
+    assert client.post("/verify", json=forged).json() == {"ok": False}
+
+    ind = client.post("/sign/batch", json={"content_hashes": hashes, "mode": "individual"}).json()
+    assert all(provenance.verify_hex(h, s) for h, s in zip(hashes, ind["signatures"]))
+    assert client.post("/sign/batch", json={"content_hashes": ["zz"]}).status_code == 400
+
+
+def test_publish_pubkey_sends_three_candid_text_args(tmp_path, monkeypatch):
+    import types
+    from fastapi.testclient import TestClient
+    from agents import provenance_server
+
+    monkeypatch.setattr(provenance, "_managers", {})
+    monkeypatch.setattr(provenance, "KEY_PATH", str(tmp_path / "prov.pem"))
+    monkeypatch.setenv("ICP_REPLICA_URL", "http://replica.local")
+    monkeypatch.setenv("CANISTER_ID", "aaaaa-aa")
+    monkeypatch.delenv("STORAGE_AGENT_KEY_PATH", raising=False)
+    monkeypatch.setattr(provenance_server, "Client", object)
+    monkeypatch.setattr(provenance_server, "Types", types.SimpleNamespace(Text="text"))
+    monkeypatch.setattr(provenance_server, "encode", lambda params: params)
+    calls = []
+    manager = types.SimpleNamespace(update_sync=lambda *a: calls.append(a) or "ok")
+    monkeypatch.setattr(provenance_server, "get_icp_manager", lambda: manager)
+
+    client = TestClient(provenance_server.app)
+    client.post("/sign", json={"content_hash": HASH})  # creates the key
+    body = client.post("/publish_pubkey").json()
+    keys = provenance.get_key_manager()
+    assert body == {"ok": True, "algorithm": "ecdsa-p256", "key_id": keys.key_id(), "result": "ok"}
+    (call,) = calls
+    assert call[:4] == ("http://replica.local", None, "aaaaa-aa", "set_signing_key")
+    assert call[4] == [
+        {"type": "text", "value": keys.public_pem().decode()},
+        {"type": "text", "value": "ecdsa-p256"},
+        {"type": "text", "value": keys.key_id()},
+    ]
+
+
+def test_ed25519_signatures_are_tagged_and_fixed_size(tmp_path):
+    keys = KeyManager(str(tmp_path / "ed.pem"), check_interval=0, algorithm="ed25519")
+    sig = keys.sign(bytes.fromhex(HASH))
+    assert keys.active_algorithm() == "ed25519"
+    assert sig[0] == 0x02 and sig[1:5].hex() == keys.key_id() and len(sig) == 1 + 4 + 64
+    assert keys.verify(bytes.fromhex(HASH), sig)
+    assert not keys.verify(bytes.fromhex(HASH), sig[:-1] + bytes([sig[-1] ^ 1]))
+
+
+def test_untagged_legacy_ecdsa_signature_still_verifies(tmp_path):
+    from cryptography.hazmat.primitives import hashes
+
+    path = tmp_path / "prov.pem"
+    _write_key(path)
+    keys = KeyManager(str(path), check_interval=0)
+    legacy = keys.private_key().sign(bytes.fromhex(HASH), ec.ECDSA(hashes.SHA256()))
+    assert legacy[0] == 0x30
+    assert keys.verify(bytes.fromhex(HASH), legacy)
+
+
+def test_old_signatures_verify_after_switching_algorithm(tmp_path):
+    old_path = tmp_path / "old.pem"
+    old = KeyManager(str(old_path), check_interval=0)
+    old_sig = old.sign(bytes.fromhex(HASH))
+
+    new = KeyManager(str(tmp_path / "new.pem"), check_interval=0, algorithm="ed25519", verify_paths=[str(old_path)])
+    new_sig = new.sign(bytes.fromhex(HASH))
+    assert new.verify(bytes.fromhex(HASH), old_sig) and new.verify(bytes.fromhex(HASH), new_sig)
+    # a key that is neither active nor listed does not verify
+    assert not KeyManager(str(tmp_path / "other.pem"), check_interval=0, verify_paths=[]).verify(bytes.fromhex(HASH), old_sig)
+
+
+def test_anchor_endpoint_runs_in_process(tmp_path, monkeypatch):
+    import json as _json
+    from fastapi.testclient import TestClient
+    from agents import anchoring, provenance_server
+
+    monkeypatch.delenv("ICP_REPLICA_URL", raising=False)
+    monkeypatch.delenv("ICP_NETWORK_URL", raising=False)
+    path = tmp_path / "hashes.json"
+    path.write_text(_json.dumps([HASH, "cd" * 32, "ef" * 32]))
+    monkeypatch.setattr(anchoring, "_service", anchoring.AnchorService(str(path)))
+    client = TestClient(provenance_server.app)
+
+    res = client.post("/anchor", json={"batch_id": "b-1"}).json()
+    assert res["root"] == anchoring.merkle.root([HASH, "cd" * 32, "ef" * 32])
+    assert res["leaf_count"] == 3 and res["batch_id"] == "b-1" and res["canister"]["called"] is False
+    assert client.post("/anchor").json()["cached"] is True
+
+    path.write_text("[1]")
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 1_000_000))
+    assert client.post("/anchor").status_code == 400
+    path.unlink()
+    assert client.post("/anchor").status_code == 404
+
+
+def test_key_file_of_another_algorithm_is_rejected(tmp_path):
+    import pytest
+
+    path = tmp_path / "prov.pem"
+    _write_key(path)  # ECDSA
+    keys = KeyManager(str(path), check_interval=0, algorithm="ed25519")
+    with pytest.raises(ValueError, match="ecdsa-p256"):
+        keys.sign(bytes.fromhex(HASH))
+    assert provenance.default_key_path("ed25519") != provenance.default_key_path("ecdsa-p256")
+    with pytest.raises(TypeError):
+        provenance.Signer()
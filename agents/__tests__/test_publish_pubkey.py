@@ -12,3 +12,16 @@ def test_derive_public_pem_returns_public_key(tmp_path):
     pub = derive_public_pem(key_path)
     assert "BEGIN PUBLIC KEY" in pub
     assert "BEGIN PRIVATE KEY" not in pub
+
+
+def test_key_metadata_reports_algorithm_and_key_id(tmp_path):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519
+    from agents.publish_pubkey import key_metadata
+
+    key_path = tmp_path / "ed.pem"
+    priv = ed25519.Ed25519PrivateKey.generate()
+    key_path.write_bytes(priv.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    algorithm, key_id = key_metadata(key_path)
+    assert algorithm == "ed25519" and len(key_id) == 8
+    assert key_metadata(tmp_path / "missing.pem") == (None, None)
@@ -0,0 +1,208 @@
+"""In-process anchoring: Merkle root over stored content hashes, optionally
+anchored on the canister with `anchor_root(root, batch_id)`.
+
+Used by `provenance_server` (POST /anchor), `icp_canister/anchor_job.py`
+(thin CLI wrapper) and `icp_canister/agent_anchor_poc.py`, instead of each
+spawning a Python subprocess. The hashes file is parsed once and its root
+cached until the file's (mtime, size) changes, so anchoring an unchanged
+file costs no JSON parse or Merkle recomputation. All work runs on one
+dedicated thread; async callers use `anchor_async()` so the event loop is
+never blocked by hashing or the canister call. After a successful canister
+call the anchored entries in the local entry store (entry_store.py) are
+tagged with the batch id, so /history shows which batch anchored each entry.
+
+Result (JSON-serializable):
+  {"ok", "root", "leaf_count", "batch_id", "source", "cached",
+   "timings": {"load_ms", "merkle_ms", "canister_ms", "total_ms"},
+   "canister": {"called": bool, "ok": bool, "result" | "error" | "reason"},
+   "tagged": entries tagged with the batch id}
+
+Configuration (env):
+- ANCHOR_HASHES_PATH: JSON array of hex SHA-256 hashes
+  (default icp_canister/data/hashes.json)
+- ICP_REPLICA_URL / ICP_NETWORK_URL, CANISTER_ID: canister to anchor on;
+  without them only the root is computed
+- STORAGE_AGENT_KEY_PATH: ic-py identity PEM (anonymous if unset)
+- ANCHOR_TAG_ENTRIES: tag anchored entries in the entry store (default 1)
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    from . import merkle
+    from .entry_store import get_entry_store
+    from .icp_connection import get_icp_manager
+except ImportError:
+    import merkle
+    from entry_store import get_entry_store
+    from icp_connection import get_icp_manager
+
+logger = logging.getLogger("anchoring")
+
+ANCHOR_HASHES_PATH = os.getenv(
+    "ANCHOR_HASHES_PATH",
+    str(Path(__file__).resolve().parent.parent / "icp_canister" / "data" / "hashes.json"),
+)
+ANCHOR_TAG_ENTRIES = os.getenv("ANCHOR_TAG_ENTRIES", "1").lower() not in ("0", "false", "no")
+
+
+class AnchorError(ValueError):
+    """Raised for a hashes file that is not a JSON array of 32-byte hex hashes."""
+
+
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+def default_batch_id(root: str) -> str:
+    return datetime.now(timezone.utc).strftime("batch-%Y%m%dT%H%M%SZ-") + root[:8]
+
+
+def _validate(hashes) -> list[str]:
+    if not isinstance(hashes, list):
+        raise AnchorError("hashes must be a JSON array of hex strings")
+    out = []
+    for i, h in enumerate(hashes):
+        if not isinstance(h, str) or len(h) != 64:
+            raise AnchorError(f"hash #{i} is not a 32-byte hex string")
+        out.append(h.lower())
+    return out
+
+
+class AnchorService:
+    def __init__(self, hashes_path: str = ANCHOR_HASHES_PATH, tag_entries: bool = ANCHOR_TAG_ENTRIES):
+        self.hashes_path = hashes_path
+        self.tag_entries = tag_entries
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="anchor")
+        self._lock = threading.Lock()
+        # path -> ((mtime_ns, size), hashes, root)
+        self._cache: dict[str, tuple[tuple[int, int], list[str], str]] = {}
+        self.anchors = 0
+        self.cache_hits = 0
+
+    def _root_for_file(self, path: str) -> tuple[list[str], str, bool, float, float]:
+        """Return (hashes, root, cached, load_ms, merkle_ms) for a hashes file."""
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            self.cache_hits += 1
+            return cached[1], cached[2], True, 0.0, 0.0
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            try:
+                hashes = _validate(json.loads(f.read()))
+            except json.JSONDecodeError as e:
+                raise AnchorError(f"hashes file is not valid JSON: {e}") from None
+        load_ms = _ms(start)
+        start = time.perf_counter()
+        root = merkle.root(hashes) if hashes else None
+        merkle_ms = _ms(start)
+        self._cache[path] = (stamp, hashes, root)
+        return hashes, root, False, load_ms, merkle_ms
+
+    def _publish(self, root: str, batch_id: str) -> dict:
+        replica = os.environ.get("ICP_REPLICA_URL") or os.environ.get("ICP_NETWORK_URL")
+        canister = os.environ.get("CANISTER_ID")
+        if not (replica and canister):
+            return {"called": False, "ok": True, "reason": "ICP not configured"}
+        try:
+            from ic.candid import encode, Types
+        except Exception as e:
+            return {"called": False, "ok": True, "reason": f"ic-py not available: {e}"}
+        identity_path = os.environ.get("STORAGE_AGENT_KEY_PATH")
+        # the connection manager falls back to an anonymous identity
+        if not (identity_path and Path(identity_path).exists()):
+            identity_path = None
+        # Candid encode: two text params (root, batch_id)
+        args = encode([
+            {"type": Types.Text, "value": root},
+            {"type": Types.Text, "value": batch_id},
+        ])
+        try:
+            res = get_icp_manager().update_sync(replica, identity_path, canister, "anchor_root", args)
+            return {"called": True, "ok": True, "result": res}
+        except Exception as e:
+            logger.exception("anchor_root call failed for batch %s", batch_id)
+            return {"called": True, "ok": False, "error": str(e)}
+
+    def anchor(
+        self,
+        path: str | None = None,
+        hashes: list[str] | None = None,
+        batch_id: str | None = None,
+        publish: bool = True,
+    ) -> dict:
+        """Compute the Merkle root of `hashes` (or of the hashes file) and anchor it.
+
+        Raises FileNotFoundError for a missing file and AnchorError for bad input.
+        """
+        total = time.perf_counter()
+        with self._lock:
+            if hashes is not None:
+                start = time.perf_counter()
+                hashes = _validate(hashes)
+                load_ms = _ms(start)
+                start = time.perf_counter()
+                root, cached = merkle.root(hashes) if hashes else None, False
+                merkle_ms = _ms(start)
+                source = "request"
+            else:
+                source = path or self.hashes_path
+                hashes, root, cached, load_ms, merkle_ms = self._root_for_file(source)
+        result = {
+            "ok": True,
+            "root": root,
+            "leaf_count": len(hashes),
+            "batch_id": None,
+            "source": source,
+            "cached": cached,
+            "timings": {"load_ms": load_ms, "merkle_ms": merkle_ms, "canister_ms": 0.0},
+            "canister": {"called": False, "ok": True, "reason": "no hashes to anchor" if root is None else "publish disabled"},
+            "tagged": 0,
+        }
+        if root is not None:
+            result["batch_id"] = batch_id or default_batch_id(root)
+            if publish:
+                start = time.perf_counter()
+                result["canister"] = self._publish(root, result["batch_id"])
+                result["timings"]["canister_ms"] = _ms(start)
+                result["ok"] = result["canister"]["ok"]
+                if result["canister"]["called"] and result["ok"] and self.tag_entries:
+                    result["tagged"] = self._tag_entries(hashes, result["batch_id"])
+        result["timings"]["total_ms"] = _ms(total)
+        self.anchors += 1
+        return result
+
+    def _tag_entries(self, hashes: list[str], batch_id: str) -> int:
+        try:
+            return get_entry_store().set_anchor_batch(hashes, batch_id)
+        except Exception:
+            # the root is anchored either way; only the local mirror lags
+            logger.exception("Failed to tag anchored entries with batch %s", batch_id)
+            return 0
+
+    async def anchor_async(self, **kwargs) -> dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._io, lambda: self.anchor(**kwargs))
+
+    def stats(self) -> dict:
+        return {"anchors": self.anchors, "cache_hits": self.cache_hits, "cached_files": len(self._cache)}
+
+
+_service: AnchorService | None = None
+
+
+def get_anchor_service() -> AnchorService:
+    """Return the process-wide service for ANCHOR_HASHES_PATH."""
+    global _service
+    if _service is None:
+        _service = AnchorService()
+    return _service
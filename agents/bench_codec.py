@@ -0,0 +1,67 @@
+"""Benchmark for the compact entry record format against the legacy JSON payload.
+
+Encodes and decodes synthetic chat entries (short and long answers) with a
+real SHA-256 hash and a DER-sized signature, and reports bytes per entry and
+microseconds per encode/decode for JSON and for entry_codec with each
+available compression.
+
+Usage:
+  PYTHONPATH=agents python agents/bench_codec.py --entries 20000
+"""
+import argparse
+import hashlib
+import json
+import random
+import time
+
+import entry_codec
+from entry_codec import decode_record, encode_record
+
+WORDS = ["harga", "bitcoin", "ethereum", "solana", "berita", "kabar", "pasar", "naik", "turun", "usd", "idr", "hari", "ini"]
+
+
+def _entries(n: int, words: int) -> list[tuple[str, str, str]]:
+    rnd = random.Random(7)
+    out = []
+    for i in range(n):
+        text = f"Q: harga {rnd.choice(WORDS)}? A: " + " ".join(rnd.choice(WORDS) for _ in range(words))
+        h = hashlib.sha256(text.encode()).hexdigest()
+        sig = "3045022100" + rnd.randbytes(32).hex() + "0220" + rnd.randbytes(32).hex()
+        out.append((text, h, sig))
+    return out
+
+
+def _json_encode(entry, h, sig):
+    return json.dumps({"entry": entry, "content_hash": h, "signature": sig}).encode()
+
+
+def _run(name, encode, decode, rows):
+    start = time.perf_counter()
+    blobs = [encode(*r) for r in rows]
+    enc = time.perf_counter() - start
+    start = time.perf_counter()
+    for b in blobs:
+        decode(b)
+    dec = time.perf_counter() - start
+    n = len(rows)
+    size = sum(len(b) for b in blobs) / n
+    print(f"{name:<22} {size:8.1f} B/entry  encode {enc / n * 1e6:6.2f} us  decode {dec / n * 1e6:6.2f} us")
+    return size
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entries", type=int, default=20000)
+    args = ap.parse_args()
+    compressions = ["none", "zlib"] + (["zstd"] if entry_codec.zstandard is not None else [])
+    for label, words in (("short (12 words)", 12), ("long (200 words)", 200)):
+        rows = _entries(args.entries, words)
+        print(f"-- {label}")
+        base = _run("json", _json_encode, json.loads, rows)
+        for c in compressions:
+            size = _run(f"compact/{c}", lambda e, h, s, c=c: encode_record(e, h, s, compression=c), decode_record, rows)
+            print(f"{'':<22} {size / base:8.0%} of json")
+
+
+if __name__ == "__main__":
+    main()
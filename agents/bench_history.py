@@ -0,0 +1,66 @@
+"""Benchmark for the local entry mirror behind /history.
+
+Fills a temporary SQLite store with synthetic entries, then times the first
+page, a deep page (via its cursor), a full-text search and a time-bounded
+query. Keyset pagination and the FTS/ts indexes keep each query in the
+millisecond range regardless of store size.
+
+Usage:
+  PYTHONPATH=agents python agents/bench_history.py --entries 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from entry_store import EntryStore
+
+WORDS = ["harga", "bitcoin", "ethereum", "solana", "berita", "kabar", "pasar", "naik", "turun", "usd", "idr", "hari", "ini"]
+
+
+def _fill(store: EntryStore, n: int, chunk: int = 20000):
+    rnd = random.Random(7)
+    base = time.time() - n
+    for start in range(0, n, chunk):
+        rows = []
+        for i in range(start, min(n, start + chunk)):
+            text = "Q: " + " ".join(rnd.choice(WORDS) for _ in range(6)) + f" A: {i}"
+            rows.append({"entry_id": f"e{i}", "ts": base + i, "text": text, "content_hash": f"{i:064x}", "status": "stored"})
+        store.add_many(rows)
+
+
+def _ms(fn, rounds: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entries", type=int, default=200000)
+    ap.add_argument("--limit", type=int, default=50)
+    args = ap.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-history-"), "entries.db")
+    store = EntryStore(path)
+    t = time.perf_counter()
+    _fill(store, args.entries)
+    print(f"filled {store.count()} entries in {time.perf_counter() - t:.1f}s ({os.path.getsize(path) / 1e6:.0f} MB)")
+
+    deep_cursor = str(args.entries // 2)
+    mid_ts = time.time() - args.entries // 3
+    cases = {
+        "first page": lambda: store.query(limit=args.limit),
+        "deep page (cursor)": lambda: store.query(limit=args.limit, cursor=deep_cursor),
+        "search 'ethereum naik'": lambda: store.query(limit=args.limit, q="ethereum naik"),
+        "search + cursor": lambda: store.query(limit=args.limit, q="solana", cursor=deep_cursor),
+        "time window": lambda: store.query(limit=args.limit, since=mid_ts, until=mid_ts + 3600),
+    }
+    for name, fn in cases.items():
+        print(f"{name:<24} {_ms(fn):8.2f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Micro-benchmark for the intent/entity engine.
+
+Builds engines over synthetic alias tables of growing size and reports the
+per-query parse cost next to the naive `any(w in text ...)` scan it replaced.
+The automaton cost should stay flat while the naive scan grows linearly.
+
+Usage:
+  PYTHONPATH=agents python agents/bench_intents.py --sizes 4,100,1000,5000
+"""
+import argparse
+import time
+
+from intents import INTENT_KEYWORDS, IntentEngine
+from price_agent import SYMBOL_TO_ID
+
+QUERIES = [
+    "berapa harga bitcoin hari ini?",
+    "Harga BTC dan ETH sekarang",
+    "price of ethereum please",
+    "ada berita terbaru tentang eth?",
+    "apa kabar pasar kripto minggu ini",
+]
+
+
+def synthetic_aliases(n: int) -> dict:
+    aliases = dict(SYMBOL_TO_ID)
+    i = 0
+    while len(aliases) < n:
+        aliases[f"coin{i}x"] = f"coin-{i}"
+        aliases[f"token {i} classic"] = f"coin-{i}"
+        i += 1
+    return aliases
+
+
+def naive_parse(text: str, aliases: dict):
+    low = text.lower()
+    intents = [k for k, words in INTENT_KEYWORDS.items() if any(w in low for w in words)]
+    coins = [cid for alias, cid in aliases.items() if alias in low]
+    return intents, coins
+
+
+def _per_query_us(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for q in QUERIES:
+            fn(q)
+    return (time.perf_counter() - start) / (rounds * len(QUERIES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="4,100,1000,5000")
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'aliases':>8} {'build ms':>9} {'engine us/q':>12} {'naive us/q':>11}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        aliases = synthetic_aliases(n)
+        t0 = time.perf_counter()
+        engine = IntentEngine(INTENT_KEYWORDS, aliases)
+        build_ms = (time.perf_counter() - t0) * 1e3
+        engine_us = _per_query_us(engine.parse, args.rounds)
+        naive_us = _per_query_us(lambda q: naive_parse(q, aliases), max(1, args.rounds // 10))
+        print(f"{len(aliases):>8} {build_ms:>9.1f} {engine_us:>12.2f} {naive_us:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
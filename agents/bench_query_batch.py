@@ -0,0 +1,93 @@
+"""Throughput of POST /query/batch versus looping POST /query.
+
+Runs the orchestrator_simple app in-process over httpx's ASGI transport.
+CoinGecko is replaced by a stub with a fixed per-request latency and the
+storage transport by a no-op, so the numbers reflect orchestrator overhead
+plus the number of upstream round trips.
+
+Usage:
+  PYTHONPATH=agents python agents/bench_query_batch.py --texts 2000 --upstream-ms 30
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+import orchestrator_simple as orch
+import price_agent
+from coin_registry import get_registry
+from storage_transport import StorageTransport
+
+PHRASES = ["berapa harga {c}", "Harga {c}?", "price {c}", "harga {c} dan {d}", "berita {c}", "halo pluto"]
+
+
+class _NullTransport(StorageTransport):
+    name = "null"
+
+    async def send(self, message):
+        return True
+
+    async def send_many(self, messages):
+        return [True] * len(messages)
+
+
+def _texts(n: int) -> list[str]:
+    rng = random.Random(7)
+    coins = [c["symbol"] for c in get_registry().coins[:40]]
+    return [rng.choice(PHRASES).format(c=rng.choice(coins), d=rng.choice(coins)) for _ in range(n)]
+
+
+def _install_stubs(upstream_ms: float):
+    async def upstream(request):
+        await asyncio.sleep(upstream_ms / 1000)
+        ids = request.url.params["ids"].split(",")
+        return httpx.Response(200, json={i: {"usd": 1.0} for i in ids})
+
+    price_agent._client = price_agent.PriceClient(transport=httpx.MockTransport(upstream))
+    orch.storage_transport = _NullTransport()
+
+    async def no_news(topic):
+        return "no news"
+
+    orch.get_news_reply = no_news
+
+
+def _reset():
+    price_agent.price_cache.clear()
+    orch.reply_cache.clear()
+
+
+async def run(n: int, upstream_ms: float):
+    texts = _texts(n)
+    _install_stubs(upstream_ms)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=orch.app), base_url="http://bench") as client:
+        _reset()
+        t0 = time.perf_counter()
+        for t in texts:
+            await client.post("/query", json={"text": t})
+        loop_s = time.perf_counter() - t0
+
+        _reset()
+        t0 = time.perf_counter()
+        resp = await client.post("/query/batch", json={"texts": texts})
+        batch_s = time.perf_counter() - t0
+        await orch.storage_queue.drain()
+
+    print(f"texts={n} distinct={resp.json()['distinct']} upstream={upstream_ms}ms")
+    print(f"loop /query   {loop_s:8.3f}s {n / loop_s:10.0f} q/s")
+    print(f"/query/batch  {batch_s:8.3f}s {n / batch_s:10.0f} q/s")
+    print(f"speedup       {loop_s / batch_s:8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--upstream-ms", type=float, default=30)
+    args = parser.parse_args()
+    asyncio.run(run(args.texts, args.upstream_ms))
+
+
+if __name__ == "__main__":
+    main()
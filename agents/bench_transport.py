@@ -0,0 +1,128 @@
+"""Per-message overhead of storage transports.
+
+Starts a local keep-alive HTTP stub for /submit and /submit/batch, then
+compares the old per-request path (fresh `requests.post` connection, or
+re-importing storage_agent and redefining a Ctx per message) with the
+transports from `storage_transport` resolved once.
+
+Usage:
+  PYTHONPATH=agents python agents/bench_transport.py --messages 2000 --batch 100
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from storage_transport import HttpTransport, InProcessTransport
+from uamodels import StoreChat
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        n = len(body.get("messages") or [1])
+        out = json.dumps({"results": [{"ok": True}] * n}).encode()
+        self.send_response(202)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+async def _noop_handler(ctx, sender, msg):
+    return {"ok": True}
+
+
+_stub_storage = types.SimpleNamespace(handle_store_chat=_noop_handler)
+
+
+def legacy_http(url: str, msgs):
+    for m in msgs:
+        payload = {"destination": "storage_agent", "message": {"entry_id": m.entry_id, "entry": m.entry}, "sender": "bench"}
+        requests.post(url, json=payload, timeout=2)
+
+
+async def legacy_inprocess(msgs):
+    for m in msgs:
+        import sys
+        sa = sys.modules.get("bench_stub_storage", _stub_storage)
+
+        class Ctx:
+            def __init__(self):
+                import logging
+                self.logger = logging.getLogger("bench")
+
+            async def send(self, to, msg):
+                return True
+
+        await sa.handle_store_chat(Ctx(), "bench", m)
+
+
+async def transport_send(t, msgs):
+    for m in msgs:
+        await t.send(m)
+
+
+async def transport_batches(t, msgs, batch: int):
+    for i in range(0, len(msgs), batch):
+        await t.send_many(msgs[i:i + batch])
+
+
+def _report(label: str, n: int, seconds: float):
+    print(f"{label:<32} {seconds * 1e6 / n:>10.1f} us/msg {n / seconds:>10.0f} msg/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=100)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}/submit"
+    msgs = [StoreChat(entry_id=str(i), entry=f"Q: bench {i} -- A: ok") for i in range(args.messages)]
+
+    n_legacy = min(args.messages, 500)
+    t0 = time.perf_counter()
+    legacy_http(base, msgs[:n_legacy])
+    _report("http legacy (new connection)", n_legacy, time.perf_counter() - t0)
+
+    async def run_http():
+        t = HttpTransport(submit_url=base, batch_url=base + "/batch")
+        await t.send(msgs[0])  # warm the pool
+        t0 = time.perf_counter()
+        await transport_send(t, msgs)
+        _report("http transport (pooled)", len(msgs), time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        await transport_batches(t, msgs, args.batch)
+        _report(f"http transport (batch={args.batch})", len(msgs), time.perf_counter() - t0)
+        await t.aclose()
+
+    async def run_inprocess():
+        t0 = time.perf_counter()
+        await legacy_inprocess(msgs)
+        _report("inprocess legacy (per-call setup)", len(msgs), time.perf_counter() - t0)
+        t = InProcessTransport(module=_stub_storage)
+        t0 = time.perf_counter()
+        await transport_send(t, msgs)
+        _report("inprocess transport", len(msgs), time.perf_counter() - t0)
+
+    asyncio.run(run_http())
+    asyncio.run(run_inprocess())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
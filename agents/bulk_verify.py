@@ -0,0 +1,323 @@
+"""Bulk provenance signature verification across a process pool.
+
+Audits re-check millions of stored (content_hash, signature) pairs. ECDSA
+verification is CPU-bound, so `BulkVerifier` spreads it over worker
+processes (one per core by default), each holding the parsed keyring,
+and yields results in input order while only a bounded number of chunks are
+in flight. A bounded LRU of already-verified pairs, keyed by the keyring
+as well, lets repeat audits skip the ECDSA work entirely. One verifier can
+be shared by concurrent threads (the /verify/batch route runs on FastAPI's
+threadpool): the cache is locked, and a pool retired by a key rotation is
+shut down only once the streams still using it are done.
+
+Items are (content_hash, signature) tuples or dicts with "content_hash",
+"signature" and, for aggregate signatures, "merkle_root" and "proof".
+
+CLI (JSON lines in, JSON lines out):
+  python -m agents.bulk_verify [--workers N] pairs.jsonl > results.jsonl
+  python -m agents.bulk_verify --bench 20000   # verifications/sec per worker count
+
+Configuration (env):
+- VERIFY_WORKERS: worker processes (default: CPU count)
+- VERIFY_CHUNK: items per task sent to a worker (default 256)
+- VERIFY_CACHE_SIZE: verified pairs kept in the LRU (default 1000000)
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator
+
+import hashlib
+
+try:
+    from . import merkle
+    from .provenance import Keyring, get_key_manager, load_public_key
+except ImportError:
+    import merkle
+    from provenance import Keyring, get_key_manager, load_public_key
+
+VERIFY_WORKERS = int(os.environ.get("VERIFY_WORKERS", "0")) or os.cpu_count() or 1
+VERIFY_CHUNK = int(os.environ.get("VERIFY_CHUNK", "256"))
+VERIFY_CACHE_SIZE = int(os.environ.get("VERIFY_CACHE_SIZE", "1000000"))
+
+# per-worker-process keyring, set by _init_worker
+_keyring: Keyring | None = None
+
+
+def _build_keyring(pems: list[bytes]) -> Keyring:
+    keyring = Keyring()
+    for pem in pems:
+        keyring.add(load_public_key(pem))
+    return keyring
+
+
+def _init_worker(pems: list[bytes]):
+    global _keyring
+    _keyring = _build_keyring(pems)
+
+
+def _normalize(item) -> tuple:
+    if isinstance(item, dict):
+        proof = item.get("proof")
+        return (item.get("content_hash") or "", item.get("signature") or "", item.get("merkle_root"), json.dumps(proof) if proof else None)
+    content_hash, signature = item[0], item[1]
+    return (content_hash or "", signature or "", None, None)
+
+
+def _verify_one(item: tuple, keyring: Keyring) -> bool:
+    content_hash, signature, root, proof = item
+    try:
+        signed = content_hash
+        if root:
+            if not merkle.verify_proof(content_hash, json.loads(proof or "[]"), root):
+                return False
+            signed = root
+        return keyring.verify(bytes.fromhex(signed), bytes.fromhex(signature))
+    except Exception:
+        return False
+
+
+def _verify_chunk(items: list[tuple]) -> list[bool]:
+    return [_verify_one(i, _keyring) for i in items]
+
+
+class VerifyCache:
+    """Bounded LRU of (keyring etag, normalized item) -> verification result."""
+
+    def __init__(self, maxsize: int = VERIFY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[tuple, bool]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> bool | None:
+        with self._lock:
+            result = self._data.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: tuple, result: bool):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = result
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class BulkVerifier:
+    def __init__(
+        self,
+        workers: int = VERIFY_WORKERS,
+        chunk_size: int = VERIFY_CHUNK,
+        cache_size: int = VERIFY_CACHE_SIZE,
+        key_path: str | None = None,
+    ):
+        self.workers = max(1, workers)
+        self.chunk_size = max(1, chunk_size)
+        self.cache = VerifyCache(cache_size)
+        self._keys = get_key_manager(key_path)
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_etag: str | None = None
+        self._inline_keyring: Keyring | None = None
+        # guards the pool swap; pool -> number of verify_many streams using it
+        self._lock = threading.Lock()
+        self._users: dict[ProcessPoolExecutor, int] = {}
+        self.verified = 0
+
+    def _acquire(self, pems: list[bytes], etag: str) -> tuple[ProcessPoolExecutor | None, Keyring | None]:
+        """Return (pool, inline keyring) for `etag`; release the pool when done."""
+        with self._lock:
+            # workers=1 verifies inline; a pool is only worth it with 2+ cores
+            if self.workers == 1:
+                if self._pool_etag != etag:
+                    self._inline_keyring = _build_keyring(pems)
+                    self._pool_etag = etag
+                return None, self._inline_keyring
+            if self._pool is None or self._pool_etag != etag:
+                # a rotated key needs workers initialized with the new keyring;
+                # the old pool keeps serving streams that already hold it
+                old = self._pool
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(pems,))
+                self._pool_etag = etag
+                if old is not None and not self._users.get(old):
+                    old.shutdown(wait=False)
+            self._users[self._pool] = self._users.get(self._pool, 0) + 1
+            return self._pool, None
+
+    def _release(self, pool: ProcessPoolExecutor | None):
+        if pool is None:
+            return
+        with self._lock:
+            self._users[pool] -= 1
+            if not self._users[pool]:
+                del self._users[pool]
+                if pool is not self._pool:
+                    pool.shutdown(wait=False)
+
+    def verify_many(self, items: Iterable) -> Iterator[bool]:
+        """Yield one bool per item, in order; input is consumed lazily."""
+        self._keys.public_pem()  # loads the current key into the keyring
+        pems = self._keys.keyring.pems()
+        if not pems:
+            for _ in items:
+                yield False
+            return
+        etag = hashlib.sha256(b"".join(sorted(pems))).hexdigest()[:32]
+        pool, keyring = self._acquire(pems, etag)
+        try:
+            yield from self._stream(items, etag, pool, keyring)
+        finally:
+            self._release(pool)
+
+    def _stream(self, items: Iterable, etag: str, pool: ProcessPoolExecutor | None, keyring: Keyring | None) -> Iterator[bool]:
+        source = iter(items)
+        # (normalized items, cached results with None holes, future or None)
+        in_flight: deque = deque()
+        max_in_flight = self.workers * 2
+
+        def drain_one():
+            chunk, results, fut = in_flight.popleft()
+            if fut is not None:
+                computed = iter(fut.result())
+                for i, item in enumerate(chunk):
+                    if results[i] is None:
+                        results[i] = next(computed)
+                        self.cache.put((etag, item), results[i])
+                        self.verified += 1
+            return results
+
+        while True:
+            chunk = [_normalize(i) for i in islice(source, self.chunk_size)]
+            if not chunk:
+                break
+            results = [self.cache.get((etag, item)) for item in chunk]
+            todo = [item for item, r in zip(chunk, results) if r is None]
+            fut = None
+            if todo:
+                if pool is None:
+                    for i, item in enumerate(chunk):
+                        if results[i] is None:
+                            results[i] = _verify_one(item, keyring)
+                            self.cache.put((etag, item), results[i])
+                            self.verified += 1
+                else:
+                    fut = pool.submit(_verify_chunk, todo)
+            in_flight.append((chunk, results, fut))
+            while len(in_flight) >= max_in_flight or (in_flight and in_flight[0][2] is None):
+                yield from drain_one()
+        while in_flight:
+            yield from drain_one()
+
+    def verify_all(self, items: Iterable) -> list[bool]:
+        return list(self.verify_many(items))
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self._pool_etag = None
+        if pool is not None:
+            pool.shutdown()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "verified": self.verified,
+            "cache_hits": self.cache.hits,
+            "cache_size": len(self.cache),
+        }
+
+
+_verifier: BulkVerifier | None = None
+
+
+def get_bulk_verifier() -> BulkVerifier:
+    """Return the process-wide verifier (VERIFY_* env)."""
+    global _verifier
+    if _verifier is None:
+        _verifier = BulkVerifier()
+    return _verifier
+
+
+def _read_pairs(stream) -> Iterator[dict]:
+    for line in stream:
+        line = line.strip()
+        if line:
+            item = json.loads(line)
+            yield item if isinstance(item, dict) else {"content_hash": item[0], "signature": item[1]}
+
+
+def _bench(n: int, key_path: str | None):
+    # sign with the same key the verifiers check against
+    keys = get_key_manager(key_path)
+    pairs = []
+    for i in range(n):
+        h = f"{i:064x}"
+        pairs.append((h, keys.sign(bytes.fromhex(h)).hex()))
+    counts = sorted({1, 2, 4, os.cpu_count() or 1})
+    print(f"{n} verifications, {os.cpu_count()} CPUs")
+    for workers in counts:
+        v = BulkVerifier(workers=workers, cache_size=n, key_path=key_path)
+        start = time.perf_counter()
+        ok = sum(v.verify_many(pairs))
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        sum(v.verify_many(pairs))
+        warm = time.perf_counter() - start
+        v.shutdown()
+        mismatched = f"   {n - ok} FAILED" if ok != n else ""
+        print(f"workers={workers:<3} {n / cold:10.0f} verif/s   repeat audit (cached) {n / warm:10.0f} verif/s{mismatched}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Bulk-verify provenance signatures (JSON lines).")
+    ap.add_argument("path", nargs="?", default="-", help="JSON lines of {content_hash, signature[, merkle_root, proof]} or [hash, sig]; - for stdin")
+    ap.add_argument("--workers", type=int, default=VERIFY_WORKERS)
+    ap.add_argument("--chunk", type=int, default=VERIFY_CHUNK)
+    ap.add_argument("--key", default=None, help="provenance key PEM (default PROVENANCE_KEY_PATH)")
+    ap.add_argument("--bench", type=int, metavar="N", help="sign N hashes, then report verifications/sec by worker count")
+    args = ap.parse_args(argv)
+    if args.bench:
+        _bench(args.bench, args.key)
+        return 0
+    stream = sys.stdin if args.path == "-" else open(args.path)
+    verifier = BulkVerifier(workers=args.workers, chunk_size=args.chunk, key_path=args.key)
+    failed = 0
+    try:
+        items = _read_pairs(stream)
+        # tee the hashes for output without materializing the input
+        pending: deque = deque()
+
+        def track():
+            for item in items:
+                pending.append(item.get("content_hash"))
+                yield item
+
+        for ok in verifier.verify_many(track()):
+            failed += not ok
+            sys.stdout.write(json.dumps({"content_hash": pending.popleft(), "ok": ok}) + "\n")
+    finally:
+        verifier.shutdown()
+        if stream is not sys.stdin:
+            stream.close()
+    print(json.dumps(verifier.stats() | {"failed": failed}), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+"""Closed / open / half-open circuit breaker for calls to a flaky dependency.
+
+The breaker keeps the outcomes of the last `window` calls. A call counts as
+failed when it raised or returned an error, and as slow when it took longer
+than `slow_call_seconds`. Once at least `min_calls` outcomes are recorded and
+either the failure rate reaches `failure_rate` or the slow-call rate reaches
+`slow_call_rate`, the circuit opens: `allow()` returns False and callers fail
+fast (or buffer locally) instead of waiting on retries. After `open_seconds`
+the circuit goes half-open and lets exactly one probe through; a successful
+probe closes it, a failed one opens it again.
+
+Usage:
+  if not breaker.allow():
+      return {"ok": False, "error": "circuit open"}
+  start = time.monotonic()
+  ok = await do_call()
+  breaker.record(ok, time.monotonic() - start)
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        slow_call_rate: float = 1.0,
+        slow_call_seconds: float = 10.0,
+        min_calls: int = 5,
+        window: int = 20,
+        open_seconds: float = 15.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = max(1, min_calls)
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (failed, slow) per recorded call
+        self._outcomes: deque = deque(maxlen=max(self.min_calls, window))
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.transitions: deque = deque(maxlen=20)
+        self.rejected = 0
+
+    def _transition(self, to: str, reason: str):
+        self.transitions.append({"at": time.time(), "from": self.state, "to": to, "reason": reason})
+        self.state = to
+        if to == OPEN:
+            self._opened_at = self._clock()
+        self._probe_in_flight = False
+        self._outcomes.clear()
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed now (claims the probe when half-open)."""
+        with self._lock:
+            if self.state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN, "open timeout elapsed")
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, success: bool, elapsed: float = 0.0):
+        """Record the outcome of a call that `allow()` let through."""
+        slow = elapsed > self.slow_call_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if success and not slow:
+                    self._transition(CLOSED, "probe succeeded")
+                else:
+                    self._transition(OPEN, "probe failed" if not success else "probe slow")
+                return
+            if self.state == OPEN:
+                return
+            self._outcomes.append((not success, slow))
+            n = len(self._outcomes)
+            if n < self.min_calls:
+                return
+            failures = sum(1 for failed, _ in self._outcomes if failed)
+            slows = sum(1 for _, s in self._outcomes if s)
+            if failures / n >= self.failure_rate:
+                self._transition(OPEN, f"failure rate {failures}/{n}")
+            elif slows / n >= self.slow_call_rate:
+                self._transition(OPEN, f"slow call rate {slows}/{n}")
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit admits a probe (0 when not open)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.open_seconds - (self._clock() - self._opened_at))
+
+    def stats(self) -> dict:
+        n = len(self._outcomes)
+        return {
+            "name": self.name,
+            "state": self.state,
+            "calls_in_window": n,
+            "failure_rate": sum(1 for f, _ in self._outcomes if f) / n if n else 0.0,
+            "slow_rate": sum(1 for _, s in self._outcomes if s) / n if n else 0.0,
+            "retry_after": round(self.retry_after(), 3),
+            "rejected": self.rejected,
+            "transitions": list(self.transitions),
+        }
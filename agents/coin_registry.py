@@ -0,0 +1,281 @@
+"""Local coin registry backed by a CoinGecko coin-list snapshot.
+
+Tickers, names and CoinGecko ids are indexed in a prefix trie so exact
+lookups cost O(len(text)); misses fall back to a bounded edit-distance search
+over the same trie. A typo is only corrected silently when it is long enough
+and exactly one coin is within reach; otherwise `suggest()` offers the near
+matches as a "did you mean". Symbols that resolve to nothing are rejected
+locally, so callers never spend a network round trip just to learn a coin is
+unknown.
+
+The snapshot (`data/coins.json`, ordered by market-cap rank) is loaded lazily
+on first use. The built index is pickled next to it and reused while the
+snapshot is unchanged, so process startup does not rebuild the trie.
+
+Configuration (env):
+- COIN_REGISTRY_PATH: snapshot path (default agents/data/coins.json)
+- COIN_REGISTRY_INDEX: pickled index path (default <snapshot>.idx.pickle)
+
+CLI:
+  python agents/coin_registry.py refresh      # download a fresh snapshot
+  python agents/coin_registry.py resolve <text>
+"""
+import json
+import logging
+import os
+import pickle
+import sys
+from pathlib import Path
+
+logger = logging.getLogger("coin_registry")
+
+DEFAULT_SNAPSHOT = Path(__file__).parent / "data" / "coins.json"
+COIN_REGISTRY_PATH = os.environ.get("COIN_REGISTRY_PATH", str(DEFAULT_SNAPSHOT))
+COIN_REGISTRY_INDEX = os.environ.get("COIN_REGISTRY_INDEX", "")
+
+COINGECKO_LIST_URL = "https://api.coingecko.com/api/v3/coins/list"
+COINGECKO_MARKETS_URL = "https://api.coingecko.com/api/v3/coins/markets"
+
+# bump when the pickled layout changes
+INDEX_VERSION = 1
+
+# shorter inputs (tickers, common words) are never auto-corrected by resolve()
+FUZZY_RESOLVE_MIN_LEN = 6
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def max_edits_for(text: str) -> int:
+    """Edit budget for fuzzy matching; short inputs (tickers) must match exactly."""
+    n = len(text)
+    if n <= 3:
+        return 0
+    if n <= 5:
+        return 1
+    return 2
+
+
+class CoinRegistry:
+    """Prefix trie over coin ids, tickers and names.
+
+    Nodes are stored in flat lists (`_children[i]` maps a character to a child
+    node, `_value[i]` is a coin index or -1) which keeps the structure small
+    and cheap to pickle. Coins are ranked by their position in the snapshot;
+    when several coins share a key the best-ranked one wins, and ids take
+    precedence over tickers, which take precedence over names.
+    """
+
+    def __init__(self, coins: list[dict]):
+        self.coins = [{"id": c["id"], "symbol": c.get("symbol", ""), "name": c.get("name", "")} for c in coins if c.get("id")]
+        self._children: list[dict] = [{}]
+        self._value: list[int] = [-1]
+        for field in ("id", "symbol", "name"):
+            for idx, coin in enumerate(self.coins):
+                key = _normalize(coin[field])
+                if key:
+                    self._insert(key, idx)
+
+    def __len__(self) -> int:
+        return len(self.coins)
+
+    def _insert(self, key: str, idx: int):
+        node = 0
+        for ch in key:
+            nxt = self._children[node].get(ch)
+            if nxt is None:
+                nxt = len(self._children)
+                self._children[node][ch] = nxt
+                self._children.append({})
+                self._value.append(-1)
+            node = nxt
+        if self._value[node] == -1:
+            self._value[node] = idx
+
+    def _walk(self, key: str) -> int:
+        node = 0
+        for ch in key:
+            node = self._children[node].get(ch, -1)
+            if node == -1:
+                return -1
+        return node
+
+    def lookup(self, text: str) -> dict | None:
+        """Exact match on id, ticker or name."""
+        node = self._walk(_normalize(text))
+        if node == -1 or self._value[node] == -1:
+            return None
+        return self.coins[self._value[node]]
+
+    def _near(self, key: str, budget: int) -> list[tuple[int, int]]:
+        """(distance, coin index) of every coin within `budget` edits, best first."""
+        if budget <= 0:
+            return []
+        found: dict[int, int] = {}
+        first_row = list(range(len(key) + 1))
+        stack = [(child, ch, first_row) for ch, child in self._children[0].items()]
+        while stack:
+            node, ch, prev = stack.pop()
+            row = [prev[0] + 1]
+            for i in range(1, len(key) + 1):
+                cost = 0 if key[i - 1] == ch else 1
+                row.append(min(row[i - 1] + 1, prev[i] + 1, prev[i - 1] + cost))
+            value = self._value[node]
+            if value != -1 and row[-1] <= budget and row[-1] < found.get(value, budget + 1):
+                found[value] = row[-1]
+            if min(row) <= budget:
+                stack.extend((child, c, row) for c, child in self._children[node].items())
+        return sorted((d, idx) for idx, d in found.items())
+
+    def fuzzy(self, text: str, max_edits: int | None = None) -> dict | None:
+        """Best coin within `max_edits` Levenshtein edits of `text`."""
+        key = _normalize(text)
+        near = self._near(key, max_edits_for(key) if max_edits is None else max_edits)
+        return self.coins[near[0][1]] if near else None
+
+    def suggest(self, text: str, limit: int = 3) -> list[dict]:
+        """Near matches for an unresolved `text`, closest and best-ranked first."""
+        key = _normalize(text)
+        return [self.coins[idx] for _, idx in self._near(key, max_edits_for(key))[:limit]]
+
+    def resolve(self, text: str) -> str | None:
+        """Return the CoinGecko id for `text`, or None when it is unknown.
+
+        A fuzzy match is accepted only for inputs of FUZZY_RESOLVE_MIN_LEN or
+        more characters with exactly one coin in reach; anything else is left
+        to `suggest()` rather than silently pricing a different coin.
+        """
+        if not text:
+            return None
+        coin = self.lookup(text)
+        if coin is None:
+            key = _normalize(text)
+            if len(key) >= FUZZY_RESOLVE_MIN_LEN:
+                near = self._near(key, max_edits_for(key))
+                if len(near) == 1:
+                    coin = self.coins[near[0][1]]
+        return coin["id"] if coin else None
+
+    def complete(self, prefix: str, limit: int = 10) -> list[dict]:
+        """Coins whose id, ticker or name starts with `prefix`, best-ranked first."""
+        node = self._walk(_normalize(prefix))
+        if node == -1:
+            return []
+        found = set()
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            if self._value[n] != -1:
+                found.add(self._value[n])
+            stack.extend(self._children[n].values())
+        return [self.coins[i] for i in sorted(found)[:limit]]
+
+    def aliases(self, limit: int | None = None, min_symbol_len: int = 3) -> dict:
+        """Alias -> id map for the `limit` best-ranked coins (used by the intent engine).
+
+        Tickers shorter than `min_symbol_len` are skipped; they collide with
+        ordinary words too often to be matched in free text.
+        """
+        out = {}
+        for coin in self.coins[:limit]:
+            out.setdefault(coin["id"], coin["id"])
+            if len(coin["symbol"]) >= min_symbol_len:
+                out.setdefault(coin["symbol"].lower(), coin["id"])
+            if coin["name"]:
+                out.setdefault(_normalize(coin["name"]), coin["id"])
+        return out
+
+
+def _snapshot_signature(path: Path) -> tuple:
+    st = path.stat()
+    return (INDEX_VERSION, st.st_size, st.st_mtime_ns)
+
+
+def load_registry(path: str | Path = COIN_REGISTRY_PATH, index_path: str | Path | None = None) -> CoinRegistry:
+    """Load the registry, reusing the pickled index when it matches the snapshot."""
+    path = Path(path)
+    index_path = Path(index_path or COIN_REGISTRY_INDEX or str(path) + ".idx.pickle")
+    if not path.exists():
+        logger.warning("Coin registry snapshot not found at %s; registry is empty", path)
+        return CoinRegistry([])
+    sig = _snapshot_signature(path)
+    try:
+        with open(index_path, "rb") as f:
+            cached_sig, registry = pickle.load(f)
+        if cached_sig == sig:
+            return registry
+    except FileNotFoundError:
+        pass
+    except Exception:
+        logger.warning("Ignoring unreadable coin index %s", index_path)
+
+    registry = CoinRegistry(json.loads(path.read_text()))
+    try:
+        tmp = Path(str(index_path) + ".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump((sig, registry), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, index_path)
+    except Exception:
+        logger.info("Could not persist coin index to %s", index_path)
+    return registry
+
+
+_registry: CoinRegistry | None = None
+
+
+def get_registry() -> CoinRegistry:
+    """Return the process-wide registry, loading it on first use."""
+    global _registry
+    if _registry is None:
+        _registry = load_registry()
+    return _registry
+
+
+def refresh_snapshot(path: str | Path = COIN_REGISTRY_PATH, ranked_pages: int = 4) -> int:
+    """Download the CoinGecko coin list, ranked by market cap, into `path`.
+
+    Meant to be run offline (CI job or by hand), never on the request path.
+    """
+    import requests
+
+    ranked = []
+    for page in range(1, ranked_pages + 1):
+        resp = requests.get(COINGECKO_MARKETS_URL, params={"vs_currency": "usd", "order": "market_cap_desc", "per_page": 250, "page": page}, timeout=30)
+        resp.raise_for_status()
+        ranked.extend({"id": c["id"], "symbol": c["symbol"], "name": c["name"]} for c in resp.json())
+    resp = requests.get(COINGECKO_LIST_URL, timeout=30)
+    resp.raise_for_status()
+    seen = {c["id"] for c in ranked}
+    coins = ranked + [{"id": c["id"], "symbol": c["symbol"], "name": c["name"]} for c in resp.json() if c["id"] not in seen]
+    path = Path(path)
+    tmp = Path(str(path) + ".tmp")
+    tmp.write_text("[\n" + ",\n".join("  " + json.dumps(c) for c in coins) + "\n]\n")
+    os.replace(tmp, path)
+    return len(coins)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: refresh | resolve <text> | complete <prefix>")
+        return
+    cmd = sys.argv[1]
+    if cmd == "refresh":
+        print(f"Wrote {refresh_snapshot()} coins to {COIN_REGISTRY_PATH}")
+    elif cmd == "resolve":
+        text = " ".join(sys.argv[2:])
+        coin_id = get_registry().resolve(text)
+        if coin_id is None:
+            hints = ", ".join(c["id"] for c in get_registry().suggest(text))
+            print("unknown" + (f" (did you mean: {hints}?)" if hints else ""))
+        else:
+            print(coin_id)
+    elif cmd == "complete":
+        for coin in get_registry().complete(" ".join(sys.argv[2:])):
+            print(coin["id"], coin["symbol"], coin["name"])
+    else:
+        print("Unknown command")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,16 @@
+import logging
+import os
 import sys
+import tempfile
 import types
 
+# keep buffered event logs written during tests out of the source tree
+os.environ.setdefault("EVENT_LOG_PATH", os.path.join(tempfile.mkdtemp(prefix="pluto-events-"), "events.log"))
+os.environ.setdefault("OUTBOX_DIR", tempfile.mkdtemp(prefix="pluto-outbox-"))
+os.environ.setdefault("ENTRY_STORE_PATH", os.path.join(tempfile.mkdtemp(prefix="pluto-entries-"), "entries.db"))
+# storage tests sign with the real provenance signer; never generate its key in the cwd
+os.environ.setdefault("PROVENANCE_KEY_PATH", os.path.join(tempfile.mkdtemp(prefix="pluto-provenance-"), "provenance_key.pem"))
+
 # Minimal fake uagents for tests to avoid importing the heavy runtime which
 # starts a local PocketIC replica in this environment.
 class _FakeAgent:
@@ -21,3 +31,30 @@ sys.modules.setdefault("uagents.context", fake_uagents)
 sys.modules.setdefault("uagents.contrib", fake_uagents)
 sys.modules.setdefault("uagents.contrib.protocols", fake_uagents)
 sys.modules.setdefault("uagents.contrib.protocols.http", fake_uagents)
+
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _fresh_runtime_config():
+    # tests monkeypatch env vars; drop the config snapshot so the next
+    # runtime_config.current() re-reads them instead of a stale one
+    # (looked up, not imported: package-style tests never load it)
+    rc = sys.modules.get("runtime_config")
+    if rc is not None:
+        rc._current = None
+    # the storage idempotency window would otherwise leak entries across tests
+    sa = sys.modules.get("storage_agent")
+    if sa is not None:
+        sa.dedup_index.clear()
+    yield
+    rc = sys.modules.get("runtime_config")
+    if rc is not None:
+        rc._current = None
+
+
+@pytest.fixture
+def ctx():
+    # stand-in for the uagents Context handed to message handlers
+    return types.SimpleNamespace(logger=logging.getLogger("test"))
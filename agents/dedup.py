@@ -0,0 +1,128 @@
+"""Idempotency window for storage writes, keyed by entry_id and content hash.
+
+Two layers, both with bounded memory:
+- an exact LRU of recent keys that maps each key to the original write
+  result, so a duplicate gets that result back;
+- a bloom filter over a much longer history. Keys evicted from the LRU are
+  still recognised as (probable) duplicates, but their original result is
+  gone, so callers get a `{"duplicate": True, "probable": True}` marker.
+  A bloom hit can be a false positive: callers must confirm it against
+  durable storage before skipping a write.
+  The bloom is generational: once the active filter holds `capacity` keys a
+  fresh one takes over and the oldest generation is dropped.
+
+Usage:
+  hit = dedup.lookup(entry_id, content_hash)
+  if hit is None:
+      result = write(...)
+      dedup.remember(entry_id, content_hash, result)
+"""
+import hashlib
+import math
+from collections import OrderedDict
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        bits = -self.capacity * math.log(error_rate) / (math.log(2) ** 2)
+        self.size = max(8, int(math.ceil(bits)))
+        self.hashes = max(1, int(round(self.size / self.capacity * math.log(2))))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+class DedupIndex:
+    def __init__(
+        self,
+        lru_size: int = 4096,
+        bloom_capacity: int = 1_000_000,
+        bloom_error_rate: float = 1e-6,
+        generations: int = 2,
+        by_content: bool = True,
+    ):
+        self.lru_size = max(1, lru_size)
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self.generations = max(1, generations)
+        self.by_content = by_content
+        self._recent: "OrderedDict[str, dict]" = OrderedDict()
+        self._blooms: list[BloomFilter] = [BloomFilter(bloom_capacity, bloom_error_rate)]
+        self.lookups = 0
+        self.exact_hits = 0
+        self.bloom_hits = 0
+
+    def _keys(self, entry_id: str | None, content_hash: str | None) -> list[str]:
+        keys = []
+        if entry_id:
+            keys.append("id:" + entry_id)
+        if content_hash and self.by_content:
+            keys.append("hash:" + content_hash)
+        return keys
+
+    def lookup(self, entry_id: str | None, content_hash: str | None) -> dict | None:
+        """Return the original result (or a probable-duplicate marker), else None."""
+        keys = self._keys(entry_id, content_hash)
+        if not keys:
+            return None
+        self.lookups += 1
+        for key in keys:
+            result = self._recent.get(key)
+            if result is not None:
+                self._recent.move_to_end(key)
+                self.exact_hits += 1
+                return result
+        for key in keys:
+            if any(key in bloom for bloom in self._blooms):
+                self.bloom_hits += 1
+                return {"ok": True, "duplicate": True, "probable": True, "entry_id": entry_id, "content_hash": content_hash}
+        return None
+
+    def remember(self, entry_id: str | None, content_hash: str | None, result: dict):
+        for key in self._keys(entry_id, content_hash):
+            self._recent[key] = result
+            self._recent.move_to_end(key)
+            bloom = self._blooms[-1]
+            if bloom.count >= self.bloom_capacity:
+                bloom = BloomFilter(self.bloom_capacity, self.bloom_error_rate)
+                self._blooms.append(bloom)
+                del self._blooms[: -self.generations]
+            bloom.add(key)
+        while len(self._recent) > self.lru_size:
+            self._recent.popitem(last=False)
+
+    def clear(self):
+        self._recent.clear()
+        self._blooms = [BloomFilter(self.bloom_capacity, self.bloom_error_rate)]
+        self.lookups = self.exact_hits = self.bloom_hits = 0
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.bloom_hits
+        return {
+            "lookups": self.lookups,
+            "exact_hits": self.exact_hits,
+            "bloom_hits": self.bloom_hits,
+            "hit_rate": hits / self.lookups if self.lookups else 0.0,
+            "lru_size": len(self._recent),
+            "bloom_generations": len(self._blooms),
+            "bloom_bytes": sum(b.nbytes for b in self._blooms),
+        }
@@ -0,0 +1,186 @@
+"""Compact, versioned binary encoding for stored chat entries.
+
+Replaces the JSON payload (`{"entry", "content_hash", "signature"}` with hex
+strings) that used to be written to the canister as text. The hash and the
+signature are stored as raw bytes and the entry text is length-prefixed and,
+above a size threshold, compressed.
+
+Layout (all integers big-endian):
+
+  offset  size  field
+  0       1     magic 0xCE
+  1       1     version (1)
+  2       1     flags: 0x01 hash present, 0x02 signature present,
+                       0x04 Merkle proof present (aggregate signing),
+                       0x10 entry zlib-compressed, 0x20 entry zstd-compressed
+  3       32    content hash (SHA-256), if flag 0x01
+  .       2     signature length, if flag 0x02
+  .       n     signature bytes, if flag 0x02: tagged
+                [u8 algorithm][4 key id][signature] (see provenance.py),
+                or a bare DER ECDSA signature from before tagging
+  .       32    signed Merkle root, if flag 0x04
+  .       1     proof depth d, if flag 0x04
+  .       33*d  proof steps: [u8 sibling side, 0 left / 1 right][32 sibling],
+                if flag 0x04
+  .       4     entry length in bytes (after compression, if any)
+  .       n     entry (UTF-8, possibly compressed)
+
+The header is never compressed, so the canister can read the hash and
+signature straight from the blob (see `decodeRecord` in main.mo); only the
+entry bytes need a decompressor.
+
+Configuration (env):
+- ENTRY_CODEC_COMPRESSION: zstd | zlib | none (default zstd when the
+  `zstandard` package is installed, else zlib)
+- ENTRY_CODEC_COMPRESS_THRESHOLD: entries shorter than this many bytes are
+  stored uncompressed (default 256)
+"""
+import os
+import struct
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = 0xCE
+VERSION = 1
+
+FLAG_HASH = 0x01
+FLAG_SIGNATURE = 0x02
+FLAG_PROOF = 0x04
+FLAG_ZLIB = 0x10
+FLAG_ZSTD = 0x20
+
+HASH_BYTES = 32
+
+ENTRY_CODEC_COMPRESSION = os.getenv("ENTRY_CODEC_COMPRESSION", "zstd" if zstandard is not None else "zlib").lower()
+ENTRY_CODEC_COMPRESS_THRESHOLD = int(os.getenv("ENTRY_CODEC_COMPRESS_THRESHOLD", "256"))
+
+_PREFIX = struct.Struct(">BBB")
+_U16 = struct.Struct(">H")
+_U32 = struct.Struct(">I")
+
+
+class CodecError(ValueError):
+    """Raised for a record that is truncated, corrupt or of an unknown version."""
+
+
+def _compress(data: bytes, compression: str) -> tuple[bytes, int]:
+    if compression == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(data), FLAG_ZSTD
+    if compression in ("zstd", "zlib"):
+        return zlib.compress(data, 6), FLAG_ZLIB
+    return data, 0
+
+
+def _decompress(data: bytes, flags: int) -> bytes:
+    if flags & FLAG_ZSTD:
+        if zstandard is None:
+            raise CodecError("record is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if flags & FLAG_ZLIB:
+        return zlib.decompress(data)
+    return data
+
+
+def encode_record(
+    entry: str,
+    content_hash: str | None = None,
+    signature: str | None = None,
+    merkle_root: str | None = None,
+    proof: list[dict] | None = None,
+    compression: str = ENTRY_CODEC_COMPRESSION,
+    compress_threshold: int = ENTRY_CODEC_COMPRESS_THRESHOLD,
+) -> bytes:
+    """Encode an entry and its hex hash / hex signature into one record.
+
+    With aggregate signing, `signature` covers `merkle_root` and `proof`
+    (see merkle.py) links the content hash to it.
+    """
+    flags = 0
+    parts = []
+    if content_hash:
+        raw = bytes.fromhex(content_hash)
+        if len(raw) != HASH_BYTES:
+            raise CodecError(f"content hash must be {HASH_BYTES} bytes, got {len(raw)}")
+        flags |= FLAG_HASH
+        parts.append(raw)
+    if signature:
+        raw = bytes.fromhex(signature)
+        flags |= FLAG_SIGNATURE
+        parts.append(_U16.pack(len(raw)))
+        parts.append(raw)
+    if merkle_root:
+        raw = bytes.fromhex(merkle_root)
+        steps = proof or []
+        if len(raw) != HASH_BYTES or len(steps) > 255:
+            raise CodecError("invalid Merkle root or proof")
+        flags |= FLAG_PROOF
+        parts.append(raw)
+        parts.append(bytes([len(steps)]))
+        for step in steps:
+            parts.append(b"\x01" if step["position"] == "right" else b"\x00")
+            parts.append(bytes.fromhex(step["hash"]))
+    body = (entry or "").encode("utf-8")
+    if len(body) >= compress_threshold:
+        packed, flag = _compress(body, compression)
+        # keep the plain bytes when compression does not pay for itself
+        if flag and len(packed) < len(body):
+            body = packed
+            flags |= flag
+    parts.append(_U32.pack(len(body)))
+    parts.append(body)
+    return _PREFIX.pack(MAGIC, VERSION, flags) + b"".join(parts)
+
+
+def decode_record(data: bytes) -> dict:
+    """Return {"version", "entry", "content_hash", "signature", "merkle_root", "proof"}.
+
+    Hashes and the signature are hex strings; absent fields are None.
+    """
+    try:
+        magic, version, flags = _PREFIX.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise CodecError("not an entry record (bad magic byte)")
+        if version != VERSION:
+            raise CodecError(f"unsupported record version {version}")
+        pos = _PREFIX.size
+        content_hash = signature = merkle_root = proof = None
+        if flags & FLAG_HASH:
+            content_hash = data[pos:pos + HASH_BYTES].hex()
+            pos += HASH_BYTES
+        if flags & FLAG_SIGNATURE:
+            (n,) = _U16.unpack_from(data, pos)
+            pos += _U16.size
+            signature = data[pos:pos + n].hex()
+            pos += n
+        if flags & FLAG_PROOF:
+            merkle_root = data[pos:pos + HASH_BYTES].hex()
+            depth = data[pos + HASH_BYTES]
+            pos += HASH_BYTES + 1
+            proof = []
+            for _ in range(depth):
+                step = data[pos:pos + 1 + HASH_BYTES]
+                if len(step) != 1 + HASH_BYTES:
+                    raise CodecError("truncated Merkle proof")
+                proof.append({"position": "right" if step[0] else "left", "hash": step[1:].hex()})
+                pos += 1 + HASH_BYTES
+        (n,) = _U32.unpack_from(data, pos)
+        pos += _U32.size
+        body = data[pos:pos + n]
+    except (struct.error, IndexError) as e:
+        raise CodecError(f"truncated record: {e}") from None
+    if len(body) != n or pos + n != len(data):
+        raise CodecError("record length does not match its header")
+    try:
+        entry = _decompress(body, flags).decode("utf-8")
+    except (zlib.error, UnicodeDecodeError) as e:
+        raise CodecError(f"corrupt entry bytes: {e}") from None
+    return {"version": version, "entry": entry, "content_hash": content_hash, "signature": signature, "merkle_root": merkle_root, "proof": proof}
+
+
+def is_record(data) -> bool:
+    """Cheap check whether `data` looks like an encoded record (vs. legacy JSON text)."""
+    return isinstance(data, (bytes, bytearray)) and len(data) >= _PREFIX.size and data[0] == MAGIC
@@ -0,0 +1,228 @@
+"""Local SQLite mirror of stored chat entries.
+
+Every entry `handle_store_chat` accepts is also written here (entry_id,
+timestamp, text, content hash, signature, anchor batch, status), so the
+history can be read back without querying the canister. The table is
+indexed on timestamp and mirrored into an FTS5 full-text index, and pages
+are keyset-paginated on rowid (newest first), so a page costs the same at
+entry 10 as at entry 10 million.
+
+All database work runs on one dedicated thread; async callers use
+`record()` / `history()` / `lookup()`, sync callers `add()` / `query()` /
+`find()`.
+
+Configuration (env):
+- ENTRY_STORE_PATH: SQLite file (default ./.entries.db)
+- HISTORY_PAGE_MAX: largest page /history will return (default 200)
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ENTRY_STORE_PATH = os.getenv("ENTRY_STORE_PATH", "./.entries.db")
+HISTORY_PAGE_MAX = int(os.getenv("HISTORY_PAGE_MAX", "200"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    entry_id TEXT NOT NULL UNIQUE,
+    ts REAL NOT NULL,
+    text TEXT NOT NULL,
+    content_hash TEXT,
+    signature TEXT,
+    anchor_batch TEXT,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_ts ON entries (ts);
+CREATE INDEX IF NOT EXISTS entries_content_hash ON entries (content_hash);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(text, content='entries', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE OF text ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    INSERT INTO entries_fts (rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+_COLUMNS = ("entry_id", "ts", "text", "content_hash", "signature", "anchor_batch", "status")
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, the last as a prefix."""
+    words = [w.replace('"', '""') for w in text.split()]
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
+
+
+class EntryStore:
+    def __init__(self, path: str = ENTRY_STORE_PATH):
+        self.path = path
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="entry-store")
+        self._conn: sqlite3.Connection | None = None
+        # reentrant: writers hold it while _db() lazily opens the connection
+        self._lock = threading.RLock()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    conn = sqlite3.connect(self.path, check_same_thread=False)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("PRAGMA synchronous=NORMAL")
+                    conn.executescript(_SCHEMA)
+                    self._conn = conn
+        return self._conn
+
+    # --- writes ---------------------------------------------------------------
+
+    def add_many(self, rows: list[dict]) -> int:
+        """Insert entries (dicts with _COLUMNS keys); an existing entry_id is updated."""
+        values = [
+            (
+                r["entry_id"],
+                r.get("ts") or time.time(),
+                r.get("text") or "",
+                r.get("content_hash"),
+                r.get("signature"),
+                r.get("anchor_batch"),
+                r.get("status"),
+            )
+            for r in rows
+        ]
+        with self._lock:
+            db = self._db()
+            with db:
+                db.executemany(
+                    "INSERT INTO entries (entry_id, ts, text, content_hash, signature, anchor_batch, status)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT(entry_id) DO UPDATE SET status = excluded.status,"
+                    " signature = COALESCE(excluded.signature, entries.signature)",
+                    values,
+                )
+        return len(values)
+
+    def add(self, entry_id: str, text: str, content_hash: str | None = None, signature: str | None = None, status: str | None = None, ts: float | None = None) -> None:
+        self.add_many([{"entry_id": entry_id, "ts": ts, "text": text, "content_hash": content_hash, "signature": signature, "status": status}])
+
+    def set_anchor_batch(self, content_hashes: list[str], batch_id: str) -> int:
+        """Tag entries whose content hash was anchored in `batch_id`."""
+        with self._lock:
+            db = self._db()
+            with db:
+                cur = db.executemany("UPDATE entries SET anchor_batch = ? WHERE content_hash = ?", [(batch_id, h) for h in content_hashes])
+            return cur.rowcount
+
+    def set_status(self, entry_ids: list[str], status: str) -> None:
+        with self._lock:
+            db = self._db()
+            with db:
+                db.executemany("UPDATE entries SET status = ? WHERE entry_id = ?", [(status, e) for e in entry_ids])
+
+    # --- reads ----------------------------------------------------------------
+
+    def query(
+        self,
+        limit: int = 50,
+        cursor: str | None = None,
+        q: str | None = None,
+        since: float | None = None,
+        until: float | None = None,
+    ) -> dict:
+        """Return {"items": [...], "next_cursor": str | None}, newest first.
+
+        `cursor` is the `next_cursor` of the previous page; `q` is a full-text
+        search; `since`/`until` bound the timestamp (unix seconds).
+        """
+        limit = max(1, min(limit, HISTORY_PAGE_MAX))
+        match = fts_query(q) if q else ""
+        # with a search, order and page on the FTS rowid so FTS5 can walk its
+        # doclist backwards and stop after `limit` hits instead of sorting all
+        key = "entries_fts.rowid" if match else "e.id"
+        where, params = [], []
+        if cursor:
+            where.append(f"{key} < ?")
+            params.append(int(cursor))
+        if since is not None:
+            where.append("e.ts >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("e.ts < ?")
+            params.append(until)
+        cols = ", ".join(f"e.{c}" for c in ("id",) + _COLUMNS)
+        if match:
+            sql = f"SELECT {cols} FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid WHERE entries_fts MATCH ?"
+            params.insert(0, match)
+            if where:
+                sql += " AND " + " AND ".join(where)
+        else:
+            sql = f"SELECT {cols} FROM entries e"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {key} DESC LIMIT ?"
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._db().execute(sql, params).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        items = [dict(zip(_COLUMNS, r[1:])) for r in rows]
+        return {"items": items, "next_cursor": str(rows[-1][0]) if more else None}
+
+    def find(self, entry_id: str | None = None, content_hash: str | None = None) -> dict | None:
+        """Return the entry stored under `entry_id`, else the latest with `content_hash`."""
+        cols = ", ".join(_COLUMNS)
+        with self._lock:
+            db = self._db()
+            row = None
+            if entry_id:
+                row = db.execute(f"SELECT {cols} FROM entries WHERE entry_id = ?", (entry_id,)).fetchone()
+            if row is None and content_hash:
+                row = db.execute(f"SELECT {cols} FROM entries WHERE content_hash = ? ORDER BY id DESC LIMIT 1", (content_hash,)).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT count(*) FROM entries").fetchone()[0]
+
+    # --- async wrappers -------------------------------------------------------
+
+    async def record(self, entry_id: str, text: str, content_hash: str | None = None, signature: str | None = None, status: str | None = None) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._io, lambda: self.add(entry_id, text, content_hash, signature, status))
+
+    async def update_status(self, entry_ids: list[str], status: str) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._io, lambda: self.set_status(entry_ids, status))
+
+    async def lookup(self, entry_id: str | None = None, content_hash: str | None = None) -> dict | None:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._io, lambda: self.find(entry_id, content_hash))
+
+    async def history(self, **kwargs) -> dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._io, lambda: self.query(**kwargs))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_store: EntryStore | None = None
+
+
+def get_entry_store() -> EntryStore:
+    """Return the process-wide store for ENTRY_STORE_PATH."""
+    global _store
+    if _store is None:
+        _store = EntryStore()
+    return _store
@@ -0,0 +1,240 @@
+"""Buffered structured event log for access, audit and storage records.
+
+Every record shares one JSON-lines format:
+  {"ts": "2026-01-01T00:00:00.000000Z", "kind": "audit", "event": "token_rotated", ...fields}
+
+`emit()` only appends a tuple to an in-memory ring buffer (a bounded deque),
+so it costs about a microsecond and never touches the filesystem on the
+request path. A background writer thread drains the buffer in batches every
+EVENT_LOG_FLUSH_INTERVAL seconds (or as soon as EVENT_LOG_BATCH records are
+waiting), serializes them and appends them to the log file, rotating it once
+it exceeds EVENT_LOG_MAX_BYTES. If the buffer overflows the oldest records are
+dropped and counted. `close_all()` (lifespan shutdown and atexit) stops the
+writers and flushes whatever is still buffered.
+
+Usage:
+  from event_log import get_event_log
+  get_event_log().emit("storage", "stored", entry_id=entry_id, attempts=1)
+
+Configuration (env):
+- EVENT_LOG_PATH: default log file (default ./.events.log)
+- EVENT_LOG_CAPACITY: ring buffer size in records (default 10000)
+- EVENT_LOG_BATCH: records that wake the writer early (default 256)
+- EVENT_LOG_FLUSH_INTERVAL: seconds between background flushes (default 0.5)
+- EVENT_LOG_MAX_BYTES: rotate when the file would exceed this (default 10485760)
+- EVENT_LOG_BACKUPS: rotated files to keep, <path>.1 .. <path>.N (default 5)
+"""
+import atexit
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger("event_log")
+
+EVENT_LOG_PATH = os.getenv("EVENT_LOG_PATH", "./.events.log")
+EVENT_LOG_CAPACITY = int(os.getenv("EVENT_LOG_CAPACITY", "10000"))
+EVENT_LOG_BATCH = int(os.getenv("EVENT_LOG_BATCH", "256"))
+EVENT_LOG_FLUSH_INTERVAL = float(os.getenv("EVENT_LOG_FLUSH_INTERVAL", "0.5"))
+EVENT_LOG_MAX_BYTES = int(os.getenv("EVENT_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+EVENT_LOG_BACKUPS = int(os.getenv("EVENT_LOG_BACKUPS", "5"))
+
+
+def format_record(ts: float, kind: str, event: str, fields: dict) -> str:
+    stamp = datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    return json.dumps({"ts": stamp, "kind": kind, "event": event, **fields}, default=str, ensure_ascii=False)
+
+
+class EventLog:
+    def __init__(
+        self,
+        path: str = EVENT_LOG_PATH,
+        capacity: int = EVENT_LOG_CAPACITY,
+        batch_size: int = EVENT_LOG_BATCH,
+        flush_interval: float = EVENT_LOG_FLUSH_INTERVAL,
+        max_bytes: int = EVENT_LOG_MAX_BYTES,
+        backups: int = EVENT_LOG_BACKUPS,
+    ):
+        self.path = path
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        # (ts, kind, event, fields); deque append/popleft are thread-safe
+        self._buffer: deque = deque(maxlen=capacity)
+        self._wake = threading.Event()
+        self._stopping = False
+        self._write_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._file = None
+        self._size = 0
+        self.emitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.write_errors = 0
+
+    def emit(self, kind: str, event: str, **fields) -> None:
+        """Buffer one record; never blocks on I/O."""
+        buf = self._buffer
+        if len(buf) == self.capacity:
+            self.dropped += 1
+        buf.append((time.time(), kind, event, fields))
+        self.emitted += 1
+        if self._thread is None:
+            self._start()
+        elif len(buf) >= self.batch_size:
+            self._wake.set()
+
+    def _start(self):
+        with self._write_lock:
+            if self._thread is not None or self._stopping:
+                return
+            self._thread = threading.Thread(target=self._run, name=f"event-log:{os.path.basename(self.path)}", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+        self.flush()
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._size = self._file.tell()
+        return self._file
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        if self.backups > 0:
+            for i in range(self.backups - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+
+    def flush(self) -> int:
+        """Write every buffered record now; returns the number written."""
+        with self._write_lock:
+            records = []
+            buf = self._buffer
+            while buf:
+                try:
+                    records.append(buf.popleft())
+                except IndexError:
+                    break
+            if not records:
+                return 0
+            data = "".join(format_record(*r) + "\n" for r in records)
+            nbytes = len(data.encode("utf-8"))
+            try:
+                f = self._open()
+                if self._size and self._size + nbytes > self.max_bytes:
+                    self._rotate()
+                    f = self._open()
+                f.write(data)
+                f.flush()
+                self._size += nbytes
+                self.written += len(records)
+            except Exception:
+                self.write_errors += 1
+                logger.exception("Failed to write %d event log records to %s", len(records), self.path)
+            return len(records)
+
+    def close(self, timeout: float = 5.0):
+        """Stop the writer thread after a final flush."""
+        self._stopping = True
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._thread = None
+            self._stopping = False
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "buffered": len(self._buffer),
+            "emitted": self.emitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+            "write_errors": self.write_errors,
+        }
+
+
+_logs: dict[str, EventLog] = {}
+_logs_lock = threading.Lock()
+
+
+def get_event_log(path: str | None = None) -> EventLog:
+    """Return the shared EventLog for `path` (default EVENT_LOG_PATH)."""
+    path = path or EVENT_LOG_PATH
+    log = _logs.get(path)
+    if log is None:
+        with _logs_lock:
+            log = _logs.get(path)
+            if log is None:
+                log = _logs[path] = EventLog(path)
+    return log
+
+
+def close_all():
+    """Flush and stop every event log (called on shutdown)."""
+    for log in list(_logs.values()):
+        try:
+            log.close()
+        except Exception:
+            logger.exception("Failed to close event log %s", log.path)
+
+
+atexit.register(close_all)
+
+
+class AccessLogMiddleware:
+    """ASGI middleware emitting one "access" record per HTTP request."""
+
+    def __init__(self, app, log: EventLog | None = None):
+        self.app = app
+        self.log = log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def _send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            client = scope.get("client")
+            (self.log or get_event_log()).emit(
+                "access",
+                "request",
+                method=scope.get("method"),
+                path=scope.get("path"),
+                status=status_code,
+                duration_ms=round((time.perf_counter() - start) * 1000, 3),
+                client=client[0] if client else None,
+            )
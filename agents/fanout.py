@@ -0,0 +1,48 @@
+"""Concurrent fan-out with a deadline per call.
+
+Used by both orchestrators to dispatch every sub-request of a query at once:
+end-to-end latency is bounded by the slowest allowed deadline rather than the
+sum of the calls, and parts that miss their deadline are reported instead of
+failing the whole reply.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable
+
+logger = logging.getLogger("fanout")
+
+OK = "ok"
+TIMEOUT = "timeout"
+ERROR = "error"
+
+
+@dataclass
+class Outcome:
+    key: Hashable
+    value: Any = None
+    status: str = OK
+    error: str | None = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == OK
+
+
+async def call_with_deadline(key: Hashable, factory: Callable[[], Awaitable[Any]], deadline: float) -> Outcome:
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    try:
+        value = await asyncio.wait_for(factory(), deadline)
+        return Outcome(key, value, OK, elapsed=loop.time() - start)
+    except asyncio.TimeoutError:
+        return Outcome(key, None, TIMEOUT, f"deadline of {deadline:.1f}s exceeded", elapsed=loop.time() - start)
+    except Exception as e:
+        logger.warning("Fan-out call %r failed: %s", key, e)
+        return Outcome(key, None, ERROR, str(e), elapsed=loop.time() - start)
+
+
+async def fan_out(calls: list[tuple[Hashable, Callable[[], Awaitable[Any]], float]]) -> list[Outcome]:
+    """Run (key, factory, deadline) calls concurrently; outcomes keep input order."""
+    return list(await asyncio.gather(*[call_with_deadline(k, f, d) for k, f, d in calls]))
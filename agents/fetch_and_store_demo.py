@@ -10,13 +10,14 @@ import argparse
 import asyncio
 import os
 
-from price_agent import get_price
+from price_agent import get_price_async, close_client
 
 import importlib
 
 
 async def main(symbol: str):
-    price = get_price(symbol)
+    price = await get_price_async(symbol)
+    await close_client()
     print(f"Fetched price for {symbol}: {price}")
 
     # import storage_agent lazily
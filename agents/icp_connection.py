@@ -0,0 +1,160 @@
+"""Shared ic-py connections for canister calls.
+
+Building an ic-py `Client`, parsing the identity PEM and constructing an
+`Agent` is done once per (replica URL, identity path) and reused by every
+later call; a different URL or identity path (i.e. a config change) gets its
+own connection. ic-py's `update_raw` / `query_raw` are blocking, so async
+callers go through `update()` / `query()`, which run them on a bounded thread
+pool instead of the event loop. Sync callers (CLI scripts, sync FastAPI
+endpoints) use `update_sync()`.
+
+Usage:
+  from icp_connection import get_icp_manager
+  res = await get_icp_manager().update(url, identity_path, canister_id, "add_chat_entry", arg)
+
+Configuration (env):
+- ICP_THREAD_POOL_SIZE: max concurrent blocking ic-py calls (default 4)
+"""
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable
+
+logger = logging.getLogger("icp_connection")
+
+ICP_THREAD_POOL_SIZE = int(os.getenv("ICP_THREAD_POOL_SIZE", "4"))
+
+
+class ICPUnavailableError(RuntimeError):
+    """Raised when ic-py is not installed."""
+
+
+class ICPConnectionError(RuntimeError):
+    """Raised when the client, identity or agent could not be built."""
+
+
+@dataclass(frozen=True)
+class ICPConnection:
+    url: str
+    identity_path: str | None
+    client: Any
+    identity: Any
+    agent: Any
+
+
+def _default_factory(url: str, identity_path: str | None) -> tuple:
+    try:
+        from ic.client import Client
+        from ic.identity import Identity
+        from ic.agent import Agent as ICAgent
+    except Exception as e:
+        raise ICPUnavailableError(f"ic-py not installed in environment: {e}")
+    client = Client(url=url)
+    if identity_path:
+        with open(identity_path, "r") as f:
+            identity = Identity.from_pem(f.read())
+    else:
+        # anonymous identity when no key is configured
+        identity = Identity(anonymous=True)
+    return client, identity, ICAgent(identity, client)
+
+
+class ICPConnectionManager:
+    def __init__(
+        self,
+        max_workers: int = ICP_THREAD_POOL_SIZE,
+        factory: Callable[[str, str | None], tuple] = _default_factory,
+    ):
+        self.max_workers = max(1, max_workers)
+        self._factory = factory
+        self._conns: dict[tuple, ICPConnection] = {}
+        self._lock = threading.Lock()
+        self._pool: ThreadPoolExecutor | None = None
+        self.builds = 0
+        self.calls = 0
+
+    def connection(self, url: str, identity_path: str | None = None) -> ICPConnection:
+        """Return the cached connection for (url, identity_path), building it once."""
+        key = (url, identity_path)
+        conn = self._conns.get(key)
+        if conn is not None:
+            return conn
+        with self._lock:
+            conn = self._conns.get(key)
+            if conn is None:
+                try:
+                    client, identity, agent = self._factory(url, identity_path)
+                except ICPUnavailableError:
+                    raise
+                except Exception as e:
+                    logger.exception("Failed to build ic-py connection for %s", url)
+                    raise ICPConnectionError(str(e)) from e
+                conn = self._conns[key] = ICPConnection(url, identity_path, client, identity, agent)
+                self.builds += 1
+                logger.info("Built ic-py connection for %s (identity=%s)", url, bool(identity_path))
+        return conn
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="icp")
+        return self._pool
+
+    def update_sync(self, url: str, identity_path: str | None, canister_id: str, method: str, arg: bytes, **kwargs) -> Any:
+        conn = self.connection(url, identity_path)
+        self.calls += 1
+        return conn.agent.update_raw(canister_id=canister_id, method_name=method, arg=arg, **kwargs)
+
+    def query_sync(self, url: str, identity_path: str | None, canister_id: str, method: str, arg: bytes, **kwargs) -> Any:
+        conn = self.connection(url, identity_path)
+        self.calls += 1
+        return conn.agent.query_raw(canister_id=canister_id, method_name=method, arg=arg, **kwargs)
+
+    async def _run(self, fn, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor(), lambda: fn(*args, **kwargs))
+
+    async def connect(self, url: str, identity_path: str | None = None) -> ICPConnection:
+        """Async `connection()`; a first build (PEM read) runs on the pool."""
+        conn = self._conns.get((url, identity_path))
+        if conn is not None:
+            return conn
+        return await self._run(self.connection, url, identity_path)
+
+    async def update(self, url: str, identity_path: str | None, canister_id: str, method: str, arg: bytes, **kwargs) -> Any:
+        return await self._run(self.update_sync, url, identity_path, canister_id, method, arg, **kwargs)
+
+    async def query(self, url: str, identity_path: str | None, canister_id: str, method: str, arg: bytes, **kwargs) -> Any:
+        return await self._run(self.query_sync, url, identity_path, canister_id, method, arg, **kwargs)
+
+    def invalidate(self, url: str | None = None, identity_path: str | None = None):
+        """Drop cached connections (all, or the one for url/identity_path)."""
+        with self._lock:
+            if url is None:
+                self._conns.clear()
+            else:
+                self._conns.pop((url, identity_path), None)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        return {"connections": len(self._conns), "builds": self.builds, "calls": self.calls, "max_workers": self.max_workers}
+
+
+_manager: ICPConnectionManager | None = None
+
+
+def get_icp_manager() -> ICPConnectionManager:
+    """Return the process-wide connection manager."""
+    global _manager
+    if _manager is None:
+        _manager = ICPConnectionManager()
+    return _manager
@@ -0,0 +1,192 @@
+"""Shared intent and entity extraction for the orchestrators.
+
+All intent keywords (Indonesian and English) and every coin alias are
+compiled once into a single Aho-Corasick automaton, so `parse()` scans the
+lowercased query in one pass regardless of how many aliases are registered.
+
+Usage:
+  from intents import get_engine
+  parsed = get_engine().parse("berapa harga btc dan eth?")
+  parsed.intents   -> ["price"]
+  parsed.coin_ids  -> ["bitcoin", "ethereum"]
+"""
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Iterable
+
+# Intent keywords match at the start of a word so Indonesian suffixes such as
+# "harganya" or "beritanya" are still recognised. "kabar" alone is the
+# greeting "apa kabar", so it only counts as news in these phrases.
+INTENT_KEYWORDS = {
+    "price": ["harga", "price", "kurs", "nilai tukar"],
+    "news": ["berita", "news", "headline", "kabar terbaru", "kabar crypto", "kabar kripto"],
+}
+
+# number of best-ranked registry coins whose names/tickers are matched in text
+INTENT_ALIAS_LIMIT = int(os.getenv("INTENT_ALIAS_LIMIT", "250"))
+
+
+@dataclass(frozen=True)
+class Match:
+    start: int
+    end: int
+    kind: str  # "intent" or "coin"
+    value: str  # intent name or coin id
+    text: str  # the matched alias/keyword
+
+
+@dataclass
+class ParsedQuery:
+    text: str
+    intents: list[str] = field(default_factory=list)
+    entities: list[Match] = field(default_factory=list)
+    matches: list[Match] = field(default_factory=list)
+
+    @property
+    def coin_ids(self) -> list[str]:
+        return [m.value for m in self.entities]
+
+    def entities_for(self, intent: str) -> list[Match]:
+        """Coins named in the clause of `intent`, e.g. "eth" in "harga btc dan berita eth".
+
+        A clause runs from the intent keyword to the next keyword of a
+        different intent. Falls back to every entity when the clause names none.
+        """
+        found, active, seen = [], False, set()
+        for m in self.matches:
+            if m.kind == "intent":
+                active = m.value == intent
+            elif active and m.value not in seen:
+                seen.add(m.value)
+                found.append(m)
+        return found or list(self.entities)
+
+
+class AhoCorasick:
+    """Minimal Aho-Corasick automaton over lowercase string patterns.
+
+    Each pattern carries an opaque payload returned with its matches.
+    """
+
+    def __init__(self):
+        self._goto: list[dict] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, payload) -> None:
+        if self._built:
+            raise RuntimeError("automaton already built")
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(pattern), payload))
+
+    def build(self) -> "AhoCorasick":
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                cand = self._goto[f].get(ch, 0)
+                self._fail[nxt] = cand if cand != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+        return self
+
+    def iter(self, text: str):
+        """Yield (start, end, payload) for every pattern occurrence in `text`."""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, payload in out[node]:
+                yield i + 1 - length, i + 1, payload
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+
+def _is_boundary(text: str, i: int) -> bool:
+    return i < 0 or i >= len(text) or not text[i].isalnum()
+
+
+class IntentEngine:
+    def __init__(self, intent_keywords: dict[str, Iterable[str]], coin_aliases: dict[str, str]):
+        ac = AhoCorasick()
+        for intent, words in intent_keywords.items():
+            for w in words:
+                ac.add(w.lower(), ("intent", intent, False))
+        for alias, coin_id in coin_aliases.items():
+            if alias:
+                ac.add(alias.lower(), ("coin", coin_id, True))
+        self._ac = ac.build()
+        self.alias_count = len(coin_aliases)
+
+    def parse(self, text: str) -> ParsedQuery:
+        """Return every intent and coin entity in `text`, in order of appearance.
+
+        Coin aliases must match whole words; when aliases overlap the longest
+        one wins ("bitcoin cash" over "bitcoin").
+        """
+        low = text.lower()
+        candidates = []
+        for start, end, (kind, value, whole_word) in self._ac.iter(low):
+            if not _is_boundary(low, start - 1):
+                continue
+            if whole_word and not _is_boundary(low, end):
+                continue
+            candidates.append(Match(start, end, kind, value, low[start:end]))
+
+        # keep the longest non-overlapping matches, scanning left to right
+        candidates.sort(key=lambda m: (m.start, -(m.end - m.start)))
+        matches = []
+        last_end = -1
+        for m in candidates:
+            if m.start >= last_end:
+                matches.append(m)
+                last_end = m.end
+
+        parsed = ParsedQuery(text=text, matches=matches)
+        seen_coins = set()
+        for m in matches:
+            if m.kind == "intent":
+                if m.value not in parsed.intents:
+                    parsed.intents.append(m.value)
+            elif m.value not in seen_coins:
+                seen_coins.add(m.value)
+                parsed.entities.append(m)
+        return parsed
+
+
+_engine: IntentEngine | None = None
+
+
+def build_engine(coin_aliases: dict[str, str] | None = None) -> IntentEngine:
+    if coin_aliases is None:
+        from coin_registry import get_registry
+        from price_agent import SYMBOL_TO_ID
+
+        coin_aliases = {**get_registry().aliases(limit=INTENT_ALIAS_LIMIT), **SYMBOL_TO_ID}
+    return IntentEngine(INTENT_KEYWORDS, coin_aliases)
+
+
+def get_engine() -> IntentEngine:
+    """Return the process-wide engine, building it on first use."""
+    global _engine
+    if _engine is None:
+        _engine = build_engine()
+    return _engine
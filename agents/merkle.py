@@ -0,0 +1,63 @@
+"""SHA-256 Merkle trees over hex content hashes, with inclusion proofs.
+
+The tree is built the same way as `icp_canister/anchor_job.py`: leaves are
+the raw 32-byte content hashes, each parent is sha256(left || right), and an
+odd level duplicates its last node. A one-leaf tree's root is the leaf.
+
+A proof is the list of siblings from the leaf up to the root, each as
+{"position": "left" | "right", "hash": <hex>}, where position says on which
+side the sibling sits.
+"""
+import hashlib
+
+
+def _parent(a: bytes, b: bytes) -> bytes:
+    return hashlib.sha256(a + b).digest()
+
+
+def build(hashes: list[str]) -> tuple[str, list[list[dict]]]:
+    """Return (root_hex, proofs) with one proof per input hash, in order."""
+    if not hashes:
+        raise ValueError("cannot build a Merkle tree without leaves")
+    level = [bytes.fromhex(h) for h in hashes]
+    # index of each leaf's ancestor in the current level
+    positions = list(range(len(level)))
+    proofs: list[list[dict]] = [[] for _ in level]
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        for leaf, pos in enumerate(positions):
+            if pos % 2 == 0:
+                proofs[leaf].append({"position": "right", "hash": level[pos + 1].hex()})
+            else:
+                proofs[leaf].append({"position": "left", "hash": level[pos - 1].hex()})
+            positions[leaf] = pos // 2
+        level = [_parent(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex(), proofs
+
+
+def root(hashes: list[str]) -> str:
+    """Root only; skips the per-leaf proof bookkeeping of `build`."""
+    if not hashes:
+        raise ValueError("cannot build a Merkle tree without leaves")
+    level = [bytes.fromhex(h) for h in hashes]
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [_parent(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def root_from_proof(leaf: str, proof: list[dict]) -> str:
+    node = bytes.fromhex(leaf)
+    for step in proof:
+        sibling = bytes.fromhex(step["hash"])
+        node = _parent(sibling, node) if step["position"] == "left" else _parent(node, sibling)
+    return node.hex()
+
+
+def verify_proof(leaf: str, proof: list[dict], root_hex: str) -> bool:
+    try:
+        return root_from_proof(leaf, proof) == root_hex.lower()
+    except (KeyError, TypeError, ValueError):
+        return False
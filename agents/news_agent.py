@@ -1,9 +1,12 @@
-"""Stub NewsAgent: returns mocked news headlines for request text."""
-def get_news(query: str) -> str:
-    # naive stubbed response
-    return "(stub) Tidak ada berita baru yang relevan untuk query Anda."
+"""NewsAgent: crypto headlines from CryptoPanic.
+
+`get_news_reply(topic)` is the helper used by the lightweight
+orchestrator; it returns a stub reply when no API key is configured or the
+upstream call fails. `get_news` is the uagents message handler.
+"""
+import asyncio
 import os
-import requests
+import httpx
 from dotenv import load_dotenv
 from typing import Any
 from pydantic import BaseModel
@@ -18,6 +21,10 @@ CRYPTO_PANIC_API_KEY = os.getenv("CRYPTO_PANIC_API_KEY")
 agent = None
 
 CRYPTO_PANIC_API_URL = "https://cryptopanic.com/api/v1/posts/"
+NEWS_TIMEOUT = float(os.getenv("NEWS_TIMEOUT", "10"))
+NEWS_MAX_ARTICLES = 5
+
+STUB_REPLY = "(stub) Tidak ada berita baru yang relevan untuk query Anda."
 
 class NewsRequest(BaseModel):
     topic: str  # contoh: "BTC" atau "ETH"
@@ -38,6 +45,63 @@ async def initialize(ctx: Any):
         ctx.logger.info(f"NewsAgent address: {agent.address}")
 
 
+_client: httpx.AsyncClient | None = None
+_client_loop = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    # pooled client, bound to the running event loop
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(timeout=NEWS_TIMEOUT)
+        _client_loop = loop
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None and not _client.is_closed and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client = None
+
+
+async def fetch_news(topic: str, timeout: float | None = None) -> list[NewsArticle]:
+    """Return the top CryptoPanic headlines for a currency code such as "BTC"."""
+    if not CRYPTO_PANIC_API_KEY:
+        raise RuntimeError("CryptoPanic API key is not configured.")
+    params = {
+        "auth_token": CRYPTO_PANIC_API_KEY,
+        "currencies": topic.upper(),
+        "public": "true"
+    }
+    resp = await asyncio.wait_for(_get_client().get(CRYPTO_PANIC_API_URL, params=params), timeout or NEWS_TIMEOUT)
+    resp.raise_for_status()
+    data = resp.json()
+    return [
+        NewsArticle(title=post['title'], url=post['url'])
+        for post in data.get('results', [])[:NEWS_MAX_ARTICLES]
+    ]
+
+
+def format_news_reply(topic: str, articles: list[NewsArticle]) -> str:
+    titles = [f"- {a.title}" for a in articles]
+    return f"Berikut adalah berita teratas tentang {topic.upper()}:\n" + "\n".join(titles)
+
+
+async def get_news_reply(topic: str | None) -> str:
+    """Reply text with headlines for `topic`, or the stub reply when unavailable."""
+    if not topic or not CRYPTO_PANIC_API_KEY:
+        return STUB_REPLY
+    try:
+        articles = await fetch_news(topic)
+    except Exception:
+        return STUB_REPLY
+    if not articles:
+        return STUB_REPLY
+    return format_news_reply(topic, articles)
+
+
 async def get_news(ctx: Any, sender: str, msg: NewsRequest):
     ctx.logger.info(f"Received news request for topic: {msg.topic}")
 
@@ -48,23 +112,10 @@ async def get_news(ctx: Any, sender: str, msg: NewsRequest):
         return
 
     try:
-        params = {
-            "auth_token": CRYPTO_PANIC_API_KEY,
-            "currencies": msg.topic.upper(),
-            "public": "true"
-        }
-        response = requests.get(CRYPTO_PANIC_API_URL, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-
-        articles = [
-            NewsArticle(title=post['title'], url=post['url'])
-            for post in data.get('results', [])[:5] # Ambil 5 berita teratas
-        ]
-
+        articles = await fetch_news(msg.topic)
         await ctx.send(sender, NewsResponse(articles=articles, success=True))
 
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, asyncio.TimeoutError) as e:
         error_str = f"API call failed: {e}"
         ctx.logger.error(error_str)
         await ctx.send(sender, NewsResponse(articles=[], success=False, error=error_str))
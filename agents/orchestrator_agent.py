@@ -6,6 +6,9 @@ from pathlib import Path
 from dotenv import load_dotenv
 from pydantic import BaseModel
 
+from intents import get_engine
+from fanout import TIMEOUT, fan_out
+
 # avoid importing uagents at module import time; will lazy-import when running
 Httpy = None
 HttpyRequest = None
@@ -19,6 +22,9 @@ AGENT_SEED = os.getenv("ORCHESTRATOR_AGENT_SEED", "orchestrator_agent_secret_see
 PRICE_AGENT_ADDRESS = os.getenv("PRICE_AGENT_ADDRESS")
 NEWS_AGENT_ADDRESS = os.getenv("NEWS_AGENT_ADDRESS")
 STORAGE_AGENT_ADDRESS = os.getenv("STORAGE_AGENT_ADDRESS")
+# Tenggat per agen (detik); permintaan harga dan berita berjalan serentak
+PRICE_QUERY_TIMEOUT = float(os.getenv("PRICE_QUERY_TIMEOUT", "15"))
+NEWS_QUERY_TIMEOUT = float(os.getenv("NEWS_QUERY_TIMEOUT", "20"))
 AGENTVERSE_ENABLED = os.getenv("AGENTVERSE_ENABLED", "false").lower() in ("1", "true", "yes")
 
 if AGENTVERSE_ENABLED:
@@ -58,6 +64,9 @@ class StoreChat(BaseModel):
 # Inisialisasi Agen Orchestrator
 agent = None
 
+# intent/entity automaton shared with orchestrator_simple, compiled once
+intent_engine = get_engine()
+
 # httpy will be created if/when the agent is instantiated
 httpy = None
 
@@ -72,53 +81,70 @@ async def handle_query(request: Any, ctx: Any):
     user_query = data.get("text", "").lower()
     ctx.logger.info(f"Received query from frontend: {user_query}")
 
-    response_text = ""
+    parsed = intent_engine.parse(user_query)
+
+    # Susun semua sub-permintaan lalu kirim serentak, masing-masing dengan tenggat sendiri
+    calls = []
+    parts = {}
 
-    # Logika parsing maksud (intent parsing) sederhana
-    if "harga" in user_query:
-        try:
-            # Ekstrak nama koin dari query
-            coin = user_query.split("harga", 1)[1].strip()
-            if coin and PRICE_AGENT_ADDRESS:
+    if "price" in parsed.intents:
+        coins = [m.value for m in parsed.entities_for("price")]
+        if coins and PRICE_AGENT_ADDRESS:
+            for coin in coins:
                 ctx.logger.info(f"Intent: 'price', Entity: '{coin}'")
-                # Kirim pesan ke PriceAgent dan tunggu respons
-                price_response: PriceResponse = await ctx.query(
-                    destination=PRICE_AGENT_ADDRESS,
-                    message=PriceRequest(coin_id=coin),
-                    timeout=15.0
-                )
-                if price_response.success:
-                    response_text = f"Harga {coin.capitalize()} saat ini adalah ${price_response.price} USD."
-                else:
-                    response_text = f"Maaf, saya tidak dapat menemukan harga untuk {coin}."
+                calls.append((
+                    ("price", coin),
+                    lambda coin=coin: ctx.query(destination=PRICE_AGENT_ADDRESS, message=PriceRequest(coin_id=coin), timeout=PRICE_QUERY_TIMEOUT),
+                    PRICE_QUERY_TIMEOUT,
+                ))
+        else:
+            parts[("price", None)] = "Mohon sebutkan nama koin yang ingin Anda ketahui harganya."
+
+    if "news" in parsed.intents:
+        # Topik berita: koin yang dikenali, atau sisa teks setelah kata kunci
+        news_entities = parsed.entities_for("news")
+        if news_entities:
+            topic = news_entities[0].text
+        else:
+            kw = next(m for m in parsed.matches if m.value == "news")
+            topic = user_query[kw.end:].strip()
+        if topic and NEWS_AGENT_ADDRESS:
+            ctx.logger.info(f"Intent: 'news', Entity: '{topic}'")
+            calls.append((
+                ("news", topic),
+                lambda: ctx.query(destination=NEWS_AGENT_ADDRESS, message=NewsRequest(topic=topic), timeout=NEWS_QUERY_TIMEOUT),
+                NEWS_QUERY_TIMEOUT,
+            ))
+        else:
+            parts[("news", None)] = "Mohon sebutkan topik berita yang ingin Anda cari."
+
+    for outcome in await fan_out(calls):
+        kind, entity = outcome.key
+        if kind == "price":
+            if outcome.status == TIMEOUT:
+                text = f"Maaf, harga {entity} belum tersedia (waktu habis)."
+            elif not outcome.ok:
+                text = f"Terjadi kesalahan saat memproses permintaan harga: {outcome.error}"
+            elif outcome.value.success:
+                text = f"Harga {entity.capitalize()} saat ini adalah ${outcome.value.price} USD."
             else:
-                response_text = "Mohon sebutkan nama koin yang ingin Anda ketahui harganya."
-        except Exception as e:
-            response_text = f"Terjadi kesalahan saat memproses permintaan harga: {e}"
-
-    elif "berita" in user_query:
-        try:
-            # Ekstrak topik berita dari query
-            topic = user_query.split("berita", 1)[1].strip()
-            if topic and NEWS_AGENT_ADDRESS:
-                ctx.logger.info(f"Intent: 'news', Entity: '{topic}'")
-                # Kirim pesan ke NewsAgent dan tunggu respons
-                news_response: NewsResponse = await ctx.query(
-                    destination=NEWS_AGENT_ADDRESS,
-                    message=NewsRequest(topic=topic),
-                    timeout=20.0
-                )
-                if news_response.success and news_response.articles:
-                    # Format beberapa judul berita
-                    titles = [f"- {article.get('title')}" for article in news_response.articles]
-                    response_text = f"Berikut adalah berita teratas tentang {topic.upper()}:\n" + "\n".join(titles)
-                else:
-                    response_text = f"Maaf, saya tidak dapat menemukan berita tentang {topic}."
+                text = f"Maaf, saya tidak dapat menemukan harga untuk {entity}."
+        else:
+            if outcome.status == TIMEOUT:
+                text = f"Maaf, berita tentang {entity} belum tersedia (waktu habis)."
+            elif not outcome.ok:
+                text = f"Terjadi kesalahan saat memproses permintaan berita: {outcome.error}"
+            elif outcome.value.success and outcome.value.articles:
+                # Format beberapa judul berita
+                titles = [f"- {article.get('title')}" for article in outcome.value.articles]
+                text = f"Berikut adalah berita teratas tentang {entity.upper()}:\n" + "\n".join(titles)
             else:
-                response_text = "Mohon sebutkan topik berita yang ingin Anda cari."
-        except Exception as e:
-            response_text = f"Terjadi kesalahan saat memproses permintaan berita: {e}"
+                text = f"Maaf, saya tidak dapat menemukan berita tentang {entity}."
+        parts[outcome.key] = text
 
+    if parts:
+        # urutkan jawaban: harga dulu, lalu berita
+        response_text = "\n".join(parts[k] for k in sorted(parts, key=lambda k: k[0] != "price"))
     else:
         response_text = "Maaf, saya tidak mengerti. Anda bisa bertanya tentang 'harga' atau 'berita' mata uang kripto."
 
@@ -2,15 +2,30 @@
 This coexists with the existing orchestrator_agent.py file.
 """
 import os
+import json
 import uuid
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from pydantic import BaseModel
 from uamodels import StoreChat
-from price_agent import get_price
-from news_agent import get_news
+from price_agent import get_price_async, get_prices, close_client as close_price_client
+from price_cache import price_cache
+from reply_cache import reply_cache
+from fanout import Outcome, TIMEOUT, call_with_deadline, fan_out
+from news_agent import get_news_reply, close_client as close_news_client, STUB_REPLY as NEWS_STUB_REPLY
+from coin_registry import get_registry
+from intents import get_engine
+from storage_queue import WriteBehindQueue, QueueFullError
+from storage_transport import StorageTransport, create_transport
+import runtime_config
+from event_log import AccessLogMiddleware, close_all as close_event_logs, get_event_log
+from entry_store import get_entry_store
 from typing import Optional
 from fastapi import Depends, Header, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 
 # Scheduler
@@ -22,7 +37,32 @@ except Exception:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("orchestrator_simple")
 
-app = FastAPI()
+# intent/entity automaton, compiled once per process
+intent_engine = get_engine()
+
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    runtime_config.reload()
+    # in-process storage replays its outbox backlog now, not on the next write
+    await get_storage_transport().start()
+    runtime_config.start_watcher()
+    yield
+    runtime_config.stop_watcher()
+    # deliver queued StoreChat messages before exiting
+    await storage_queue.drain()
+    # then close the transport (and an in-process storage outbox)
+    await get_storage_transport().aclose()
+    # release pooled upstream connections on shutdown
+    await close_price_client()
+    await close_news_client()
+    # flush buffered access/audit/storage records
+    close_event_logs()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(AccessLogMiddleware)
 # create agent lazily to avoid import-time side-effects
 agent = None
 
@@ -51,22 +91,11 @@ def _ensure_scheduler():
 def _check_schedule_token(authorization: Optional[str] = Header(None), x_scheduler_token: Optional[str] = Header(None)):
     """Require a bearer token via Authorization header or X-Scheduler-Token header when SCHEDULE_TOKEN is set.
 
-    The token is read from the environment on every request so admins can rotate
-    the token without restarting the process.
+    The token comes from the runtime config snapshot (token file, else the
+    SCHEDULE_TOKEN env var), which is reloaded when the token file changes,
+    on /schedule/rotate and on /admin/config/reload.
     """
-    # Token resolution order:
-    # 1. If a token file exists, read it (persisted token)
-    # 2. Else read SCHEDULE_TOKEN env var
-    configured = ""
-    token_file = os.environ.get("SCHEDULE_TOKEN_FILE", "./.schedule_token")
-    try:
-        if os.path.exists(token_file):
-            with open(token_file, "r") as f:
-                configured = f.read().strip()
-    except Exception:
-        configured = ""
-    if not configured:
-        configured = os.environ.get("SCHEDULE_TOKEN", "")
+    configured = runtime_config.current().schedule_token
     # If no token configured, skip auth
     if not configured:
         return True
@@ -86,131 +115,285 @@ def _check_schedule_token(authorization: Optional[str] = Header(None), x_schedul
     return True
 
 
+# storage transport, resolved once (lifespan startup or first use)
+storage_transport: Optional[StorageTransport] = None
+
+
+def get_storage_transport() -> StorageTransport:
+    global storage_transport
+    if storage_transport is None:
+        storage_transport = create_transport(agent=agent)
+        logger.info("Storage transport: %s", storage_transport.info())
+    return storage_transport
+
+
+def _deliver(item):
+    # a list is a batch from /query/batch and goes out as one submission
+    if isinstance(item, list):
+        return get_storage_transport().send_many(item)
+    return get_storage_transport().send(item)
+
+
+# StoreChat messages from /query are delivered by background workers
+storage_queue = WriteBehindQueue(_deliver)
+
+
 class QueryIn(BaseModel):
     text: str
 
 
+QUERY_BATCH_MAX = int(os.getenv("QUERY_BATCH_MAX", "5000"))
+# /query/batch StoreChat records are queued in chunks of this many, so a full
+# queue under "drop-oldest" loses at most one chunk rather than a whole batch
+QUERY_BATCH_STORE_CHUNK = max(1, int(os.getenv("QUERY_BATCH_STORE_CHUNK", "100")))
+
+
+class QueryBatchIn(BaseModel):
+    texts: list[str]
+
+
+FALLBACK_REPLY = "Maaf, saya tidak mengerti."
+
+
+def _ticker(coin_id: str) -> str:
+    coin = get_registry().lookup(coin_id)
+    return (coin["symbol"] if coin and coin["symbol"] else coin_id).upper()
+
+
+# Answerers take normalized coin ids and return (reply, cacheable). Replies
+# depend only on those ids, so they can be shared through the reply cache.
+async def _answer_price(coin_ids: list[str]) -> tuple[str, bool]:
+    # default to BTC when no coin was named
+    coin_ids = coin_ids or ["bitcoin"]
+    prices = await asyncio.gather(*[get_price_async(coin_id) for coin_id in coin_ids])
+    reply = "; ".join(f"Harga {_ticker(c)} saat ini adalah {p}" for c, p in zip(coin_ids, prices))
+    return reply, "unknown" not in prices
+
+
+async def _answer_news(coin_ids: list[str]) -> tuple[str, bool]:
+    # CryptoPanic filters by ticker, so use the first named coin's symbol
+    topic = _ticker(coin_ids[0]) if coin_ids else None
+    reply = await get_news_reply(topic)
+    return reply, reply != NEWS_STUB_REPLY
+
+
+# intent name -> coroutine producing that part of the reply
+ANSWERERS = {
+    "price": _answer_price,
+    "news": _answer_news,
+}
+
+
+# per-intent deadlines; a part that misses its deadline is marked, not awaited
+INTENT_DEADLINES = {
+    "price": float(os.getenv("QUERY_DEADLINE_PRICE", "3")),
+    "news": float(os.getenv("QUERY_DEADLINE_NEWS", "5")),
+}
+PART_FAILURE_REPLIES = {
+    "price": "Maaf, harga belum tersedia ({status}).",
+    "news": "Maaf, berita belum tersedia ({status}).",
+}
+
+
+async def _answer(intent: str, parsed) -> str:
+    """Answer one intent of a parsed query through the normalized reply cache."""
+    coin_ids = [m.value for m in parsed.entities_for(intent)]
+    return await reply_cache.get_or_compute(intent, coin_ids, lambda: ANSWERERS[intent](coin_ids))
+
+
+def _part(outcome: Outcome) -> dict:
+    intent = outcome.key
+    if outcome.ok:
+        return {"intent": intent, "reply": outcome.value, "status": outcome.status}
+    status_text = "waktu habis" if outcome.status == TIMEOUT else "terjadi kesalahan"
+    return {"intent": intent, "reply": PART_FAILURE_REPLIES[intent].format(status=status_text), "status": outcome.status}
+
+
+def _answer_calls(parsed) -> list:
+    intents = [i for i in parsed.intents if i in ANSWERERS]
+    return [(i, (lambda i=i: _answer(i, parsed)), INTENT_DEADLINES[i]) for i in intents]
+
+
+async def answer_query(parsed) -> list[dict]:
+    """Answer every intent of a query concurrently, each within its own deadline.
+
+    Returns one part per intent ({"intent", "reply", "status"}) in the order
+    the intents appear in the query, or a single fallback part.
+    """
+    calls = _answer_calls(parsed)
+    if not calls:
+        return [{"intent": "fallback", "reply": FALLBACK_REPLY, "status": "ok"}]
+    return [_part(o) for o in await fan_out(calls)]
+
+
 @app.post("/query")
 async def query_endpoint(q: QueryIn):
     text = q.text
-    # naive intent parsing + delegate to stub agents
-    if any(w in text.lower() for w in ["harga", "price"]):
-        # try to extract symbol
-        symbol = "btc"
-        for s in ["btc", "bitcoin", "eth", "ethereum"]:
-            if s in text.lower():
-                symbol = s
-                break
-        reply = f"Harga {symbol.upper()} saat ini adalah {get_price(symbol)}"
-    elif any(w in text.lower() for w in ["berita", "news"]):
-        reply = get_news(text)
-    else:
-        reply = "Maaf, saya tidak mengerti."
+    parsed = intent_engine.parse(text)
+    parts = await answer_query(parsed)
+    reply = "\n".join(p["reply"] for p in parts)
 
     entry_id = str(uuid.uuid4())
     msg = StoreChat(entry_id=entry_id, entry=f"Q: {text} -- A: {reply}")
-    # send to storage_agent (non-blocking)
-    async def _send(dest, message):
-        global agent
-        # prefer agent.send if available
-        send_fn = getattr(agent, "send", None) if agent is not None else None
-        if send_fn:
-            return await send_fn(dest, message)
-
-        # If agent not created, try to instantiate uagents.Agent from module (test provides a fake Agent)
-        try:
-            import uagents as _uagents_module
-            AgentClass = getattr(_uagents_module, "Agent", None)
-            if AgentClass and agent is None:
-                # create global agent instance
-                agent = AgentClass()
-                send_fn = getattr(agent, "send", None)
-                if send_fn:
-                    return await send_fn(dest, message)
-            # fall back to module-level send function if present
-            send_mod_fn = getattr(_uagents_module, "send", None)
-            if send_mod_fn:
-                return await send_mod_fn(agent, dest, message)
-        except Exception:
-            pass
+    # hand off to the write-behind queue; delivery happens in the background
+    try:
+        await storage_queue.submit(msg)
+    except QueueFullError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="storage queue full")
+
+    return {"reply": reply, "entry_id": entry_id, "parts": parts}
 
-        # Fallback: try HTTP submit to storage agent (useful if other uagents APIs are not available)
-        try:
-            # if storage_agent module is available locally, call its handler directly (in-process)
-            if dest == "storage_agent":
-                try:
-                    import storage_agent as sa
-                    # create a fake ctx with logger and send
-                    class Ctx:
-                        def __init__(self):
-                            import logging
-                            self.logger = logging.getLogger("orchestrator_simple")
-
-                        async def send(self, to, msg):
-                            return True
-
-                    ctx = Ctx()
-                    # call handler directly
-                    if hasattr(sa, "handle_store_chat"):
-                        await sa.handle_store_chat(ctx, getattr(agent, "address", "orchestrator_simple"), message)
-                        return True
-                except Exception:
-                    pass
-            # fallback to HTTP POST if storage agent is running as a server
-            import requests
-            submit_url = "http://127.0.0.1:8000/submit"
-            payload = {
-                "destination": dest,
-                "message": {"entry_id": getattr(message, "entry_id", None), "entry": getattr(message, "entry", None)},
-                "sender": getattr(agent, "address", "orchestrator_simple")
-            }
-            resp = requests.post(submit_url, json=payload, timeout=2)
-            if resp.status_code in (200, 202):
-                return True
-        except Exception:
-            pass
 
-        # neither available
-        raise RuntimeError("no send API available on Agent or uagents module")
+def _normalized_key(parsed) -> tuple:
+    return tuple((i, tuple(m.value for m in parsed.entities_for(i))) for i in parsed.intents if i in ANSWERERS)
+
+
+@app.post("/query/batch")
+async def query_batch_endpoint(b: QueryBatchIn):
+    """Answer many queries in one request; results keep the input order.
+
+    Identical normalized questions are answered once, every coin named in a
+    price clause is priced up front through `get_prices` (one upstream
+    request per chunk), and the StoreChat records are handed to storage as
+    batched submissions of QUERY_BATCH_STORE_CHUNK messages.
+    """
+    if len(b.texts) > QUERY_BATCH_MAX:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"at most {QUERY_BATCH_MAX} texts per batch")
+    parsed_all = [intent_engine.parse(t) for t in b.texts]
+
+    distinct = {}
+    for parsed in parsed_all:
+        distinct.setdefault(_normalized_key(parsed), parsed)
+
+    coin_ids = []
+    for key in distinct:
+        for intent, coins in key:
+            if intent == "price":
+                coin_ids.extend(coins or ("bitcoin",))
+    if coin_ids:
+        # warms the price cache so the per-question answers below are local hits
+        await get_prices(list(dict.fromkeys(coin_ids)), ["usd"])
+
+    answers = dict(zip(distinct, await asyncio.gather(*[answer_query(p) for p in distinct.values()])))
+
+    results, messages = [], []
+    for text, parsed in zip(b.texts, parsed_all):
+        parts = answers[_normalized_key(parsed)]
+        reply = "\n".join(p["reply"] for p in parts)
+        entry_id = str(uuid.uuid4())
+        messages.append(StoreChat(entry_id=entry_id, entry=f"Q: {text} -- A: {reply}"))
+        results.append({"reply": reply, "entry_id": entry_id, "parts": parts})
 
     try:
-        await _send("storage_agent", msg)
-    except Exception as e:
-        logger.exception("Failed to send StoreChat")
-        return {"error": "storage send failed"}
+        for i in range(0, len(messages), QUERY_BATCH_STORE_CHUNK):
+            await storage_queue.submit(messages[i:i + QUERY_BATCH_STORE_CHUNK])
+    except QueueFullError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="storage queue full")
+    return {"results": results, "distinct": len(distinct)}
 
-    return {"reply": reply, "entry_id": entry_id}
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/query/stream")
+async def query_stream_endpoint(q: QueryIn):
+    """Answer a query as Server-Sent Events.
+
+    Each intent's answer is sent as its own event (`price`, `news`, or
+    `fallback`) as soon as it is ready, followed by a `done` event carrying
+    the `entry_id` and the full reply. The StoreChat record is enqueued
+    after the stream has been sent.
+    """
+    text = q.text
+    parsed = intent_engine.parse(text)
+    entry_id = str(uuid.uuid4())
+    parts: dict[str, str] = {}
+    state = {"reply": None}
+
+    async def _events():
+        calls = _answer_calls(parsed)
+        if not calls:
+            parts["fallback"] = FALLBACK_REPLY
+            yield _sse("fallback", {"intent": "fallback", "reply": FALLBACK_REPLY, "status": "ok"})
+        tasks = [asyncio.ensure_future(call_with_deadline(*c)) for c in calls]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                part = _part(await fut)
+                parts[part["intent"]] = part["reply"]
+                yield _sse(part["intent"], part)
+        finally:
+            for t in tasks:
+                t.cancel()
+        order = [c[0] for c in calls] or ["fallback"]
+        reply = "\n".join(parts[i] for i in order)
+        state["reply"] = reply
+        yield _sse("done", {"entry_id": entry_id, "reply": reply})
+
+    async def _persist():
+        # only persist streams that ran to completion
+        if state["reply"] is None:
+            return
+        try:
+            await storage_queue.submit(StoreChat(entry_id=entry_id, entry=f"Q: {text} -- A: {state['reply']}"))
+        except QueueFullError:
+            logger.error("Storage queue full; dropped streamed entry_id=%s", entry_id)
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(_persist),
+    )
+
+
+@app.get("/prices")
+async def prices_endpoint(symbols: str, currencies: str = "usd"):
+    """Batched price lookup, e.g. /prices?symbols=btc,eth,sol&currencies=usd,idr."""
+    syms = [s.strip() for s in symbols.split(",") if s.strip()]
+    vs = [c.strip() for c in currencies.split(",") if c.strip()]
+    if not syms:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="symbols is required")
+    quotes = await get_prices(syms, vs or ["usd"])
+    return {"prices": [q.model_dump() for q in quotes]}
+
+
+@app.get("/history")
+async def history_endpoint(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    q: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+):
+    """Stored entries from the local mirror, newest first.
+
+    Pass the returned `next_cursor` as `cursor` for the next page; `q` is a
+    full-text search and `since`/`until` bound the timestamp (unix seconds).
+    """
+    if cursor is not None and not cursor.isdigit():
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return await get_entry_store().history(limit=limit, cursor=cursor, q=q, since=since, until=until)
 
 
 @app.get("/health")
 async def health_endpoint():
     """Simple health check for the orchestrator service."""
-    return {"status": "ok", "agent": getattr(agent, "address", None)}
+    transport = storage_transport.info() if storage_transport is not None else None
+    return {"status": "ok", "agent": getattr(agent, "address", None), "storage_transport": transport, "price_cache": price_cache.stats(), "reply_cache": reply_cache.stats(), "storage_queue": storage_queue.stats(), "event_log": get_event_log().stats()}
 
 
 async def _scheduled_fetch_and_store(symbol: str):
-    """Job: fetch price and call storage_agent.handle_store_chat in-process."""
+    """Job: fetch price and queue a StoreChat for the storage transport."""
     try:
-        price = get_price(symbol)
-        entry_id = str(uuid.uuid4())
+        # force an upstream fetch so the scheduled job keeps the price cache warm
+        price = await get_price_async(symbol, refresh=True)
         entry = f"Scheduled price {symbol}: {price}"
-        msg = StoreChat(entry_id=entry_id, entry=entry)
-
-        # call storage_agent in-process if available
-        try:
-            import storage_agent as sa
-
-            class Ctx:
-                def __init__(self):
-                    import logging
-                    self.logger = logging.getLogger("orchestrator_scheduler")
-
-                async def send(self, to, msg):
-                    return True
-
-            await sa.handle_store_chat(Ctx(), "orchestrator_scheduler", msg)
-        except Exception:
-            logger.exception("Scheduled fetch_and_store failed to call storage_agent")
+        # no entry_id: the storage agent dedups repeated identical prices by content hash
+        msg = StoreChat(entry=entry)
+        await storage_queue.submit(msg)
+    except QueueFullError:
+        logger.warning("Storage queue full; dropped scheduled price entry for %s", symbol)
     except Exception:
         logger.exception("Scheduled job failed")
 
@@ -227,7 +410,7 @@ async def schedule_start(s: ScheduleIn, request: Request, _auth=Depends(_check_s
     scheduler.add_job(_scheduled_fetch_and_store, "interval", seconds=s.interval_seconds, args=[s.symbol], id=job_id)
     client_ip = request.client.host if request.client else None
     ua = request.headers.get("user-agent")
-    logger.info("Scheduled job started: symbol=%s interval=%s by %s ua=%s", s.symbol, s.interval_seconds, client_ip, ua)
+    get_event_log().emit("audit", "schedule_started", symbol=s.symbol, interval_seconds=s.interval_seconds, client=client_ip, ua=ua)
     return {"ok": True, "job_id": job_id}
 
 
@@ -241,7 +424,7 @@ async def schedule_stop(request: Request, _auth=Depends(_check_schedule_token)):
     scheduler.remove_job(job_id)
     client_ip = request.client.host if request.client else None
     ua = request.headers.get("user-agent")
-    logger.info("Scheduled job stopped by %s ua=%s", client_ip, ua)
+    get_event_log().emit("audit", "schedule_stopped", client=client_ip, ua=ua)
     return {"ok": True}
 
 
@@ -252,8 +435,6 @@ async def schedule_status(request: Request, _auth=Depends(_check_schedule_token)
     if scheduler is None:
         return {"ok": True, "running": False}
     job = scheduler.get_job("fetch_and_store")
-    client_ip = request.client.host if request.client else None
-    logger.info("Schedule status requested by %s", client_ip)
     if not job:
         return {"ok": True, "running": False}
 
@@ -281,19 +462,15 @@ async def schedule_status(request: Request, _auth=Depends(_check_schedule_token)
 
 @app.post("/schedule/rotate")
 async def schedule_rotate(r: RotateIn, request: Request, _auth=Depends(_check_schedule_token)):
-    """Rotate the in-memory schedule token. This updates os.environ['SCHEDULE_TOKEN'] for the running process.
+    """Rotate the schedule token and apply it immediately.
 
-    Note: this change is not persisted to disk; it affects only the current process.
+    The new token is written atomically to SCHEDULE_TOKEN_FILE (falling back to
+    the SCHEDULE_TOKEN env var if the write fails) and the runtime config is
+    reloaded before returning, so the old token stops working right away.
     """
-    # Persist the new token to configured token file (default ./.schedule_token)
-    token_file = os.environ.get("SCHEDULE_TOKEN_FILE", "./.schedule_token")
-    old = None
-    try:
-        if os.path.exists(token_file):
-            with open(token_file, "r") as f:
-                old = f.read().strip()
-    except Exception:
-        old = None
+    cfg = runtime_config.current()
+    token_file = cfg.schedule_token_file
+    old = cfg.schedule_token
 
     try:
         # write token atomically and set restrictive permissions
@@ -308,23 +485,23 @@ async def schedule_rotate(r: RotateIn, request: Request, _auth=Depends(_check_sc
     except Exception:
         # Fall back to in-memory env var if file write fails
         os.environ["SCHEDULE_TOKEN"] = r.new_token or ""
+    runtime_config.reload()
 
+    # audit record goes to the token audit file through the buffered event log
     client_ip = request.client.host if request.client else None
-    logger.info("Schedule token rotated by %s (old set=%s) persisted_to=%s", client_ip, bool(old), token_file)
-
-    # append audit log entry (timestamp, ip, old-present)
-    try:
-        audit_path = os.environ.get("SCHEDULE_TOKEN_AUDIT", "./.schedule_token_audit.log")
-        with open(audit_path, "a") as af:
-            import datetime
-            ts = datetime.datetime.utcnow().isoformat() + "Z"
-            af.write(f"{ts} ip={client_ip} old_present={bool(old)} path={token_file}\n")
-    except Exception:
-        logger.exception("Failed to append schedule token audit log")
+    get_event_log(cfg.schedule_token_audit).emit("audit", "token_rotated", client=client_ip, old_present=bool(old), path=token_file)
 
     return {"ok": True}
 
 
+@app.post("/admin/config/reload")
+async def admin_config_reload(_auth=Depends(_check_schedule_token)):
+    """Re-read env vars and the token file into a fresh runtime config snapshot."""
+    cfg = runtime_config.reload()
+    get_event_log().emit("audit", "config_reloaded")
+    return {"ok": True, "config": cfg.summary()}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
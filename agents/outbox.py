@@ -0,0 +1,374 @@
+"""Durable, segment-based outbox (write-ahead log) for StoreChat entries.
+
+`append()` writes each record to the active segment file and returns only
+after it has been fsynced. Concurrent appends are group-committed: while one
+fsync is running, new records accumulate and share the next one, so ingest
+runs at local-disk speed whatever the canister is doing. A background shipper
+then sends unacknowledged records to the canister in order, in batches,
+retrying with backoff while it is unreachable. After every shipped batch it
+records the highest acknowledged sequence number in a checkpoint file and
+deletes segments that only hold acknowledged records.
+
+On restart (`open`) every record after the checkpoint is replayed into the
+shipper. A torn record at the end of the last segment (crash mid-write) is
+detected by its CRC and truncated away.
+
+On-disk layout (OUTBOX_DIR):
+- seg-<first seq, 20 digits>.log: frames of [u32 length][u32 crc32][JSON record]
+  (a binary payload is stored base64-encoded with "payload_encoding": "base64")
+- checkpoint.json: {"acked_seq": N}
+
+Configuration (env):
+- OUTBOX_DIR (default ./.outbox)
+- OUTBOX_SEGMENT_BYTES: roll to a new segment past this size (default 4194304)
+- OUTBOX_SHIP_BATCH: records per shipped batch (default 50)
+- OUTBOX_RETRY_BASE / OUTBOX_RETRY_MAX: shipper backoff in seconds (default 0.5 / 30)
+"""
+import asyncio
+import base64
+import json
+import logging
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable
+
+logger = logging.getLogger("outbox")
+
+OUTBOX_DIR = os.getenv("OUTBOX_DIR", "./.outbox")
+OUTBOX_SEGMENT_BYTES = int(os.getenv("OUTBOX_SEGMENT_BYTES", str(4 * 1024 * 1024)))
+OUTBOX_SHIP_BATCH = int(os.getenv("OUTBOX_SHIP_BATCH", "50"))
+OUTBOX_RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", "0.5"))
+OUTBOX_RETRY_MAX = float(os.getenv("OUTBOX_RETRY_MAX", "30"))
+
+_HEADER = struct.Struct(">II")
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+@dataclass(frozen=True)
+class OutboxRecord:
+    seq: int
+    entry_id: str
+    payload: str | bytes
+    content_hash: str | None = None
+    signature: str | None = None
+
+
+# ship(records) -> one result dict ({"ok": bool, ...}) per record, in order.
+# A record the canister refused on its own carries "rejected": True; any
+# other failure means the call itself did not go through.
+Ship = Callable[[list], Awaitable[list]]
+
+
+def _segment_name(first_seq: int) -> str:
+    return f"seg-{first_seq:020d}.log"
+
+
+def _encode(record: OutboxRecord) -> bytes:
+    data = asdict(record)
+    if isinstance(record.payload, (bytes, bytearray)):
+        data["payload"] = base64.b64encode(record.payload).decode("ascii")
+        data["payload_encoding"] = "base64"
+    body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return _HEADER.pack(len(body), zlib.crc32(body)) + body
+
+
+def read_segment(path: str) -> tuple[list[OutboxRecord], int]:
+    """Return (records, valid_length); stops at the first torn or corrupt frame."""
+    records = []
+    with open(path, "rb") as f:
+        data = f.read()
+    pos = 0
+    while pos + _HEADER.size <= len(data):
+        length, crc = _HEADER.unpack_from(data, pos)
+        body = data[pos + _HEADER.size:pos + _HEADER.size + length]
+        if len(body) < length or zlib.crc32(body) != crc:
+            break
+        fields = json.loads(body)
+        if fields.pop("payload_encoding", None) == "base64":
+            fields["payload"] = base64.b64decode(fields["payload"])
+        records.append(OutboxRecord(**fields))
+        pos += _HEADER.size + length
+    return records, pos
+
+
+def _unreachable(results: list) -> bool:
+    """True when no record got through and none was refused individually."""
+    if any(r.get("ok") for r in results):
+        return False
+    return any(r.get("circuit_open") for r in results) or not any(r.get("rejected") for r in results)
+
+
+def _fsync_dir(path: str):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class Outbox:
+    def __init__(
+        self,
+        ship: Ship,
+        directory: str = OUTBOX_DIR,
+        segment_bytes: int = OUTBOX_SEGMENT_BYTES,
+        ship_batch: int = OUTBOX_SHIP_BATCH,
+        retry_base: float = OUTBOX_RETRY_BASE,
+        retry_max: float = OUTBOX_RETRY_MAX,
+    ):
+        self._ship = ship
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.ship_batch = max(1, ship_batch)
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        # one thread does every disk write so frames and fsyncs stay ordered
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="outbox")
+        self._opened = False
+        self._file = None
+        self._segment_path: str | None = None
+        self._segment_size = 0
+        self._segments: list[tuple[int, str]] = []  # (first_seq, path), oldest first
+        self._next_seq = 1
+        self.acked_seq = 0
+        self._unshipped: list[OutboxRecord] = []
+        self._pending: list[tuple[OutboxRecord, asyncio.Future]] = []
+        self._committing = False
+        self._loop = None
+        self._shipper: asyncio.Task | None = None
+        self._wake: asyncio.Event | None = None
+        self.appended = 0
+        self.commits = 0
+        self.shipped = 0
+        self.rejected = 0
+        self.ship_failures = 0
+        self.compacted = 0
+
+    # --- recovery -----------------------------------------------------------
+
+    def open(self) -> "Outbox":
+        """Load the checkpoint and replay unacknowledged records (idempotent)."""
+        if self._opened:
+            return self
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(os.path.join(self.directory, CHECKPOINT_FILE)) as f:
+                self.acked_seq = int(json.load(f).get("acked_seq", 0))
+        except FileNotFoundError:
+            self.acked_seq = 0
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith("seg-") and n.endswith(".log"))
+        last_seq = self.acked_seq
+        for i, name in enumerate(names):
+            path = os.path.join(self.directory, name)
+            records, valid = read_segment(path)
+            if valid < os.path.getsize(path):
+                logger.warning("Outbox segment %s has a torn tail; truncating to %d bytes", name, valid)
+                with open(path, "r+b") as f:
+                    f.truncate(valid)
+                    os.fsync(f.fileno())
+            self._segments.append((int(name[4:-4]), path))
+            for r in records:
+                last_seq = max(last_seq, r.seq)
+                if r.seq > self.acked_seq:
+                    self._unshipped.append(r)
+        self._next_seq = last_seq + 1
+        if self._unshipped:
+            logger.info("Outbox replaying %d unacknowledged records", len(self._unshipped))
+        self._opened = True
+        return self
+
+    # --- append path (group commit) -----------------------------------------
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self.open()
+        self._loop = loop
+        self._pending = []
+        self._committing = False
+        self._wake = asyncio.Event()
+        self._shipper = loop.create_task(self._ship_loop())
+        if self._unshipped:
+            self._wake.set()
+
+    async def start(self):
+        """Open the outbox and start the shipper on the running loop."""
+        self._ensure_started()
+
+    async def append(self, entry_id: str, payload: str | bytes, content_hash: str | None = None, signature: str | None = None) -> int:
+        """Durably record one entry; returns its sequence number once fsynced."""
+        self._ensure_started()
+        record = OutboxRecord(self._next_seq, entry_id, payload, content_hash, signature)
+        self._next_seq += 1
+        fut = self._loop.create_future()
+        self._pending.append((record, fut))
+        if not self._committing:
+            self._committing = True
+            self._loop.create_task(self._commit_loop())
+        await fut
+        return record.seq
+
+    async def _commit_loop(self):
+        try:
+            while self._pending:
+                batch, self._pending = self._pending, []
+                records = [r for r, _ in batch]
+                try:
+                    await self._loop.run_in_executor(self._io, self._write_batch, records)
+                except Exception as e:
+                    logger.exception("Outbox commit of %d records failed", len(batch))
+                    for _, fut in batch:
+                        if not fut.done():
+                            fut.set_exception(e)
+                    continue
+                self.commits += 1
+                self.appended += len(records)
+                self._unshipped.extend(records)
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_result(None)
+                self._wake.set()
+        finally:
+            self._committing = False
+
+    def _write_batch(self, records: list[OutboxRecord]):
+        if self._file is None or self._segment_size >= self.segment_bytes:
+            self._roll(records[0].seq)
+        data = b"".join(_encode(r) for r in records)
+        try:
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except BaseException:
+            self._discard_tail()
+            raise
+        self._segment_size += len(data)
+
+    def _discard_tail(self):
+        # a failed write may leave a torn frame; cut the segment back to its
+        # last good size so the next batch is not appended behind it (recovery
+        # stops at the first bad frame and would drop everything after it)
+        path, size = self._segment_path, self._segment_size
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        self._file = None
+        try:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+                os.fsync(f.fileno())
+            self._file = open(path, "ab")
+        except OSError:
+            # the next batch rolls to a fresh segment instead
+            logger.exception("Failed to truncate outbox segment %s after a failed write", path)
+
+    def _roll(self, first_seq: int):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.directory, _segment_name(first_seq))
+        self._file = open(path, "ab")
+        self._segment_path = path
+        self._segment_size = self._file.tell()
+        self._segments.append((first_seq, path))
+        _fsync_dir(self.directory)
+
+    # --- shipping, checkpoints, compaction ----------------------------------
+
+    async def _ship_loop(self):
+        delay = self.retry_base
+        while True:
+            if not self._unshipped:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            batch = self._unshipped[: self.ship_batch]
+            try:
+                results = await self._ship(batch)
+                if len(results) != len(batch):
+                    raise RuntimeError(f"ship returned {len(results)} results for {len(batch)} records")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                results = [{"ok": False, "error": str(e)}] * len(batch)
+            if _unreachable(results):
+                # canister unreachable: keep order, retry the same batch later
+                self.ship_failures += 1
+                # an open circuit breaker reports when it will admit a probe
+                wait = max(delay, results[0].get("retry_after") or 0)
+                logger.warning("Outbox ship of %d records failed (%s); retrying in %.1fs", len(batch), results[0].get("error"), wait)
+                await asyncio.sleep(wait)
+                delay = min(delay * 2, self.retry_max)
+                continue
+            delay = self.retry_base
+            for record, res in zip(batch, results):
+                if not res.get("ok"):
+                    # rejected individually by the canister; retrying cannot help
+                    self.rejected += 1
+                    logger.error("Outbox entry %s (seq=%d) rejected: %s", record.entry_id, record.seq, res.get("error"))
+            del self._unshipped[: len(batch)]
+            self.shipped += len(batch)
+            await self._loop.run_in_executor(self._io, self._checkpoint, batch[-1].seq)
+
+    def _checkpoint(self, seq: int):
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"acked_seq": seq}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        _fsync_dir(self.directory)
+        self._compact(seq)
+        self.acked_seq = seq
+
+    def _compact(self, acked_seq: int):
+        # a segment is fully acknowledged when the next one starts at or
+        # below acked_seq + 1; the active segment is never removed
+        keep = []
+        for i, (first_seq, path) in enumerate(self._segments):
+            nxt = self._segments[i + 1][0] if i + 1 < len(self._segments) else None
+            if nxt is not None and nxt - 1 <= acked_seq and path != self._segment_path:
+                try:
+                    os.remove(path)
+                    self.compacted += 1
+                    continue
+                except OSError:
+                    logger.exception("Failed to remove acknowledged outbox segment %s", path)
+            keep.append((first_seq, path))
+        self._segments = keep
+
+    async def close(self):
+        """Stop the shipper and close the active segment (records stay durable)."""
+        if self._shipper is not None:
+            self._shipper.cancel()
+            await asyncio.gather(self._shipper, return_exceptions=True)
+            self._shipper = None
+        self._loop = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._segment_path = None
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "segments": len(self._segments),
+            "backlog": len(self._unshipped),
+            "acked_seq": self.acked_seq,
+            "appended": self.appended,
+            "commits": self.commits,
+            "shipped": self.shipped,
+            "rejected": self.rejected,
+            "ship_failures": self.ship_failures,
+            "compacted": self.compacted,
+        }
@@ -1,17 +1,24 @@
 """Stub PriceAgent: returns a mocked current price for a symbol."""
 """Price agent helpers.
 
-This module exposes a synchronous `get_price(symbol)` helper used by the
-lightweight orchestrator. It uses CoinGecko's simple price API and returns a
-formatted USD string (e.g. "$65,000.00") or "unknown" on error.
+This module exposes an async `get_price_async(symbol)` helper used by the
+orchestrators and scheduler jobs, plus a synchronous `get_price(symbol)`
+wrapper for scripts. Both use CoinGecko's simple price API through a shared
+`PriceClient` that keeps a keep-alive connection pool, and return a formatted
+USD string (e.g. "$65,000.00") or "unknown" on error.
 
-The module also contains a small async handler (kept for parity) but the
-main integration for the orchestrator is `get_price()`.
+The module also contains a small async handler for uagents integration.
 """
+import asyncio
 import os
-from typing import Any
+import time
+from typing import Any, Iterable
 
-import requests
+import httpx
+from pydantic import BaseModel
+
+from coin_registry import get_registry
+from price_cache import price_cache
 
 AGENT_SEED = os.getenv("PRICE_AGENT_SEED", "price_agent_secret_seed")
 
@@ -20,6 +27,15 @@ agent = None
 
 COINGECKO_API_URL = "https://api.coingecko.com/api/v3/simple/price"
 
+# HTTP client configuration
+PRICE_TIMEOUT = float(os.getenv("PRICE_TIMEOUT", "5"))
+PRICE_CONNECT_TIMEOUT = float(os.getenv("PRICE_CONNECT_TIMEOUT", "2"))
+PRICE_MAX_CONNECTIONS = int(os.getenv("PRICE_MAX_CONNECTIONS", "20"))
+PRICE_MAX_KEEPALIVE = int(os.getenv("PRICE_MAX_KEEPALIVE", "10"))
+PRICE_KEEPALIVE_EXPIRY = float(os.getenv("PRICE_KEEPALIVE_EXPIRY", "60"))
+# max CoinGecko ids per simple/price request when batching
+PRICE_BATCH_CHUNK = int(os.getenv("PRICE_BATCH_CHUNK", "100"))
+
 # common symbol mapping to CoinGecko ids
 SYMBOL_TO_ID = {
     "btc": "bitcoin",
@@ -36,38 +52,224 @@ def _format_usd(amount: float) -> str:
         return str(amount)
 
 
-def get_price(symbol: str, vs_currency: str = "usd") -> str:
-    """Return formatted price string for a symbol using CoinGecko.
+def resolve_coin_id(symbol: str) -> str | None:
+    """Map a user supplied symbol to a CoinGecko id.
 
-    Returns 'unknown' when the coin or API call fails.
+    Returns None when neither SYMBOL_TO_ID nor the local coin registry knows
+    the symbol, so callers can reject it without a network call.
     """
-    if not symbol:
-        return "unknown"
-
     coin_id = SYMBOL_TO_ID.get(symbol.lower())
     if coin_id is None:
-        # Best-effort: accept coin_id directly if user passed it
-        coin_id = symbol.lower()
+        coin_id = get_registry().resolve(symbol)
+    return coin_id
 
-    try:
+
+class PriceClient:
+    """Async CoinGecko client backed by a long-lived keep-alive connection pool.
+
+    The underlying `httpx.AsyncClient` is bound to the event loop it was
+    created on, so use `get_client()` to obtain the shared instance for the
+    running loop instead of constructing one per call.
+    """
+
+    def __init__(self, base_url: str = COINGECKO_API_URL, timeout: float = PRICE_TIMEOUT, transport: httpx.AsyncBaseTransport | None = None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self._http = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=min(PRICE_CONNECT_TIMEOUT, timeout)),
+            limits=httpx.Limits(
+                max_connections=PRICE_MAX_CONNECTIONS,
+                max_keepalive_connections=PRICE_MAX_KEEPALIVE,
+                keepalive_expiry=PRICE_KEEPALIVE_EXPIRY,
+            ),
+            transport=transport,
+        )
+        try:
+            self.loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.loop = None
+
+    @property
+    def closed(self) -> bool:
+        return self._http.is_closed
+
+    async def fetch_price(self, coin_id: str, vs_currency: str = "usd", timeout: float | None = None) -> float | None:
+        """Return the numeric price for a CoinGecko id, or None when unavailable.
+
+        `timeout` is a deadline for the whole call (connect, request and body);
+        it defaults to the client timeout.
+        """
+        deadline = self.timeout if timeout is None else timeout
         params = {"ids": coin_id, "vs_currencies": vs_currency}
-        resp = requests.get(COINGECKO_API_URL, params=params, timeout=5)
+        resp = await asyncio.wait_for(self._http.get(self.base_url, params=params), deadline)
         resp.raise_for_status()
         data = resp.json()
         price = data.get(coin_id, {}).get(vs_currency)
+        if isinstance(price, (int, float)):
+            return float(price)
+        return None
+
+    async def fetch_prices(self, coin_ids: list[str], vs_currencies: list[str], timeout: float | None = None) -> dict:
+        """Fetch many ids in many currencies with one simple/price request.
+
+        Returns {coin_id: {vs_currency: float}}; missing or non-numeric
+        prices are left out.
+        """
+        deadline = self.timeout if timeout is None else timeout
+        params = {"ids": ",".join(coin_ids), "vs_currencies": ",".join(vs_currencies)}
+        resp = await asyncio.wait_for(self._http.get(self.base_url, params=params), deadline)
+        resp.raise_for_status()
+        data = resp.json()
+        out = {}
+        for coin_id in coin_ids:
+            row = data.get(coin_id) or {}
+            prices = {vs: float(row[vs]) for vs in vs_currencies if isinstance(row.get(vs), (int, float))}
+            if prices:
+                out[coin_id] = prices
+        return out
+
+    async def get_price(self, symbol: str, vs_currency: str = "usd", timeout: float | None = None) -> str:
+        """Return formatted price string for a symbol, 'unknown' on any failure."""
+        coin_id = resolve_coin_id(symbol) if symbol else None
+        if coin_id is None:
+            return "unknown"
+        try:
+            price = await self.fetch_price(coin_id, vs_currency, timeout=timeout)
+        except Exception:
+            return "unknown"
         if price is None:
             return "unknown"
-        # Format as USD-like string when numeric
-        if isinstance(price, (int, float)):
-            return _format_usd(float(price))
-        return str(price)
+        return _format_usd(price)
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+_client: PriceClient | None = None
+
+
+def get_client() -> PriceClient:
+    """Return the shared PriceClient for the running event loop."""
+    global _client
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.closed or _client.loop is not loop:
+        _client = PriceClient()
+    return _client
+
+
+async def close_client():
+    """Close the shared client (call on application shutdown)."""
+    global _client
+    if _client is not None and not _client.closed:
+        await _client.aclose()
+    _client = None
+
+
+async def fetch_price_cached(coin_id: str, vs_currency: str = "usd", timeout: float | None = None, refresh: bool = False) -> float | None:
+    """Return the numeric price for a CoinGecko id through the shared price cache.
+
+    Concurrent misses for the same (coin_id, vs_currency) share one upstream
+    request. `refresh=True` forces an upstream fetch and stores the result.
+    """
+    async def _fetch():
+        return await get_client().fetch_price(coin_id, vs_currency, timeout=timeout)
+
+    return await price_cache.get_or_fetch(coin_id, vs_currency, _fetch, refresh=refresh)
+
+
+async def get_price_async(symbol: str, vs_currency: str = "usd", timeout: float | None = None, refresh: bool = False) -> str:
+    """Return formatted price string for a symbol using CoinGecko.
+
+    Returns 'unknown' when the coin or API call fails.
+    """
+    coin_id = resolve_coin_id(symbol) if symbol else None
+    if coin_id is None:
+        return "unknown"
+    try:
+        price = await fetch_price_cached(coin_id, vs_currency, timeout=timeout, refresh=refresh)
     except Exception:
         return "unknown"
+    if price is None:
+        return "unknown"
+    return _format_usd(price)
 
 
-# Async handler left for uagents integration (kept simple)
-from pydantic import BaseModel
+class PriceQuote(BaseModel):
+    symbol: str
+    coin_id: str | None = None
+    currency: str
+    price: float | None = None
+    # unix timestamp of the upstream fetch that produced `price`
+    fetched_at: float | None = None
+    cached: bool = False
+
+
+async def get_prices(symbols: Iterable[str], currencies: Iterable[str] = ("usd",), timeout: float | None = None) -> list[PriceQuote]:
+    """Return quotes for every (symbol, currency) pair, in input order.
+
+    Fresh cache entries are served locally; the remaining coin ids are
+    fetched with one upstream request per `PRICE_BATCH_CHUNK` ids (chunks run
+    concurrently) and written back to the price cache. Pairs that could not
+    be priced, including symbols the coin registry does not know, have
+    `price=None` and `coin_id=None`.
+    """
+    symbols = [s for s in symbols if s]
+    currencies = list(dict.fromkeys(c.lower() for c in currencies if c)) or ["usd"]
+    resolved = [(s, resolve_coin_id(s)) for s in symbols]
 
+    found: dict[tuple, tuple] = {}
+    missing: list[str] = []
+    for coin_id in dict.fromkeys(cid for _, cid in resolved if cid):
+        for vs in currencies:
+            price, fetched_at = price_cache.get_fresh(coin_id, vs)
+            if price is None:
+                missing.append(coin_id)
+                break
+            found[(coin_id, vs)] = (price, fetched_at, True)
+
+    if missing:
+        client = get_client()
+        chunks = [missing[i:i + PRICE_BATCH_CHUNK] for i in range(0, len(missing), PRICE_BATCH_CHUNK)]
+        results = await asyncio.gather(*[client.fetch_prices(c, currencies, timeout=timeout) for c in chunks], return_exceptions=True)
+        fetched_at = time.time()
+        for res in results:
+            if isinstance(res, BaseException):
+                continue
+            for coin_id, prices in res.items():
+                for vs, price in prices.items():
+                    price_cache.put(coin_id, vs, price, fetched_at=fetched_at)
+                    found[(coin_id, vs)] = (price, fetched_at, False)
+
+    quotes = []
+    for symbol, coin_id in resolved:
+        for vs in currencies:
+            price, fetched_at, cached = found.get((coin_id, vs), (None, None, False))
+            quotes.append(PriceQuote(symbol=symbol, coin_id=coin_id, currency=vs, price=price, fetched_at=fetched_at, cached=cached))
+    return quotes
+
+
+def get_price(symbol: str, vs_currency: str = "usd") -> str:
+    """Blocking wrapper around `get_price_async` for scripts without an event loop.
+
+    Must not be called from inside a running event loop; use `get_price_async`
+    there instead.
+    """
+    async def _once():
+        try:
+            return await get_price_async(symbol, vs_currency)
+        finally:
+            await close_client()
+
+    return asyncio.run(_once())
+
+
+# Async handler left for uagents integration (kept simple)
 
 class PriceRequest(BaseModel):
     coin_id: str
@@ -87,19 +289,25 @@ async def startup(ctx: Any):
 
 async def handle_price_request(ctx: Any, sender: str, msg: PriceRequest):
     ctx.logger.info(f"Received price request for: {msg.coin_id}")
-    price_str = get_price(msg.coin_id)
+    coin_id = resolve_coin_id(msg.coin_id)
+    if coin_id is None:
+        # near matches are offered back, never priced in place of the request
+        hints = [c["symbol"].upper() or c["id"] for c in get_registry().suggest(msg.coin_id or "")]
+        error = f"not found; did you mean {', '.join(hints)}?" if hints else "not found"
+        await ctx.send(sender, PriceResponse(price=0.0, currency="usd", success=False, error=error))
+        return
     try:
-        if price_str == "unknown":
-            await ctx.send(sender, PriceResponse(price=0.0, currency="usd", success=False, error="not found"))
-        else:
-            # attempt to coerce numeric value from formatted string
-            num = float(price_str.replace("$", "").replace(",", ""))
-            await ctx.send(sender, PriceResponse(price=num, currency="usd", success=True))
+        price = await fetch_price_cached(coin_id, "usd")
     except Exception:
-        await ctx.send(sender, PriceResponse(price=0.0, currency="usd", success=False, error="parse error"))
+        await ctx.send(sender, PriceResponse(price=0.0, currency="usd", success=False, error="upstream error"))
+        return
+    if price is None:
+        await ctx.send(sender, PriceResponse(price=0.0, currency="usd", success=False, error="not found"))
+    else:
+        await ctx.send(sender, PriceResponse(price=price, currency="usd", success=True))
 
 
 if __name__ == "__main__":
     from uagents import Agent
     agent = Agent(name="price_agent", seed=AGENT_SEED)
-    agent.run()
\ No newline at end of file
+    agent.run()
@@ -0,0 +1,180 @@
+"""TTL price cache with LRU eviction and single-flight request coalescing.
+
+Entries are keyed by (coin_id, vs_currency). A fresh entry is served
+directly; an entry past its TTL but still inside the stale window is served
+immediately while one background refresh runs (stale-while-revalidate).
+Concurrent misses for the same key share a single upstream fetch.
+
+Configuration (env):
+- PRICE_CACHE_TTL: default freshness in seconds (default 10)
+- PRICE_CACHE_STALE_TTL: extra seconds a stale value may be served (default 60)
+- PRICE_CACHE_MAX_ENTRIES: LRU bound (default 1024)
+- PRICE_CACHE_TTL_OVERRIDES: per-key TTLs, e.g. "bitcoin:usd=5,ethereum=20"
+  (a bare coin id applies to every vs_currency)
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from single_flight import SingleFlight
+
+logger = logging.getLogger("price_cache")
+
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", "10"))
+PRICE_CACHE_STALE_TTL = float(os.getenv("PRICE_CACHE_STALE_TTL", "60"))
+PRICE_CACHE_MAX_ENTRIES = int(os.getenv("PRICE_CACHE_MAX_ENTRIES", "1024"))
+
+Fetcher = Callable[[], Awaitable[Optional[float]]]
+
+
+def parse_ttl_overrides(spec: str) -> dict:
+    """Parse "bitcoin:usd=5,ethereum=20" into {("bitcoin", "usd"): 5.0, ("ethereum", None): 20.0}."""
+    overrides = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item or "=" not in item:
+            continue
+        key, _, ttl = item.partition("=")
+        coin, _, vs = key.strip().lower().partition(":")
+        try:
+            overrides[(coin, vs or None)] = float(ttl)
+        except ValueError:
+            logger.warning("Ignoring invalid TTL override %r", item)
+    return overrides
+
+
+class PriceCache:
+    def __init__(
+        self,
+        ttl: float = PRICE_CACHE_TTL,
+        stale_ttl: float = PRICE_CACHE_STALE_TTL,
+        max_entries: int = PRICE_CACHE_MAX_ENTRIES,
+        ttl_overrides: dict | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.ttl_overrides = dict(ttl_overrides or {})
+        self._clock = clock
+        # key -> (value, stored_at, fetched_at); stored_at is monotonic, fetched_at wall-clock
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.refresh_errors = 0
+
+    def ttl_for(self, coin_id: str, vs_currency: str) -> float:
+        o = self.ttl_overrides
+        ttl = o.get((coin_id, vs_currency))
+        if ttl is None:
+            ttl = o.get((coin_id, None), self.ttl)
+        return ttl
+
+    def put(self, coin_id: str, vs_currency: str, value: Optional[float], fetched_at: Optional[float] = None):
+        if value is None:
+            return
+        key = (coin_id, vs_currency)
+        self._entries[key] = (value, self._clock(), fetched_at if fetched_at is not None else time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def peek(self, coin_id: str, vs_currency: str) -> tuple[Optional[float], Optional[float]]:
+        """Return (value, age_seconds) without touching counters or LRU order."""
+        item = self._entries.get((coin_id, vs_currency))
+        if item is None:
+            return None, None
+        return item[0], self._clock() - item[1]
+
+    def get_fresh(self, coin_id: str, vs_currency: str) -> tuple[Optional[float], Optional[float]]:
+        """Return (value, fetched_at) for a fresh entry, counting a hit or miss."""
+        key = (coin_id, vs_currency)
+        item = self._entries.get(key)
+        if item is not None and self._clock() - item[1] <= self.ttl_for(coin_id, vs_currency):
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return item[0], item[2]
+        self.misses += 1
+        return None, None
+
+    def clear(self):
+        self._entries.clear()
+        self._flights.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "refresh_errors": self.refresh_errors,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
+
+    def _flight(self, key: tuple, fetch: Fetcher) -> tuple[asyncio.Task, bool]:
+        """Return (task, joined) for the shared fetch of `key` on the running loop."""
+        async def _fetch_and_store():
+            value = await fetch()
+            self.put(key[0], key[1], value)
+            return value
+
+        return self._flights.run(key, _fetch_and_store)
+
+    def _revalidate(self, key: tuple, fetch: Fetcher):
+        task, joined = self._flight(key, fetch)
+        if joined:
+            return
+
+        def _done(t: asyncio.Task):
+            if t.cancelled():
+                return
+            if t.exception() is not None:
+                self.refresh_errors += 1
+                logger.warning("Background price refresh failed for %s: %s", key, t.exception())
+
+        task.add_done_callback(_done)
+
+    async def get_or_fetch(self, coin_id: str, vs_currency: str, fetch: Fetcher, refresh: bool = False) -> Optional[float]:
+        """Return the cached price, fetching through `fetch` on a miss.
+
+        With `refresh=True` the cached value is bypassed and the result of a
+        (coalesced) upstream fetch is stored, which keeps the cache warm for
+        periodic jobs.
+        """
+        key = (coin_id, vs_currency)
+        if not refresh:
+            item = self._entries.get(key)
+            if item is not None:
+                value, stored_at, _ = item
+                age = self._clock() - stored_at
+                ttl = self.ttl_for(coin_id, vs_currency)
+                if age <= ttl:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return value
+                if age <= ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    self._entries.move_to_end(key)
+                    self._revalidate(key, fetch)
+                    return value
+        self.misses += 1
+        task, joined = self._flight(key, fetch)
+        if joined:
+            self.coalesced += 1
+        # shield so a cancelled caller does not cancel the fetch other callers share
+        return await asyncio.shield(task)
+
+
+price_cache = PriceCache(ttl_overrides=parse_ttl_overrides(os.getenv("PRICE_CACHE_TTL_OVERRIDES", "")))
@@ -1,14 +1,36 @@
 """
-ECDSA provenance helper using the `cryptography` library.
+Provenance signing helper using the `cryptography` library.
 
-This module will look for an ECDSA private key PEM at the path given by
+This module will look for a private key PEM at the path given by
 `PROVENANCE_KEY_PATH` environment variable. If not found, it will generate a
-new P-256 keypair and write the private key to `provenance_key.pem` in the
-current working directory (development convenience only).
+new keypair for `PROVENANCE_ALGORITHM` and write the private key there
+(development convenience only). Without `PROVENANCE_KEY_PATH` the path
+depends on the algorithm: `provenance_key.pem` for ecdsa-p256 and
+`provenance_key.<algorithm>.pem` otherwise, in the current working
+directory, so selecting another algorithm never picks up the old key. A key
+file whose algorithm differs from `PROVENANCE_ALGORITHM` is an error.
+
+Algorithms (pluggable `Signer`s):
+- ecdsa-p256 (default): ECDSA over SECP256R1 with SHA-256, DER signatures
+- ed25519: fixed 64-byte signatures, faster to sign and verify
+
+Signatures are tagged: [1 byte algorithm tag][4 byte key id][signature],
+hex-encoded. The key id is the start of the SHA-256 of the public key, so a
+verifier picks the right key even after a switch of algorithm or key.
+Untagged signatures (a bare DER ECDSA signature, always starting 0x30) are
+what this module produced before tagging and still verify against the ECDSA
+keys. Keys listed in `PROVENANCE_VERIFY_KEYS` (os.pathsep-separated PEM
+paths, private or public) are accepted for verification only, so entries
+signed with a retired key keep verifying.
 
 Provides:
-- sign_hex(hexstr) -> hex signature (DER-encoded hex)
+- sign_hex(hexstr) -> hex signature (tagged)
 - verify_hex(hexstr, sig_hex) -> bool
+- sign_batch_hex(hexstrs) -> {"root", "signature", "proofs"}: one signature
+  over the Merkle root of many hashes (aggregate mode)
+- verify_proof_hex(hexstr, sig_hex, root, proof) -> bool
+- get_key_manager() -> KeyManager caching the parsed key and public PEM;
+  the file is re-read only when its mtime changes
 
 CLI:
   python -m agents.provenance sign <hexhash>
@@ -17,53 +39,308 @@ CLI:
 Note: For production, manage keys securely and do not write private keys to
 repo or disk in plain PEM without encryption.
 """
+import hashlib
+import logging
 import os
 import sys
+import threading
+import time
+from abc import ABC, abstractmethod
 from pathlib import Path
-from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
 from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature, decode_dss_signature
-from cryptography.hazmat.primitives import serialization
 
+try:
+    from . import merkle
+except ImportError:
+    import merkle
+
+logger = logging.getLogger("provenance")
+
+ALGORITHM = os.environ.get("PROVENANCE_ALGORITHM", "ecdsa-p256").lower()
+
+
+def default_key_path(algorithm: str) -> str:
+    # ecdsa-p256 keeps the historical file name
+    return "provenance_key.pem" if algorithm == "ecdsa-p256" else f"provenance_key.{algorithm}.pem"
+
+
+KEY_PATH = os.environ.get("PROVENANCE_KEY_PATH") or default_key_path(ALGORITHM)
+VERIFY_KEY_PATHS = [p for p in os.environ.get("PROVENANCE_VERIFY_KEYS", "").split(os.pathsep) if p]
+# how often (seconds) the key file's mtime is re-checked; 0 checks every call
+KEY_CHECK_INTERVAL = float(os.environ.get("PROVENANCE_KEY_CHECK_INTERVAL", "1.0"))
+
+KEY_ID_BYTES = 4
+
+
+class Signer(ABC):
+    """One signature algorithm: key generation, signing and verification."""
+
+    algorithm = ""
+    tag = 0
+    key_types: tuple = ()
+
+    @abstractmethod
+    def generate(self):
+        ...
+
+    @abstractmethod
+    def sign(self, priv, data: bytes) -> bytes:
+        ...
+
+    @abstractmethod
+    def verify(self, pub, sig: bytes, data: bytes) -> bool:
+        ...
+
+
+class EcdsaP256Signer(Signer):
+    algorithm = "ecdsa-p256"
+    tag = 0x01
+    key_types = (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)
+
+    def generate(self):
+        return ec.generate_private_key(ec.SECP256R1())
+
+    def sign(self, priv, data: bytes) -> bytes:
+        return priv.sign(data, ec.ECDSA(hashes.SHA256()))
+
+    def verify(self, pub, sig: bytes, data: bytes) -> bool:
+        try:
+            pub.verify(sig, data, ec.ECDSA(hashes.SHA256()))
+            return True
+        except Exception:
+            return False
+
+
+class Ed25519Signer(Signer):
+    algorithm = "ed25519"
+    tag = 0x02
+    key_types = (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)
+
+    def generate(self):
+        return ed25519.Ed25519PrivateKey.generate()
+
+    def sign(self, priv, data: bytes) -> bytes:
+        return priv.sign(data)
+
+    def verify(self, pub, sig: bytes, data: bytes) -> bool:
+        try:
+            pub.verify(sig, data)
+            return True
+        except Exception:
+            return False
+
+
+SIGNERS: dict[str, Signer] = {s.algorithm: s for s in (EcdsaP256Signer(), Ed25519Signer())}
+_SIGNERS_BY_TAG = {s.tag: s for s in SIGNERS.values()}
+# a DER SEQUENCE: how every untagged (pre-tagging) ECDSA signature starts
+_DER_SEQUENCE = 0x30
+
+
+def signer_for_key(key) -> Signer:
+    for signer in SIGNERS.values():
+        if isinstance(key, signer.key_types):
+            return signer
+    raise ValueError(f"unsupported provenance key type {type(key).__name__}")
+
+
+def public_pem(pub) -> bytes:
+    return pub.public_bytes(encoding=serialization.Encoding.PEM, format=serialization.PublicFormat.SubjectPublicKeyInfo)
 
-KEY_PATH = os.environ.get("PROVENANCE_KEY_PATH", "provenance_key.pem")
 
+def key_id(pub) -> bytes:
+    der = pub.public_bytes(encoding=serialization.Encoding.DER, format=serialization.PublicFormat.SubjectPublicKeyInfo)
+    return hashlib.sha256(der).digest()[:KEY_ID_BYTES]
 
-def _ensure_key() -> ec.EllipticCurvePrivateKey:
-    p = Path(KEY_PATH)
-    if p.exists():
-        data = p.read_bytes()
-        return serialization.load_pem_private_key(data, password=None)
-    # generate and persist (development convenience)
-    priv = ec.generate_private_key(ec.SECP256R1())
-    pem = priv.private_bytes(encoding=serialization.Encoding.PEM, format=serialization.PrivateFormat.PKCS8, encryption_algorithm=serialization.NoEncryption())
-    p.write_bytes(pem)
-    return priv
+
+def load_public_key(pem: bytes):
+    """Public key from a PEM holding either a private or a public key."""
+    if b"PRIVATE KEY" in pem:
+        return serialization.load_pem_private_key(pem, password=None).public_key()
+    return serialization.load_pem_public_key(pem)
+
+
+class Keyring:
+    """Public keys accepted for verification, by key id."""
+
+    def __init__(self):
+        self._keys: dict[bytes, tuple[Signer, object]] = {}
+
+    def add(self, pub) -> bytes:
+        kid = key_id(pub)
+        self._keys[kid] = (signer_for_key(pub), pub)
+        return kid
+
+    def pems(self) -> list[bytes]:
+        return [public_pem(pub) for _, pub in self._keys.values()]
+
+    def verify(self, data: bytes, sig: bytes) -> bool:
+        if not sig:
+            return False
+        if sig[0] == _DER_SEQUENCE:
+            # untagged legacy ECDSA signature: try every ECDSA key
+            ecdsa = SIGNERS["ecdsa-p256"]
+            return any(s is ecdsa and s.verify(pub, sig, data) for s, pub in self._keys.values())
+        signer = _SIGNERS_BY_TAG.get(sig[0])
+        found = self._keys.get(sig[1:1 + KEY_ID_BYTES])
+        if signer is None or found is None or found[0] is not signer:
+            return False
+        return signer.verify(found[1], sig[1 + KEY_ID_BYTES:], data)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class KeyManager:
+    """Load the provenance key once and keep it until the PEM file changes.
+
+    Caches the private key, its signer, the public key object and the
+    serialized public PEM (plus an ETag for it). The file is stat()ed at
+    most once every `check_interval` seconds and re-parsed only when its
+    (mtime, size) changed, so a signature costs just the signing operation.
+    Keys replaced by a reload stay in the verification keyring.
+    """
+
+    def __init__(
+        self,
+        path: str = KEY_PATH,
+        check_interval: float = KEY_CHECK_INTERVAL,
+        algorithm: str = ALGORITHM,
+        verify_paths: list[str] | None = None,
+    ):
+        if algorithm not in SIGNERS:
+            raise ValueError(f"unknown provenance algorithm {algorithm!r}; expected one of {sorted(SIGNERS)}")
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self.algorithm = algorithm
+        self._lock = threading.Lock()
+        self._signature: tuple[int, int] | None = None
+        self._checked_at = 0.0
+        self._priv = None
+        self._pub = None
+        self._signer: Signer | None = None
+        self._kid = b""
+        self._pub_pem = b""
+        self._etag = ""
+        self.keyring = Keyring()
+        for extra in VERIFY_KEY_PATHS if verify_paths is None else verify_paths:
+            try:
+                self.keyring.add(load_public_key(Path(extra).read_bytes()))
+            except Exception:
+                logger.exception("Failed to load provenance verification key %s", extra)
+        self.loads = 0
+
+    def _stat(self) -> tuple[int, int] | None:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _refresh(self, create: bool) -> bool:
+        """Make sure the cached key matches the file; return True if a key is loaded."""
+        now = time.monotonic()
+        if self._priv is not None and now - self._checked_at < self.check_interval:
+            return True
+        with self._lock:
+            stamp = self._stat()
+            self._checked_at = now
+            if stamp is not None and stamp == self._signature:
+                return True
+            if stamp is None:
+                if not create:
+                    self._priv = self._pub = self._signer = None
+                    self._signature = None
+                    return False
+                # generate and persist (development convenience)
+                priv = SIGNERS[self.algorithm].generate()
+                pem = priv.private_bytes(encoding=serialization.Encoding.PEM, format=serialization.PrivateFormat.PKCS8, encryption_algorithm=serialization.NoEncryption())
+                self.path.write_bytes(pem)
+                stamp = self._stat()
+            else:
+                priv = serialization.load_pem_private_key(self.path.read_bytes(), password=None)
+            signer = signer_for_key(priv)
+            if signer.algorithm != self.algorithm:
+                # switching algorithm means a new key file (see default_key_path)
+                raise ValueError(f"provenance key {self.path} is {signer.algorithm}, but the configured algorithm is {self.algorithm}")
+            pub = priv.public_key()
+            pub_pem = public_pem(pub)
+            self._priv, self._pub, self._signer, self._pub_pem = priv, pub, signer, pub_pem
+            self._kid = self.keyring.add(pub)
+            self._etag = '"' + hashlib.sha256(signer.algorithm.encode() + pub_pem).hexdigest()[:32] + '"'
+            self._signature = stamp
+            self.loads += 1
+            return True
+
+    def private_key(self):
+        self._refresh(create=True)
+        return self._priv
+
+    def public_key(self):
+        return self._pub if self._refresh(create=False) else None
+
+    def public_pem(self) -> bytes | None:
+        """SubjectPublicKeyInfo PEM of the current key, or None if there is no key file."""
+        return self._pub_pem if self._refresh(create=False) else None
+
+    def etag(self) -> str | None:
+        """Strong ETag for `public_pem()`; changes whenever the key does."""
+        return self._etag if self._refresh(create=False) else None
+
+    def active_algorithm(self) -> str | None:
+        """Algorithm of the current key file (None without one)."""
+        return self._signer.algorithm if self._refresh(create=False) else None
+
+    def key_id(self) -> str | None:
+        return self._kid.hex() if self._refresh(create=False) else None
+
+    def sign(self, data: bytes) -> bytes:
+        """Return a tagged signature: [algorithm tag][key id][signature]."""
+        priv = self.private_key()
+        signer = self._signer
+        return bytes([signer.tag]) + self._kid + signer.sign(priv, data)
+
+    def verify(self, data: bytes, sig: bytes) -> bool:
+        # loads the current key (if any) into the keyring first
+        self._refresh(create=False)
+        return self.keyring.verify(data, sig)
+
+
+_managers: dict[str, KeyManager] = {}
+
+
+def get_key_manager(path: str | None = None) -> KeyManager:
+    """Return the process-wide manager for `path` (default PROVENANCE_KEY_PATH)."""
+    path = path or KEY_PATH
+    manager = _managers.get(path)
+    if manager is None:
+        manager = _managers.setdefault(path, KeyManager(path))
+    return manager
 
 
 def sign_hex(hexstr: str) -> str:
-    """Sign the raw bytes represented by hexstr. Returns hex-encoded DER signature."""
-    priv = _ensure_key()
-    data = bytes.fromhex(hexstr)
-    sig = priv.sign(data, ec.ECDSA(hashes.SHA256()))
-    # return DER signature as hex
-    return sig.hex()
+    """Sign the raw bytes represented by hexstr. Returns the hex-encoded tagged signature."""
+    return get_key_manager().sign(bytes.fromhex(hexstr)).hex()
 
 
 def verify_hex(hexstr: str, sig_hex: str) -> bool:
-    p = Path(KEY_PATH)
-    if not p.exists():
-        return False
-    data = bytes.fromhex(hexstr)
-    sig = bytes.fromhex(sig_hex)
-    # load public key from private key file
-    priv = serialization.load_pem_private_key(p.read_bytes(), password=None)
-    pub = priv.public_key()
     try:
-        pub.verify(sig, data, ec.ECDSA(hashes.SHA256()))
-        return True
-    except Exception:
+        data = bytes.fromhex(hexstr)
+        sig = bytes.fromhex(sig_hex)
+    except ValueError:
         return False
+    return get_key_manager().verify(data, sig)
+
+
+def sign_batch_hex(hexstrs: list[str]) -> dict:
+    """Sign the Merkle root of `hexstrs` once; each hash gets its inclusion proof."""
+    root, proofs = merkle.build(hexstrs)
+    return {"root": root, "signature": sign_hex(root), "proofs": proofs}
+
+
+def verify_proof_hex(hexstr: str, sig_hex: str, root: str, proof: list[dict]) -> bool:
+    """Verify an aggregate signature: `proof` links hexstr to `root`, which `sig_hex` signs."""
+    return merkle.verify_proof(hexstr, proof, root) and verify_hex(root, sig_hex)
 
 
 def main():
@@ -3,45 +3,74 @@ Lightweight provenance HTTP server for POC.
 
 Endpoints:
 - POST /sign {"content_hash": "..."} -> { signature, timestamp }
+- POST /sign/batch {"content_hashes": [...], "mode": "aggregate" | "individual"}
+  -> aggregate: { root, signature, proofs, timestamp } (one signature over the
+     Merkle root, one inclusion proof per hash)
+  -> individual: { signatures, timestamp }
 - POST /verify {"content_hash":"...", "signature":"..."} -> { ok: true/false }
-- POST /anchor -> triggers the anchor_job to compute merkle root from data/hashes.json (optional: call canister if configured)
+  (add "merkle_root" and "proof" to verify an aggregate signature)
+- POST /verify/batch {"items": [{"content_hash", "signature"[, "merkle_root", "proof"]}, ...]}
+  -> { results: [bool, ...], failed } in input order (process pool + LRU, see bulk_verify.py)
+- POST /anchor {"batch_id"?, "publish"?} -> computes the Merkle root of
+  ANCHOR_HASHES_PATH in-process (anchoring.py, off the event loop) and anchors
+  it on the canister if configured -> { ok, root, leaf_count, batch_id, timings, canister, tagged }
 
 Run locally:
   uvicorn agents.provenance_server:app --reload --port 9001
 
 This is a POC — in production use proper auth, rate limits, and asymmetric signatures.
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
 from datetime import datetime, timezone
-import subprocess
 import json
 from pathlib import Path
-from .provenance import sign_hex, verify_hex
+from .provenance import get_key_manager, sign_batch_hex, sign_hex, verify_hex, verify_proof_hex
+from .anchoring import get_anchor_service
+from .bulk_verify import get_bulk_verifier
+from .icp_connection import get_icp_manager
 from pathlib import Path
 import os
-from typing import Optional
+import re
+from typing import Literal, Optional
 try:
     from ic.client import Client
-    from ic.identity import BasicIdentity
-    from ic.agent import Agent as ICAgent
-    from ic.candid import encode
+    from ic.candid import encode, Types
 except Exception:
     Client = None
-    BasicIdentity = None
-    ICAgent = None
     encode = None
+    Types = None
 
 app = FastAPI(title="Pluto Provenance POC")
 
+# most hashes one /sign/batch request may carry
+SIGN_BATCH_MAX = int(os.environ.get("SIGN_BATCH_MAX", "10000"))
+_HEX_HASH = re.compile(r"^[0-9a-fA-F]{64}$")
+
 
 class SignRequest(BaseModel):
     content_hash: str
 
 
+class SignBatchRequest(BaseModel):
+    content_hashes: list[str]
+    mode: Literal["aggregate", "individual"] = "aggregate"
+
+
+class AnchorRequest(BaseModel):
+    batch_id: Optional[str] = None
+    publish: bool = True
+
+
+class VerifyBatchRequest(BaseModel):
+    items: list[dict]
+
+
 class VerifyRequest(BaseModel):
     content_hash: str
     signature: str
+    merkle_root: Optional[str] = None
+    proof: Optional[list[dict]] = None
 
 
 @app.post("/sign")
@@ -53,73 +82,100 @@ def sign(req: SignRequest):
     return {"signature": sig, "timestamp": datetime.now(timezone.utc).isoformat()}
 
 
+@app.post("/sign/batch")
+def sign_batch(req: SignBatchRequest):
+    if not req.content_hashes or len(req.content_hashes) > SIGN_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"content_hashes must hold 1..{SIGN_BATCH_MAX} hashes")
+    bad = [i for i, h in enumerate(req.content_hashes) if not _HEX_HASH.match(h)]
+    if bad:
+        raise HTTPException(status_code=400, detail={"error": "invalid content_hash", "indexes": bad[:20]})
+    ts = datetime.now(timezone.utc).isoformat()
+    if req.mode == "individual":
+        return {"signatures": [sign_hex(h) for h in req.content_hashes], "timestamp": ts}
+    return {**sign_batch_hex(req.content_hashes), "timestamp": ts}
+
+
 @app.post("/verify")
 def verify(req: VerifyRequest):
-    ok = verify_hex(req.content_hash, req.signature)
+    if req.merkle_root:
+        ok = verify_proof_hex(req.content_hash, req.signature, req.merkle_root, req.proof or [])
+    else:
+        ok = verify_hex(req.content_hash, req.signature)
     return {"ok": ok}
 
 
+@app.post("/verify/batch")
+def verify_batch(req: VerifyBatchRequest):
+    if len(req.items) > SIGN_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"at most {SIGN_BATCH_MAX} items per request")
+    results = get_bulk_verifier().verify_all(req.items)
+    return {"results": results, "failed": results.count(False)}
+
+
 @app.post("/anchor")
-def anchor():
-    # Run the anchor_job to compute merkle root; return output. This is a local POC only.
-    script = "icp_canister/anchor_job.py"
-    if not Path(script).exists():
-        raise HTTPException(status_code=500, detail=f"anchor job not found: {script}")
+async def anchor(req: Optional[AnchorRequest] = None):
+    # hashing and the canister call run on the anchoring service's own thread
+    req = req or AnchorRequest()
     try:
-        proc = subprocess.run(["python", script, "data/hashes.json"], capture_output=True, text=True, check=True)
-        return {"ok": True, "output": proc.stdout}
-    except subprocess.CalledProcessError as e:
-        raise HTTPException(status_code=500, detail={"err": e.stderr, "out": e.stdout})
+        result = await get_anchor_service().anchor_async(batch_id=req.batch_id, publish=req.publish)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"hashes file not found: {e.filename}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not result["ok"]:
+        raise HTTPException(status_code=502, detail=result)
+    return result
+
+
+# serialized /pubkey body, rebuilt only when the key manager's ETag changes
+_pubkey_body: tuple[str, bytes] | None = None
 
 
 @app.get("/pubkey")
-def pubkey():
+def pubkey(request: Request):
     # Return the public key PEM for clients to verify signatures
-    key_path = os.environ.get("PROVENANCE_KEY_PATH", "provenance_key.pem")
-    p = Path(key_path)
-    if not p.exists():
+    keys = get_key_manager()
+    pem, etag = keys.public_pem(), keys.etag()
+    if pem is None:
         raise HTTPException(status_code=404, detail="public key not found; generate key by signing once")
-    # derive public key PEM
-    from cryptography.hazmat.primitives import serialization
-    priv = serialization.load_pem_private_key(p.read_bytes(), password=None)
-    pub = priv.public_key()
-    pem = pub.public_bytes(encoding=serialization.Encoding.PEM, format=serialization.PublicFormat.SubjectPublicKeyInfo).decode()
-    return {"pubkey_pem": pem}
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in (t.strip() for t in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    global _pubkey_body
+    if _pubkey_body is None or _pubkey_body[0] != etag:
+        body = {"pubkey_pem": pem.decode(), "algorithm": keys.active_algorithm(), "key_id": keys.key_id()}
+        _pubkey_body = (etag, json.dumps(body).encode())
+    return Response(content=_pubkey_body[1], media_type="application/json", headers=headers)
 
 
 @app.post("/publish_pubkey")
 def publish_pubkey():
     # Publish the public key to the ICP canister if ic-py and ICP env are configured
-    key_path = os.environ.get("PROVENANCE_KEY_PATH", "provenance_key.pem")
-    p = Path(key_path)
-    if not p.exists():
+    # cached public PEM derived from the private key (never publish the private key)
+    keys = get_key_manager()
+    pub_pem = keys.public_pem()
+    if pub_pem is None:
         raise HTTPException(status_code=404, detail="key not found")
-    # derive public PEM from private key to avoid publishing private key
-    try:
-        from cryptography.hazmat.primitives import serialization
-        priv = serialization.load_pem_private_key(p.read_bytes(), password=None)
-        pub = priv.public_key()
-        pem = pub.public_bytes(encoding=serialization.Encoding.PEM, format=serialization.PublicFormat.SubjectPublicKeyInfo).decode()
-    except Exception:
-        pem = p.read_text()
+    pem, algorithm, key_id = pub_pem.decode(), keys.active_algorithm(), keys.key_id()
     # if ICP not configured, return PEM only
     replica = os.environ.get("ICP_REPLICA_URL") or os.environ.get("ICP_NETWORK_URL")
     canister = os.environ.get("CANISTER_ID")
     if not replica or not canister or Client is None:
-        return {"ok": True, "pubkey": pem, "published": False}
+        return {"ok": True, "pubkey": pem, "algorithm": algorithm, "key_id": key_id, "published": False}
 
-    # build client and agent
-    client = Client(url=replica)
+    # client/agent/identity are cached per (replica, identity) by the shared manager
     identity_path = os.environ.get("STORAGE_AGENT_KEY_PATH")
-    identity = None
-    if identity_path and Path(identity_path).exists():
-        with open(identity_path, "rb") as f:
-            identity = BasicIdentity.from_pem(f.read())
-    agent = ICAgent(identity, client)
+    if not (identity_path and Path(identity_path).exists()):
+        identity_path = None
 
     try:
-        args = encode((pem, ), "(text)")
-        res = agent.update_raw(canister_id=canister, method_name="set_pubkey", arg=args)
-        return {"ok": True, "result": res}
+        # Candid encode: three text params (pem, algorithm, key_id)
+        args = encode([
+            {"type": Types.Text, "value": pem},
+            {"type": Types.Text, "value": algorithm},
+            {"type": Types.Text, "value": key_id},
+        ])
+        res = get_icp_manager().update_sync(replica, identity_path, canister, "set_signing_key", args)
+        return {"ok": True, "algorithm": algorithm, "key_id": key_id, "result": res}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -7,7 +7,9 @@ If STORAGE_AGENT_KEY_PATH is not set, the script will print the PEM and exit.
 import os
 from pathlib import Path
 
-KEY_PATH = os.environ.get("PROVENANCE_KEY_PATH", "provenance_key.pem")
+ALGORITHM = os.environ.get("PROVENANCE_ALGORITHM", "ecdsa-p256").lower()
+# same default as provenance.default_key_path
+KEY_PATH = os.environ.get("PROVENANCE_KEY_PATH") or ("provenance_key.pem" if ALGORITHM == "ecdsa-p256" else f"provenance_key.{ALGORITHM}.pem")
 CANISTER = os.environ.get("CANISTER_ID")
 REPLICA = os.environ.get("ICP_REPLICA_URL") or os.environ.get("ICP_NETWORK_URL")
 IDENTITY_PATH = os.environ.get("STORAGE_AGENT_KEY_PATH")
@@ -21,6 +23,8 @@ def main():
         return 2
     # derive public PEM from private key to avoid publishing the private key
     pem = derive_public_pem(p)
+    algorithm, key_id = key_metadata(p)
+    print("Algorithm:", algorithm, "key id:", key_id)
     if not (REPLICA and CANISTER and IDENTITY_PATH):
         print("ICP not fully configured. Returning PEM and skipping on-chain publish.")
         print(pem)
@@ -45,16 +49,20 @@ def main():
     identity = Identity.from_pem(idp.read_text())
     agent = ICAgent(identity, client)
 
-    # build candid arg: a single text param
+    # build candid args: (pem, algorithm, key_id) text params
     try:
-        arg = encode([{"type": Types.Text, "value": pem}])
+        arg = encode([
+            {"type": Types.Text, "value": pem},
+            {"type": Types.Text, "value": algorithm or ""},
+            {"type": Types.Text, "value": key_id or ""},
+        ])
     except Exception as e:
         print("Failed to encode candid arg:", e)
         return 5
 
     try:
-        print("Calling set_pubkey on canister", CANISTER, "via", REPLICA)
-        res = agent.update_raw(canister_id=CANISTER, method_name="set_pubkey", arg=arg)
+        print("Calling set_signing_key on canister", CANISTER, "via", REPLICA)
+        res = agent.update_raw(canister_id=CANISTER, method_name="set_signing_key", arg=arg)
         print("Published, response:", res)
         return 0
     except Exception as e:
@@ -78,3 +86,16 @@ def derive_public_pem(path: Path) -> str:
         return pub.public_bytes(encoding=serialization.Encoding.PEM, format=serialization.PublicFormat.SubjectPublicKeyInfo).decode()
     except Exception:
         return path.read_text()
+
+
+def key_metadata(path: Path) -> tuple[str | None, str | None]:
+    """Return (algorithm, key id hex) of the key at `path`, or (None, None)."""
+    try:
+        try:
+            from .provenance import key_id, load_public_key, signer_for_key
+        except ImportError:
+            from provenance import key_id, load_public_key, signer_for_key
+        pub = load_public_key(path.read_bytes())
+        return signer_for_key(pub).algorithm, key_id(pub).hex()
+    except Exception:
+        return None, None
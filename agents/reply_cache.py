@@ -0,0 +1,129 @@
+"""Normalized reply cache for /query answers.
+
+Answers are cached per intent and normalized entity tuple, e.g.
+("price", ("bitcoin",)), so "berapa harga bitcoin", "Harga Bitcoin?" and
+"price btc" share one entry regardless of wording. Each intent has its own
+TTL, memory is bounded by entry count and total reply bytes (LRU eviction),
+and identical in-flight computations are coalesced.
+
+Configuration (env):
+- REPLY_CACHE_TTL_PRICE: seconds (default 5)
+- REPLY_CACHE_TTL_NEWS: seconds (default 300)
+- REPLY_CACHE_TTL_DEFAULT: seconds for other intents (default 30)
+- REPLY_CACHE_MAX_ENTRIES (default 2048)
+- REPLY_CACHE_MAX_BYTES (default 1048576)
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from single_flight import SingleFlight
+
+REPLY_CACHE_TTLS = {
+    "price": float(os.getenv("REPLY_CACHE_TTL_PRICE", "5")),
+    "news": float(os.getenv("REPLY_CACHE_TTL_NEWS", "300")),
+}
+REPLY_CACHE_TTL_DEFAULT = float(os.getenv("REPLY_CACHE_TTL_DEFAULT", "30"))
+REPLY_CACHE_MAX_ENTRIES = int(os.getenv("REPLY_CACHE_MAX_ENTRIES", "2048"))
+REPLY_CACHE_MAX_BYTES = int(os.getenv("REPLY_CACHE_MAX_BYTES", str(1024 * 1024)))
+
+# compute() returns (reply, cacheable); uncacheable replies (e.g. upstream
+# failures) are returned to every coalesced caller but not stored
+Compute = Callable[[], Awaitable[tuple[str, bool]]]
+
+
+class ReplyCache:
+    def __init__(
+        self,
+        ttls: dict | None = None,
+        default_ttl: float = REPLY_CACHE_TTL_DEFAULT,
+        max_entries: int = REPLY_CACHE_MAX_ENTRIES,
+        max_bytes: int = REPLY_CACHE_MAX_BYTES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttls = dict(REPLY_CACHE_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        # key -> (reply, expires_at)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(intent: str, entities) -> tuple:
+        return (intent, tuple(entities))
+
+    def _store(self, key: tuple, reply: str):
+        ttl = self.ttls.get(key[0], self.default_ttl)
+        if ttl <= 0:
+            return
+        size = len(reply.encode())
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old[0].encode())
+        self._entries[key] = (reply, self._clock() + ttl)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.encode())
+            self.evictions += 1
+
+    def get(self, key: tuple) -> str | None:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        if self._clock() > item[1]:
+            del self._entries[key]
+            self._bytes -= len(item[0].encode())
+            return None
+        self._entries.move_to_end(key)
+        return item[0]
+
+    async def get_or_compute(self, intent: str, entities, compute: Compute) -> str:
+        key = self.key(intent, entities)
+        reply = self.get(key)
+        if reply is not None:
+            self.hits += 1
+            return reply
+        self.misses += 1
+
+        async def _compute_and_store():
+            reply, cacheable = await compute()
+            if cacheable:
+                self._store(key, reply)
+            return reply
+
+        task, joined = self._flights.run(key, _compute_and_store)
+        if joined:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def clear(self):
+        self._entries.clear()
+        self._flights.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+reply_cache = ReplyCache()
@@ -0,0 +1,160 @@
+"""Process-wide runtime configuration snapshot.
+
+Hot paths call `current()`, which returns an immutable `RuntimeConfig`
+without touching the filesystem or the environment. The snapshot is rebuilt
+by `reload()`, which is called:
+- by a background watcher when the schedule token file changes (mtime
+  polling every CONFIG_POLL_INTERVAL seconds),
+- by `/schedule/rotate` right after it writes a new token,
+- by the `/admin/config/reload` endpoint (e.g. after changing env vars or
+  editing the token file by hand).
+
+Snapshot sources (env):
+- SCHEDULE_TOKEN_FILE (default ./.schedule_token), else SCHEDULE_TOKEN
+- SCHEDULE_TOKEN_AUDIT (default ./.schedule_token_audit.log)
+- ICP_NETWORK_URL, else ICP_REPLICA_URL; an explicitly empty value means unset
+- CANISTER_ID, STORAGE_AGENT_KEY_PATH
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger("runtime_config")
+
+CONFIG_POLL_INTERVAL = float(os.getenv("CONFIG_POLL_INTERVAL", "2"))
+
+# Muat variabel dari file .env sebelum snapshot pertama
+load_dotenv()
+
+
+@dataclass(frozen=True)
+class RuntimeConfig:
+    schedule_token: str
+    schedule_token_file: str
+    schedule_token_audit: str
+    icp_network_url: str | None
+    canister_id: str | None
+    identity_path: str | None
+    # (mtime_ns, size) of the token file when loaded, None if it was absent
+    token_file_signature: tuple | None
+    loaded_at: float
+
+    def summary(self) -> dict:
+        """Non-secret view for admin/health endpoints."""
+        return {
+            "schedule_token_set": bool(self.schedule_token),
+            "schedule_token_file": self.schedule_token_file,
+            "icp_network_url": self.icp_network_url,
+            "canister_id": self.canister_id,
+            "identity_configured": bool(self.identity_path),
+            "loaded_at": self.loaded_at,
+        }
+
+
+def _file_signature(path: str) -> tuple | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _resolve_icp_url() -> str | None:
+    # Treat an explicitly set empty env var as 'unset' so ICP_NETWORK_URL=""
+    # forces dry-run even when ICP_REPLICA_URL is present.
+    env_icp = os.environ.get("ICP_NETWORK_URL", None)
+    if env_icp is not None:
+        return env_icp.strip() or None
+    env_rep = os.environ.get("ICP_REPLICA_URL", None)
+    if env_rep is not None:
+        return env_rep.strip() or None
+    return None
+
+
+def load_config() -> RuntimeConfig:
+    """Build a fresh snapshot from the environment and the token file."""
+    token_file = os.environ.get("SCHEDULE_TOKEN_FILE", "./.schedule_token")
+    signature = _file_signature(token_file)
+    token = ""
+    if signature is not None:
+        try:
+            with open(token_file, "r") as f:
+                token = f.read().strip()
+        except Exception:
+            token = ""
+    if not token:
+        token = os.environ.get("SCHEDULE_TOKEN", "")
+    return RuntimeConfig(
+        schedule_token=token,
+        schedule_token_file=token_file,
+        schedule_token_audit=os.environ.get("SCHEDULE_TOKEN_AUDIT", "./.schedule_token_audit.log"),
+        icp_network_url=_resolve_icp_url(),
+        canister_id=os.environ.get("CANISTER_ID") or None,
+        identity_path=os.environ.get("STORAGE_AGENT_KEY_PATH") or None,
+        token_file_signature=signature,
+        loaded_at=time.time(),
+    )
+
+
+_current: RuntimeConfig | None = None
+_lock = threading.Lock()
+
+
+def current() -> RuntimeConfig:
+    """Return the active snapshot (O(1), no syscalls after the first call)."""
+    cfg = _current
+    if cfg is None:
+        cfg = reload()
+    return cfg
+
+
+def reload() -> RuntimeConfig:
+    """Rebuild the snapshot and publish it atomically."""
+    global _current
+    with _lock:
+        _current = load_config()
+        return _current
+
+
+class ConfigWatcher(threading.Thread):
+    """Daemon thread that reloads the snapshot when the token file changes."""
+
+    def __init__(self, interval: float = CONFIG_POLL_INTERVAL):
+        super().__init__(name="runtime-config-watcher", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                cfg = current()
+                if _file_signature(cfg.schedule_token_file) != cfg.token_file_signature:
+                    reload()
+                    logger.info("Schedule token file changed; runtime config reloaded")
+            except Exception:
+                logger.exception("Runtime config watcher failed")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_watcher: ConfigWatcher | None = None
+
+
+def start_watcher(interval: float = CONFIG_POLL_INTERVAL) -> ConfigWatcher:
+    global _watcher
+    if _watcher is None or not _watcher.is_alive():
+        _watcher = ConfigWatcher(interval)
+        _watcher.start()
+    return _watcher
+
+
+def stop_watcher():
+    global _watcher
+    if _watcher is not None:
+        _watcher.stop()
+        _watcher = None
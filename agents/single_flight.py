@@ -0,0 +1,45 @@
+"""Single-flight coalescing of concurrent async computations by key.
+
+While a computation for a key is running, later callers on the same event
+loop join it instead of starting another one. Used by the price cache
+(upstream fetches) and the reply cache (answer computations).
+
+Usage:
+  flights = SingleFlight()
+  task, joined = flights.run(key, lambda: fetch_and_store(key))
+  value = await asyncio.shield(task)
+"""
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        # key -> in-flight task for the loop it was started on
+        self._inflight: dict = {}
+
+    def run(self, key: Hashable, compute: Callable[[], Awaitable]) -> tuple[asyncio.Task, bool]:
+        """Return (task, joined) for the shared computation of `key` on the running loop."""
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return task, True
+
+        async def _run():
+            try:
+                return await compute()
+            finally:
+                if self._inflight.get(key) is asyncio.current_task():
+                    del self._inflight[key]
+
+        task = loop.create_task(_run())
+        # retrieve the outcome so an error nobody awaited is not reported as unhandled
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return task, False
+
+    def clear(self):
+        self._inflight.clear()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
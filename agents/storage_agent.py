@@ -2,22 +2,34 @@
 import os
 import sys
 import uuid
+import hashlib
 import logging
 import asyncio
+import time
 from dotenv import load_dotenv
 from typing import Any
 
+import runtime_config
+from event_log import get_event_log
+from write_batcher import WriteBatcher
+from icp_connection import get_icp_manager
+from outbox import Outbox
+from circuit_breaker import CircuitBreaker
+from dedup import DedupIndex
+from entry_store import get_entry_store
+from entry_codec import encode_record
+from storage_transport import _Ctx
+
 # Optional imports for ic-py; we support dry-run if not installed
 try:
     from ic.client import Client
-    from ic.identity import BasicIdentity
     from ic.agent import Agent as ICAgent
-    from ic.candid import encode
+    from ic.candid import encode, Types
 except Exception:
     Client = None
-    BasicIdentity = None
     ICAgent = None
     encode = None
+    Types = None
 
 # Muat variabel dari file .env
 load_dotenv()
@@ -35,6 +47,59 @@ IDENTITY_PATH = os.getenv("STORAGE_AGENT_KEY_PATH")
 STORAGE_MAX_RETRIES = int(os.getenv("STORAGE_MAX_RETRIES", "3"))
 STORAGE_BACKOFF_BASE = float(os.getenv("STORAGE_BACKOFF_BASE", "0.5"))
 
+# Canister write batching: entries are flushed as one add_chat_entries call
+# once STORAGE_BATCH_MAX are pending or STORAGE_BATCH_WINDOW seconds passed.
+# STORAGE_BATCH_MAX=1 keeps one add_chat_entry call per entry.
+STORAGE_BATCH_MAX = int(os.getenv("STORAGE_BATCH_MAX", "50"))
+STORAGE_BATCH_WINDOW = float(os.getenv("STORAGE_BATCH_WINDOW", "0.2"))
+
+# Durable outbox: on-chain entries are fsynced to a local write-ahead log and
+# shipped to the canister in the background (see outbox.py for OUTBOX_* env).
+# STORAGE_OUTBOX=0 writes to the canister inline and waits for the result.
+STORAGE_OUTBOX = os.getenv("STORAGE_OUTBOX", "1").lower() not in ("0", "false", "no")
+
+# Circuit breaker around canister update calls: opens when the failure rate
+# or slow-call rate over the last STORAGE_CB_WINDOW calls crosses its
+# threshold, fails calls fast while open, and probes again after
+# STORAGE_CB_OPEN_SECONDS.
+canister_breaker = CircuitBreaker(
+    "canister",
+    failure_rate=float(os.getenv("STORAGE_CB_FAILURE_RATE", "0.5")),
+    slow_call_rate=float(os.getenv("STORAGE_CB_SLOW_CALL_RATE", "0.8")),
+    slow_call_seconds=float(os.getenv("STORAGE_CB_SLOW_CALL_SECONDS", "10")),
+    min_calls=int(os.getenv("STORAGE_CB_MIN_CALLS", "5")),
+    window=int(os.getenv("STORAGE_CB_WINDOW", "20")),
+    open_seconds=float(os.getenv("STORAGE_CB_OPEN_SECONDS", "15")),
+)
+
+# Idempotency window: a repeated client entry_id within the window returns
+# the original result instead of re-signing/re-writing. Identical content is
+# only folded onto the earlier entry when the new one has no entry_id of its
+# own; an explicit entry_id is always stored under that id.
+STORAGE_DEDUP = os.getenv("STORAGE_DEDUP", "1").lower() not in ("0", "false", "no")
+dedup_index = DedupIndex(
+    lru_size=int(os.getenv("STORAGE_DEDUP_LRU_SIZE", "4096")),
+    bloom_capacity=int(os.getenv("STORAGE_DEDUP_BLOOM_CAPACITY", "1000000")),
+    bloom_error_rate=float(os.getenv("STORAGE_DEDUP_BLOOM_ERROR_RATE", "1e-6")),
+    by_content=os.getenv("STORAGE_DEDUP_BY_CONTENT", "1").lower() not in ("0", "false", "no"),
+)
+
+# Canister payload format: "compact" sends the binary record from
+# entry_codec.py (raw hash/signature bytes, compressed entry) through
+# add_chat_records; "json" keeps the legacy JSON text via add_chat_entries.
+STORAGE_PAYLOAD_FORMAT = os.getenv("STORAGE_PAYLOAD_FORMAT", "compact").lower()
+
+# Provenance signing: "entry" signs every content hash (one ECDSA operation
+# per entry); "batch" groups entries arriving within STORAGE_SIGN_WINDOW
+# seconds (up to STORAGE_SIGN_BATCH_MAX), signs the Merkle root of their
+# hashes once and stores each entry's inclusion proof with it.
+STORAGE_SIGNING = os.getenv("STORAGE_SIGNING", "entry").lower()
+STORAGE_SIGN_BATCH_MAX = int(os.getenv("STORAGE_SIGN_BATCH_MAX", "256"))
+STORAGE_SIGN_WINDOW = float(os.getenv("STORAGE_SIGN_WINDOW", "0.02"))
+
+# Local SQLite mirror of accepted entries, read back by the /history endpoint
+STORAGE_MIRROR = os.getenv("STORAGE_MIRROR", "1").lower() not in ("0", "false", "no")
+
 # Agent is created lazily to avoid import-time side-effects (local replica start)
 agent = None
 
@@ -49,11 +114,9 @@ except Exception:
             self.entry = entry
 
 try:
-    from .provenance import sign_hex
-except Exception:
-    # fallback if provenance module not present at import time
-    def sign_hex(h):
-        return None
+    from .provenance import sign_hex, sign_batch_hex
+except ImportError:
+    from provenance import sign_hex, sign_batch_hex
 
 
 async def initialize(ctx: Any):
@@ -73,81 +136,95 @@ def encode_args_for_add(entry_id: str, entry: str) -> bytes:
     return encode((entry_id, entry), "(text, text)")
 
 
-async def call_add_chat_entry_direct(entry_id: str, entry: str) -> dict:
-    """Directly call the canister using ic-py with retries and backoff.
+def _chat_entry_types():
+    chat_entry = Types.Record({"entry_id": Types.Text, "entry": Types.Text})
+    entry_result = Types.Record({"entry_id": Types.Text, "ok": Types.Bool, "error": Types.Opt(Types.Text)})
+    return chat_entry, entry_result
 
-    Returns a dict with keys: ok (bool), dry_run (bool, optional), result (raw
-    response, optional), attempts (int), error (str, optional).
 
-    If ICP_NETWORK_URL is not set, operates in dry-run mode.
-    """
-    # Resolve env at runtime so tests can monkeypatch
-    # Resolve env at runtime so tests can monkeypatch. Treat an explicitly set
-    # empty env var as 'unset' to allow tests to force dry-run by setting
-    # ICP_NETWORK_URL="".
-    env_icp = os.environ.get("ICP_NETWORK_URL", None)
-    env_rep = os.environ.get("ICP_REPLICA_URL", None)
-    if env_icp is not None:
-        icp_network_url = env_icp.strip() or None
-    elif env_rep is not None:
-        icp_network_url = env_rep.strip() or None
-    else:
-        icp_network_url = ICP_NETWORK_URL or None
+def encode_args_for_add_many(entries: list[tuple[str, str]]) -> bytes:
+    if encode is None or Types is None:
+        raise RuntimeError("ic-py candid encode not available")
+    # Candid types: (vec record { entry_id: text; entry: text })
+    chat_entry, _ = _chat_entry_types()
+    value = [{"entry_id": entry_id, "entry": entry} for entry_id, entry in entries]
+    return encode([{"type": Types.Vec(chat_entry), "value": value}])
 
-    canister_id = os.environ.get("CANISTER_ID", None) or CANISTER_ID
 
-    # DEBUG: log resolved runtime env for troubleshooting tests
-    logger.info("Resolved icp_network_url=%r, canister_id=%r, Client=%s", icp_network_url, canister_id, Client is not None)
+def _chat_record_type():
+    return Types.Record({"entry_id": Types.Text, "record": Types.Vec(Types.Nat8)})
 
+
+def encode_args_for_add_records(entries: list[tuple[str, bytes]]) -> bytes:
+    if encode is None or Types is None:
+        raise RuntimeError("ic-py candid encode not available")
+    # Candid types: (vec record { entry_id: text; record: blob })
+    value = [{"entry_id": entry_id, "record": bytes(record)} for entry_id, record in entries]
+    return encode([{"type": Types.Vec(_chat_record_type()), "value": value}])
+
+
+def build_payload(entry: str, content_hash: str | None, sig: str | None, merkle_root: str | None = None, proof: list | None = None) -> str | bytes:
+    """Encode an entry with its provenance metadata in STORAGE_PAYLOAD_FORMAT."""
+    if STORAGE_PAYLOAD_FORMAT == "compact":
+        return encode_record(entry, content_hash, sig, merkle_root=merkle_root, proof=proof)
+    import json
+    doc = {"entry": entry, "content_hash": content_hash, "signature": sig}
+    if merkle_root:
+        doc.update(merkle_root=merkle_root, proof=proof)
+    return json.dumps(doc)
+
+
+def _preflight(cfg) -> dict | None:
+    """Return an early result (dry-run or config error), or None to proceed."""
     # If no network URL is configured we operate in dry-run regardless of canister id
-    if not icp_network_url:
-        logger.info("DRY RUN: would call canister %s with entry_id=%s", canister_id, entry_id)
+    if not cfg.icp_network_url:
         return {"ok": True, "dry_run": True, "attempts": 0}
-
-    if not canister_id:
+    if not cfg.canister_id:
         logger.error("CANISTER_ID is not configured")
         return {"ok": False, "error": "CANISTER_ID not set"}
-
     if Client is None or ICAgent is None:
         logger.error("ic-py not available in environment")
         return {"ok": False, "error": "ic-py not installed in environment"}
+    return None
+
 
-    # build client and agent
+async def _update_with_retries(cfg, method: str, encode_args, **kwargs) -> dict:
+    """Call `method` with exponential backoff; same result shape as call_add_chat_entry_direct.
+
+    The ic-py client/agent comes from the shared connection manager (built
+    once per replica URL and identity) and the blocking call runs on its
+    thread pool.
+    """
+    manager = get_icp_manager()
     try:
-        client = Client(url=icp_network_url)
+        await manager.connect(cfg.icp_network_url, cfg.identity_path)
     except Exception as e:
-        logger.exception("Failed to construct ic client")
-        return {"ok": False, "error": f"failed to construct client: {e}"}
+        return {"ok": False, "error": f"failed to create ic-py agent: {e}"}
 
-    ic_agent = None
-    if IDENTITY_PATH and BasicIdentity is not None:
-        try:
-            with open(IDENTITY_PATH, "rb") as f:
-                key = f.read()
-            identity = BasicIdentity.from_pem(key)
-            ic_agent = ICAgent(identity, client)
-        except Exception as e:
-            logger.exception("Failed to load identity for ic-py agent")
-            return {"ok": False, "error": f"failed to load identity: {e}"}
-    else:
-        # try anonymous agent if supported
-        try:
-            ic_agent = ICAgent(None, client)
-        except Exception as e:
-            logger.exception("Failed to create anonymous ic-py agent")
-            return {"ok": False, "error": "unable to create ic-py agent; provide IDENTITY_PATH"}
-
-    # encode and call with retries
     attempts = 0
     last_err = None
     while attempts <= STORAGE_MAX_RETRIES:
+        if not canister_breaker.allow():
+            # fail fast instead of retrying against an unhealthy replica
+            return {
+                "ok": False,
+                "error": last_err or "circuit open",
+                "circuit_open": True,
+                "retry_after": canister_breaker.retry_after(),
+                "attempts": attempts,
+            }
         attempts += 1
+        start = time.monotonic()
         try:
-            args = encode_args_for_add(entry_id, entry)
-            res = await ic_agent.update_raw(canister_id=CANISTER_ID, method_name="add_chat_entry", arg=args)
-            logger.info("Successfully called canister add_chat_entry on attempt %d", attempts)
+            res = await manager.update(cfg.icp_network_url, cfg.identity_path, cfg.canister_id, method, encode_args(), **kwargs)
+            canister_breaker.record(True, time.monotonic() - start)
+            logger.info("Successfully called canister %s on attempt %d", method, attempts)
             return {"ok": True, "result": res, "attempts": attempts}
+        except asyncio.CancelledError:
+            canister_breaker.record(False, time.monotonic() - start)
+            raise
         except Exception as e:
+            canister_breaker.record(False, time.monotonic() - start)
             last_err = str(e)
             logger.exception("ic-py call failed on attempt %d", attempts)
             if attempts > STORAGE_MAX_RETRIES:
@@ -161,24 +238,217 @@ async def call_add_chat_entry_direct(entry_id: str, entry: str) -> dict:
             except asyncio.CancelledError:
                 logger.warning("Sleep interrupted during backoff")
                 break
+    return {"ok": False, "error": last_err or "cancelled", "attempts": attempts}
 
 
+async def call_add_chat_entry_direct(entry_id: str, entry: str | bytes) -> dict:
+    """Directly call the canister using ic-py with retries and backoff.
 
-async def handle_store_chat(ctx: Any, sender: str, msg: StoreChat):
-    ctx.logger.info("Received request to store entry: '%s' from %s", msg.entry, sender)
+    Returns a dict with keys: ok (bool), dry_run (bool, optional), result (raw
+    response, optional), attempts (int), error (str, optional).
+
+    If ICP_NETWORK_URL is not set, operates in dry-run mode.
+    """
+    # ICP URL / canister come from the runtime config snapshot (env at
+    # startup or the last runtime_config.reload()), not os.environ per call
+    cfg = runtime_config.current()
+    logger.debug("Resolved icp_network_url=%r, canister_id=%r, Client=%s", cfg.icp_network_url, cfg.canister_id, Client is not None)
+
+    early = _preflight(cfg)
+    if early is not None:
+        if early.get("dry_run"):
+            logger.info("DRY RUN: would call canister %s with entry_id=%s", cfg.canister_id, entry_id)
+        return early
+
+    if isinstance(entry, (bytes, bytearray)):
+        # binary records only have the batch method
+        return (await call_add_chat_entries_direct([(entry_id, entry)]))[0]
+    return await _update_with_retries(cfg, "add_chat_entry", lambda: encode_args_for_add(entry_id, entry))
+
+
+def _entry_outcomes(res, entries: list[tuple[str, str]], attempts: int) -> list[dict]:
+    """Map the canister's vec EntryResult reply onto one dict per entry."""
+    rows = res
+    # ic-py returns [{"type": ..., "value": [...]}] for the single return value
+    if isinstance(rows, list) and len(rows) == 1 and isinstance(rows[0], dict) and "value" in rows[0]:
+        rows = rows[0]["value"]
+    if not isinstance(rows, list) or len(rows) != len(entries):
+        # the call committed but the reply is not itemized; treat all as stored
+        return [{"ok": True, "result": res, "attempts": attempts} for _ in entries]
+    outcomes = []
+    for row in rows:
+        row = row if isinstance(row, dict) else {}
+        error = row.get("error")
+        if isinstance(error, list):  # opt text decodes as [] or [text]
+            error = error[0] if error else None
+        if row.get("ok", True):
+            outcomes.append({"ok": True, "attempts": attempts})
+        else:
+            # "rejected": the call went through but this entry was refused
+            outcomes.append({"ok": False, "rejected": True, "error": error or "rejected by canister", "attempts": attempts})
+    return outcomes
+
+
+async def call_add_chat_entries_direct(entries: list[tuple[str, str | bytes]]) -> list[dict]:
+    """Write many (entry_id, entry) pairs with one update call.
+
+    Text entries go through add_chat_entries, binary records (entry_codec)
+    through add_chat_records; a batch holding both (e.g. an outbox backlog
+    from before a format switch) makes one call per kind.
+
+    Returns one result dict per entry, in order, shaped like
+    `call_add_chat_entry_direct`'s. A failed call fails every entry; entries
+    the canister rejects individually carry their own error.
+    """
+    if not entries:
+        return []
+    cfg = runtime_config.current()
+    early = _preflight(cfg)
+    if early is not None:
+        if early.get("dry_run"):
+            logger.info("DRY RUN: would call canister %s with %d entries", cfg.canister_id, len(entries))
+        return [dict(early) for _ in entries]
+
+    records = [i for i, (_, entry) in enumerate(entries) if isinstance(entry, (bytes, bytearray))]
+    if not records:
+        return await _add_many(cfg, "add_chat_entries", encode_args_for_add_many, entries)
+    if len(records) == len(entries):
+        return await _add_many(cfg, "add_chat_records", encode_args_for_add_records, entries)
+    binary = set(records)
+    texts = [i for i in range(len(entries)) if i not in binary]
+    outcomes: list = [None] * len(entries)
+    for method, encoder, idx in (("add_chat_entries", encode_args_for_add_many, texts), ("add_chat_records", encode_args_for_add_records, records)):
+        for i, res in zip(idx, await _add_many(cfg, method, encoder, [entries[i] for i in idx])):
+            outcomes[i] = res
+    return outcomes
+
+
+async def _add_many(cfg, method: str, encoder, entries: list) -> list[dict]:
+    _, entry_result = _chat_entry_types()
+    result = await _update_with_retries(
+        cfg,
+        method,
+        lambda: encoder(entries),
+        return_type=[Types.Vec(entry_result)],
+    )
+    if not result.get("ok"):
+        return [dict(result) for _ in entries]
+    return _entry_outcomes(result.get("result"), entries, result["attempts"])
+
+
+async def _flush_chat_batch(entries: list[tuple[str, str | bytes]]) -> list[dict]:
+    return await call_add_chat_entries_direct(entries)
+
+
+# shared by every handle_store_chat caller in this process
+chat_batcher = WriteBatcher(_flush_chat_batch, max_batch=STORAGE_BATCH_MAX, window=STORAGE_BATCH_WINDOW)
+
+
+async def _sign_batch(hashes: list[str]) -> list[dict]:
+    signed = sign_batch_hex(hashes)
+    if not signed:
+        return [{} for _ in hashes]
+    return [{"signature": signed["signature"], "merkle_root": signed["root"], "proof": proof} for proof in signed["proofs"]]
 
+
+# aggregate signing: one ECDSA signature per batch of content hashes
+sign_batcher = WriteBatcher(_sign_batch, max_batch=STORAGE_SIGN_BATCH_MAX, window=STORAGE_SIGN_WINDOW)
+
+
+async def sign_content_hash(content_hash: str) -> dict:
+    """Return {"signature", and in batch mode "merkle_root" and "proof"}."""
+    if STORAGE_SIGNING == "batch":
+        return await sign_batcher.submit(content_hash)
+    return {"signature": sign_hex(content_hash)}
+
+
+async def _ship_outbox(records: list) -> list[dict]:
+    results = await call_add_chat_entries_direct([(r.entry_id, r.payload) for r in records])
+    events = get_event_log()
+    for r, res in zip(records, results):
+        if res.get("ok"):
+            events.emit("storage", "stored", entry_id=r.entry_id, seq=r.seq, attempts=res.get("attempts"), content_hash=r.content_hash)
+        else:
+            events.emit("storage", "failed", entry_id=r.entry_id, seq=r.seq, attempts=res.get("attempts"), error=res.get("error"))
+    if STORAGE_MIRROR:
+        stored = [r.entry_id for r, res in zip(records, results) if res.get("ok")]
+        if stored:
+            try:
+                await get_entry_store().update_status(stored, "stored")
+            except Exception:
+                logger.exception("Failed to update mirrored status for %d entries", len(stored))
+    return results
+
+
+_outbox: Outbox | None = None
+
+
+def get_outbox() -> Outbox:
+    """Return the process-wide outbox, replaying its backlog on first use."""
+    global _outbox
+    if _outbox is None:
+        _outbox = Outbox(_ship_outbox).open()
+    return _outbox
+
+
+async def start_outbox():
+    """Replay entries left in the outbox by a previous run (no-op in dry-run mode)."""
+    if STORAGE_OUTBOX and runtime_config.current().icp_network_url:
+        await get_outbox().start()
+
+
+async def close_outbox():
+    """Stop the outbox shipper and close its active segment."""
+    if _outbox is not None:
+        await _outbox.close()
+
+
+async def write_chat_entry(entry_id: str, entry: str | bytes) -> dict:
+    """Store one entry, through the batcher unless batching is disabled."""
+    if STORAGE_BATCH_MAX <= 1:
+        return await call_add_chat_entry_direct(entry_id, entry)
+    return await chat_batcher.submit((entry_id, entry))
+
+
+async def _accept(msg: StoreChat, content_hash: str | None, sig: str | None, result: dict) -> dict:
+    """Record a write result in the idempotency window and the local mirror."""
+    # only successful writes are remembered/mirrored; failures may be retried
+    if not result.get("ok"):
+        return result
+    if STORAGE_DEDUP:
+        dedup_index.remember(msg.entry_id, content_hash, result)
+    if STORAGE_MIRROR:
+        status = "dry_run" if result.get("dry_run") else "queued" if result.get("queued") else "stored"
+        try:
+            await get_entry_store().record(result["entry_id"], msg.entry or "", content_hash, sig, status)
+        except Exception:
+            logger.exception("Failed to mirror entry_id=%s to the local entry store", result.get("entry_id"))
+    return result
+
+
+async def _confirm_duplicate(entry_id: str | None, content_hash: str | None) -> dict | None:
+    """Check a bloom-only dedup hit against the local mirror; None means write it."""
+    if not STORAGE_MIRROR:
+        return None
+    try:
+        row = await get_entry_store().lookup(entry_id, content_hash)
+    except Exception:
+        logger.exception("Failed to confirm probable duplicate entry_id=%s", entry_id)
+        return None
+    if row is None:
+        # bloom false positive (or an entry that was never mirrored)
+        return None
+    return {"ok": True, "entry_id": row["entry_id"], "content_hash": row["content_hash"], "signature": row["signature"], "status": row["status"]}
+
+
+async def handle_store_chat(ctx: Any, sender: str, msg: StoreChat):
     entry_id = msg.entry_id or str(uuid.uuid4())
+    events = get_event_log()
+    # record metadata only; the entry text itself never goes to the logs
+    events.emit("storage", "received", entry_id=entry_id, sender=sender, size=len(msg.entry or ""))
 
     # If ic-py is not available or ICP URL missing, just log and return (dry-run)
-    # Resolve runtime env same as above and honor explicit empty string as unset
-    env_icp = os.environ.get("ICP_NETWORK_URL", None)
-    env_rep = os.environ.get("ICP_REPLICA_URL", None)
-    if env_icp is not None:
-        icp_network_url = env_icp.strip() or None
-    elif env_rep is not None:
-        icp_network_url = env_rep.strip() or None
-    else:
-        icp_network_url = ICP_NETWORK_URL or None
+    icp_network_url = runtime_config.current().icp_network_url
 
     # Compute content hash and signature always (for provenance metadata)
     try:
@@ -186,33 +456,55 @@ async def handle_store_chat(ctx: Any, sender: str, msg: StoreChat):
     except Exception:
         content_hash = None
 
-    sig = None
+    # client retries (same entry_id) and identical id-less content reuse the first result
+    if STORAGE_DEDUP:
+        original = dedup_index.lookup(msg.entry_id, None if msg.entry_id else content_hash)
+        if original is not None and original.get("probable"):
+            original = await _confirm_duplicate(msg.entry_id, None if msg.entry_id else content_hash)
+        if original is not None:
+            events.emit("storage", "deduplicated", entry_id=entry_id, original_entry_id=original.get("entry_id"), probable=bool(original.get("probable")))
+            return {**original, "duplicate": True}
+
+    signed = {}
     try:
         if content_hash:
-            sig = sign_hex(content_hash)
+            signed = await sign_content_hash(content_hash)
     except Exception:
-        sig = None
+        logger.exception("Failed to sign entry_id=%s", entry_id)
+        signed = {}
+    sig = signed.get("signature")
+    # returned to the caller with every accepted result
+    provenance = {"content_hash": content_hash, "signature": sig}
+    if signed.get("merkle_root"):
+        provenance.update(merkle_root=signed["merkle_root"], proof=signed.get("proof"))
 
     stored_payload = None
     try:
-        # store a JSON string containing entry + provenance metadata
-        import json
-        stored_payload = json.dumps({"entry": msg.entry, "content_hash": content_hash, "signature": sig})
+        # entry + provenance metadata, compact binary record or JSON text
+        stored_payload = build_payload(msg.entry, content_hash, sig, signed.get("merkle_root"), signed.get("proof"))
     except Exception:
+        logger.exception("Failed to encode payload for entry_id=%s; storing the raw entry", entry_id)
         stored_payload = msg.entry
 
     if not icp_network_url or Client is None:
-        ctx.logger.info("DRY RUN mode: not performing on-chain call. entry_id=%s", entry_id)
-        return {"ok": True, "dry_run": True, "entry_id": entry_id, "content_hash": content_hash, "signature": sig}
+        events.emit("storage", "stored", entry_id=entry_id, dry_run=True, content_hash=content_hash)
+        return await _accept(msg, content_hash, sig, {"ok": True, "dry_run": True, "entry_id": entry_id, **provenance})
 
-    # perform on-chain write
-    result = await call_add_chat_entry_direct(entry_id, stored_payload)
+    if STORAGE_OUTBOX:
+        # durable local append; the outbox shipper does the canister write
+        seq = await get_outbox().append(entry_id, stored_payload, content_hash, sig)
+        events.emit("storage", "queued", entry_id=entry_id, seq=seq)
+        return await _accept(msg, content_hash, sig, {"ok": True, "queued": True, "seq": seq, "entry_id": entry_id, **provenance})
+
+    # perform on-chain write (batched with concurrent entries)
+    result = await write_chat_entry(entry_id, stored_payload)
     if result.get("ok"):
-        ctx.logger.info("Successfully wrote to on-chain memory (entry_id=%s) after %s attempts", entry_id, result.get("attempts"))
+        events.emit("storage", "stored", entry_id=entry_id, attempts=result.get("attempts"), content_hash=content_hash)
     else:
+        events.emit("storage", "failed", entry_id=entry_id, attempts=result.get("attempts"), error=result.get("error"))
         ctx.logger.error("Failed to write to canister (entry_id=%s): %s", entry_id, result.get("error"))
     # return the result so in-process callers can inspect outcome
-    return {**result, "entry_id": entry_id}
+    return await _accept(msg, content_hash, sig, {**result, "entry_id": entry_id})
 
 
 def health() -> dict:
@@ -220,7 +512,47 @@ def health() -> dict:
 
     This is used by tests and by the orchestrator fallback when running in-process.
     """
-    return {"canister": CANISTER_ID, "icpy": Client is not None}
+    return {"canister": runtime_config.current().canister_id, "icpy": Client is not None, "batching": chat_batcher.stats(), "icp": get_icp_manager().stats(), "outbox": _outbox.stats() if _outbox is not None else None, "circuit": canister_breaker.stats(), "dedup": dedup_index.stats(), "signing": {"mode": STORAGE_SIGNING, **sign_batcher.stats()}}
+
+
+def create_http_app():
+    """HTTP ingress for the storage transport's "http" mode.
+
+    Serves POST /submit (one message) and POST /submit/batch (many messages)
+    and hands each StoreChat to `handle_store_chat` in-process. Run with:
+      uvicorn storage_agent:create_http_app --factory --port 8000
+    """
+    from contextlib import asynccontextmanager
+    from fastapi import FastAPI
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await start_outbox()
+        yield
+        await close_outbox()
+
+    app = FastAPI(title="Pluto StorageAgent ingress", lifespan=lifespan)
+
+    ctx = _Ctx("storage_agent.http")
+
+    def _summary(res) -> dict:
+        res = res or {}
+        return {"ok": bool(res.get("ok")), "entry_id": res.get("entry_id"), "error": res.get("error")}
+
+    @app.post("/submit", status_code=202)
+    async def submit(body: dict):
+        msg = StoreChat(**(body.get("message") or {}))
+        res = await handle_store_chat(ctx, body.get("sender", "http"), msg)
+        return _summary(res)
+
+    @app.post("/submit/batch", status_code=202)
+    async def submit_batch(body: dict):
+        sender = body.get("sender", "http")
+        msgs = [StoreChat(**m) for m in body.get("messages") or []]
+        results = await asyncio.gather(*[handle_store_chat(ctx, sender, m) for m in msgs], return_exceptions=True)
+        return {"results": [_summary(r) if not isinstance(r, BaseException) else {"ok": False, "error": str(r)} for r in results]}
+
+    return app
 
 
 def _create_and_run():
@@ -0,0 +1,165 @@
+"""Bounded write-behind queue for StoreChat messages.
+
+Request handlers enqueue a message and return immediately; N background
+workers deliver queued messages through the configured send coroutine, so
+canister latency and retry backoff stay off the request path.
+
+A queued item may also be a list of messages that `send` delivers as one
+batch and answers with one result per message; delivered/failed are counted
+per message. A message failed when `send` raised, or when its result is an
+exception or a dict with "ok": False.
+
+When the queue is full the configured policy applies:
+- "block": wait for a free slot (default)
+- "drop-oldest": discard the oldest queued message to make room
+- "reject": raise QueueFullError (the orchestrator maps this to HTTP 503)
+
+Configuration (env):
+- STORAGE_QUEUE_MAXSIZE (default 1000)
+- STORAGE_QUEUE_WORKERS (default 4)
+- STORAGE_QUEUE_POLICY (block | drop-oldest | reject)
+- STORAGE_QUEUE_DRAIN_TIMEOUT: seconds to wait on shutdown (default 10)
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger("storage_queue")
+
+STORAGE_QUEUE_MAXSIZE = int(os.getenv("STORAGE_QUEUE_MAXSIZE", "1000"))
+STORAGE_QUEUE_WORKERS = int(os.getenv("STORAGE_QUEUE_WORKERS", "4"))
+STORAGE_QUEUE_POLICY = os.getenv("STORAGE_QUEUE_POLICY", "block")
+STORAGE_QUEUE_DRAIN_TIMEOUT = float(os.getenv("STORAGE_QUEUE_DRAIN_TIMEOUT", "10"))
+
+POLICIES = ("block", "drop-oldest", "reject")
+
+
+class QueueFullError(Exception):
+    """Raised by `submit` under the "reject" policy when the queue is full."""
+
+
+def _failed(result: Any) -> bool:
+    return isinstance(result, BaseException) or (isinstance(result, dict) and result.get("ok") is False)
+
+
+def _size(item: Any) -> int:
+    return len(item) if isinstance(item, list) else 1
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        send: Callable[[Any], Awaitable[Any]],
+        maxsize: int = STORAGE_QUEUE_MAXSIZE,
+        workers: int = STORAGE_QUEUE_WORKERS,
+        policy: str = STORAGE_QUEUE_POLICY,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown queue policy {policy!r}; expected one of {POLICIES}")
+        self._send = send
+        self.maxsize = maxsize
+        self.worker_count = max(1, workers)
+        self.policy = policy
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+        self._loop = None
+        self.enqueued = 0
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._queue is not None and self._loop is loop:
+            return
+        if self._queue is not None and self._queue.qsize():
+            logger.warning("Event loop changed; abandoning %d queued messages", self._queue.qsize())
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._workers = [loop.create_task(self._worker(i)) for i in range(self.worker_count)]
+
+    async def _worker(self, n: int):
+        queue = self._queue
+        while True:
+            msg = await queue.get()
+            try:
+                result = await self._send(msg)
+                if isinstance(msg, list):
+                    results = result if isinstance(result, list) and len(result) == len(msg) else [result] * len(msg)
+                    for m, r in zip(msg, results):
+                        self._count(n, m, r)
+                else:
+                    self._count(n, msg, result)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failed += _size(msg)
+                logger.exception("Write-behind worker %d failed to deliver %d message(s)", n, _size(msg))
+            finally:
+                queue.task_done()
+
+    def _count(self, n: int, msg: Any, result: Any):
+        if not _failed(result):
+            self.delivered += 1
+            return
+        self.failed += 1
+        error = result.get("error") if isinstance(result, dict) else result
+        logger.error("Write-behind worker %d failed to deliver entry_id=%s: %s", n, getattr(msg, "entry_id", None), error)
+
+    async def submit(self, msg: Any) -> None:
+        """Enqueue `msg` for background delivery, applying the full-queue policy."""
+        self._ensure_started()
+        queue = self._queue
+        if queue.full():
+            if self.policy == "reject":
+                self.rejected += 1
+                raise QueueFullError("storage queue is full")
+            if self.policy == "drop-oldest":
+                try:
+                    old = queue.get_nowait()
+                    queue.task_done()
+                    self.dropped += _size(old)
+                    if isinstance(old, list):
+                        logger.warning("Storage queue full; dropped a batch of %d messages", len(old))
+                    else:
+                        logger.warning("Storage queue full; dropped entry_id=%s", getattr(old, "entry_id", None))
+                except asyncio.QueueEmpty:
+                    pass
+        await queue.put(msg)
+        self.enqueued += _size(msg)
+
+    async def drain(self, timeout: float = STORAGE_QUEUE_DRAIN_TIMEOUT) -> bool:
+        """Wait for queued messages to be delivered, then stop the workers.
+
+        Returns False if the timeout expired with messages still queued.
+        """
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return True
+        ok = True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            ok = False
+            logger.error("Storage queue drain timed out with %d messages pending", self._queue.qsize())
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        self._loop = None
+        return ok
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.policy,
+            "maxsize": self.maxsize,
+            "workers": self.worker_count,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,223 @@
+"""Transports that deliver StoreChat messages to the storage agent.
+
+The orchestrator resolves one transport at startup instead of walking the
+uagents / in-process / HTTP fallback chain on every message:
+
+- "inprocess": call `storage_agent.handle_store_chat` directly; `start()`
+  replays the storage outbox backlog and `aclose()` closes the outbox
+- "uagents": send through a uagents Agent to the storage agent address
+- "http": POST to the storage agent's submit endpoint over a pooled
+  keep-alive `httpx.AsyncClient`; `send_many` submits a whole batch in one
+  request
+- "auto" (default): uagents if an Agent with `send` is importable, else
+  in-process if `storage_agent` imports, else HTTP
+
+Configuration (env):
+- STORAGE_TRANSPORT: auto | inprocess | uagents | http
+- STORAGE_SUBMIT_URL: single-message endpoint (default http://127.0.0.1:8000/submit)
+- STORAGE_SUBMIT_BATCH_URL: batch endpoint (default <STORAGE_SUBMIT_URL>/batch)
+- STORAGE_HTTP_TIMEOUT: per-request timeout in seconds (default 2)
+- STORAGE_AGENT_ADDRESS: uagents destination (default "storage_agent")
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Iterable
+
+import httpx
+
+logger = logging.getLogger("storage_transport")
+
+STORAGE_TRANSPORT = os.getenv("STORAGE_TRANSPORT", "auto")
+STORAGE_SUBMIT_URL = os.getenv("STORAGE_SUBMIT_URL", "http://127.0.0.1:8000/submit")
+STORAGE_SUBMIT_BATCH_URL = os.getenv("STORAGE_SUBMIT_BATCH_URL", STORAGE_SUBMIT_URL.rstrip("/") + "/batch")
+STORAGE_HTTP_TIMEOUT = float(os.getenv("STORAGE_HTTP_TIMEOUT", "2"))
+STORAGE_HTTP_MAX_CONNECTIONS = int(os.getenv("STORAGE_HTTP_MAX_CONNECTIONS", "20"))
+STORAGE_AGENT_DESTINATION = os.getenv("STORAGE_AGENT_ADDRESS") or "storage_agent"
+
+DEFAULT_SENDER = "orchestrator_simple"
+
+
+class TransportError(Exception):
+    """Raised when a transport could not deliver a message."""
+
+
+def message_payload(message: Any) -> dict:
+    return {"entry_id": getattr(message, "entry_id", None), "entry": getattr(message, "entry", None)}
+
+
+class StorageTransport:
+    name = "base"
+
+    async def send(self, message: Any) -> Any:
+        raise NotImplementedError
+
+    async def send_many(self, messages: Iterable[Any]) -> list:
+        """Deliver several messages; returns one result (or exception) per message."""
+        return await asyncio.gather(*[self.send(m) for m in messages], return_exceptions=True)
+
+    async def start(self):
+        return None
+
+    async def aclose(self):
+        return None
+
+    def info(self) -> dict:
+        return {"name": self.name}
+
+
+class _Ctx:
+    """Minimal uagents-like context for calling storage handlers in-process."""
+
+    def __init__(self, name: str):
+        self.logger = logging.getLogger(name)
+
+    async def send(self, to, msg):
+        return True
+
+
+class InProcessTransport(StorageTransport):
+    name = "inprocess"
+
+    def __init__(self, module=None, sender: str = DEFAULT_SENDER):
+        if module is None:
+            import storage_agent as module
+        self._handler = module.handle_store_chat
+        # the storage agent's outbox lives in this process and follows our lifecycle
+        self._start_outbox = getattr(module, "start_outbox", None)
+        self._close_outbox = getattr(module, "close_outbox", None)
+        self._ctx = _Ctx(sender)
+        self.sender = sender
+
+    async def send(self, message: Any) -> Any:
+        return await self._handler(self._ctx, self.sender, message)
+
+    async def start(self):
+        if self._start_outbox is not None:
+            await self._start_outbox()
+
+    async def aclose(self):
+        if self._close_outbox is not None:
+            await self._close_outbox()
+
+
+class UAgentsTransport(StorageTransport):
+    name = "uagents"
+
+    def __init__(self, agent=None, module=None, destination: str = STORAGE_AGENT_DESTINATION):
+        if module is None:
+            import uagents as module
+        if agent is None:
+            AgentClass = getattr(module, "Agent", None)
+            agent = AgentClass() if AgentClass is not None else None
+        send_fn = getattr(agent, "send", None)
+        module_send = getattr(module, "send", None)
+        if send_fn is None and module_send is None:
+            raise TransportError("no send API available on Agent or uagents module")
+        self.agent = agent
+        self.destination = destination
+        self._send_fn = send_fn
+        self._module_send = module_send
+
+    async def send(self, message: Any) -> Any:
+        if self._send_fn is not None:
+            return await self._send_fn(self.destination, message)
+        return await self._module_send(self.agent, self.destination, message)
+
+    def info(self) -> dict:
+        return {"name": self.name, "destination": self.destination, "agent": getattr(self.agent, "address", None)}
+
+
+class HttpTransport(StorageTransport):
+    name = "http"
+
+    def __init__(
+        self,
+        submit_url: str = STORAGE_SUBMIT_URL,
+        batch_url: str = STORAGE_SUBMIT_BATCH_URL,
+        sender: str = DEFAULT_SENDER,
+        destination: str = STORAGE_AGENT_DESTINATION,
+        timeout: float = STORAGE_HTTP_TIMEOUT,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.submit_url = submit_url
+        self.batch_url = batch_url
+        self.sender = sender
+        self.destination = destination
+        self._timeout = timeout
+        self._transport = transport
+        self._http: httpx.AsyncClient | None = None
+        self._loop = None
+
+    def _client(self) -> httpx.AsyncClient:
+        # the pooled client is bound to the loop it was created on
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http.is_closed or self._loop is not loop:
+            self._http = httpx.AsyncClient(
+                timeout=self._timeout,
+                limits=httpx.Limits(max_connections=STORAGE_HTTP_MAX_CONNECTIONS, max_keepalive_connections=STORAGE_HTTP_MAX_CONNECTIONS),
+                transport=self._transport,
+            )
+            self._loop = loop
+        return self._http
+
+    async def send(self, message: Any) -> Any:
+        payload = {"destination": self.destination, "message": message_payload(message), "sender": self.sender}
+        resp = await self._client().post(self.submit_url, json=payload)
+        if resp.status_code not in (200, 202):
+            raise TransportError(f"storage submit returned HTTP {resp.status_code}")
+        # /submit answers 202 even when the write failed; the body says so
+        try:
+            body = resp.json()
+        except ValueError:
+            body = None
+        if isinstance(body, dict) and body.get("ok") is False:
+            raise TransportError(f"storage rejected entry_id={payload['message']['entry_id']}: {body.get('error')}")
+        return True
+
+    async def send_many(self, messages: Iterable[Any]) -> list:
+        messages = list(messages)
+        if not messages:
+            return []
+        payload = {"destination": self.destination, "messages": [message_payload(m) for m in messages], "sender": self.sender}
+        resp = await self._client().post(self.batch_url, json=payload)
+        if resp.status_code not in (200, 202):
+            err = TransportError(f"storage batch submit returned HTTP {resp.status_code}")
+            return [err] * len(messages)
+        try:
+            results = resp.json().get("results")
+        except Exception:
+            results = None
+        if isinstance(results, list) and len(results) == len(messages):
+            return results
+        return [True] * len(messages)
+
+    async def aclose(self):
+        if self._http is not None and not self._http.is_closed and self._loop is asyncio.get_running_loop():
+            await self._http.aclose()
+        self._http = None
+
+    def info(self) -> dict:
+        return {"name": self.name, "submit_url": self.submit_url, "batch_url": self.batch_url}
+
+
+def create_transport(kind: str = STORAGE_TRANSPORT, agent=None) -> StorageTransport:
+    """Build the transport named by `kind` ("auto" probes in fallback order)."""
+    kind = (kind or "auto").lower()
+    if kind == "inprocess":
+        return InProcessTransport()
+    if kind == "uagents":
+        return UAgentsTransport(agent=agent)
+    if kind == "http":
+        return HttpTransport()
+    if kind != "auto":
+        raise ValueError(f"unknown storage transport {kind!r}")
+    try:
+        return UAgentsTransport(agent=agent)
+    except Exception as e:
+        logger.info("uagents transport unavailable (%s); trying in-process", e)
+    try:
+        return InProcessTransport()
+    except Exception as e:
+        logger.info("in-process transport unavailable (%s); using HTTP", e)
+    return HttpTransport()
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+import merkle
+from anchoring import AnchorError, AnchorService
+
+
+def _write(path, n):
+    hashes = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(n)]
+    path.write_text(json.dumps(hashes))
+    return hashes
+
+
+def test_anchor_file_returns_structured_result(tmp_path, monkeypatch):
+    monkeypatch.delenv("ICP_REPLICA_URL", raising=False)
+    monkeypatch.delenv("ICP_NETWORK_URL", raising=False)
+    hashes = _write(tmp_path / "hashes.json", 5)
+    res = AnchorService().anchor(path=str(tmp_path / "hashes.json"), batch_id="b1")
+    assert res["ok"] is True and res["root"] == merkle.root(hashes)
+    assert res["leaf_count"] == 5 and res["batch_id"] == "b1"
+    assert res["canister"] == {"called": False, "ok": True, "reason": "ICP not configured"}
+    assert set(res["timings"]) == {"load_ms", "merkle_ms", "canister_ms", "total_ms"}
+    json.dumps(res)
+
+
+def test_unchanged_file_is_not_reparsed(tmp_path):
+    path = tmp_path / "hashes.json"
+    _write(path, 4)
+    svc = AnchorService()
+    first = svc.anchor(path=str(path), publish=False)
+    again = svc.anchor(path=str(path), publish=False)
+    assert not first["cached"] and again["cached"] and again["root"] == first["root"]
+    assert first["batch_id"].startswith("batch-") and first["batch_id"].endswith(first["root"][:8])
+
+    hashes = _write(path, 6)
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    changed = svc.anchor(path=str(path), publish=False)
+    assert not changed["cached"] and changed["root"] == merkle.root(hashes) and changed["leaf_count"] == 6
+    assert svc.stats()["cache_hits"] == 1
+
+
+def test_empty_missing_and_invalid_inputs(tmp_path):
+    svc = AnchorService()
+    empty = svc.anchor(hashes=[])
+    assert empty["root"] is None and empty["batch_id"] is None and empty["leaf_count"] == 0
+    with pytest.raises(FileNotFoundError):
+        svc.anchor(path=str(tmp_path / "missing.json"))
+    with pytest.raises(AnchorError):
+        svc.anchor(hashes=["abc"])
+    (tmp_path / "bad.json").write_text("{not json")
+    with pytest.raises(AnchorError):
+        svc.anchor(path=str(tmp_path / "bad.json"))
+
+
+@pytest.mark.asyncio
+async def test_anchor_async_runs_off_the_event_loop(tmp_path):
+    import threading
+
+    hashes = _write(tmp_path / "hashes.json", 3)
+    svc = AnchorService()
+    seen = []
+    original = svc._root_for_file
+
+    def spy(path):
+        seen.append(threading.current_thread().name)
+        return original(path)
+
+    svc._root_for_file = spy
+    res = await svc.anchor_async(path=str(tmp_path / "hashes.json"), publish=False)
+    assert res["root"] == merkle.root(hashes)
+    assert seen and seen[0].startswith("anchor")
+
+
+@pytest.mark.asyncio
+async def test_published_batch_tags_mirrored_entries(tmp_path, monkeypatch, ctx):
+    import anchoring
+    import storage_agent as sa
+    from entry_store import EntryStore
+
+    monkeypatch.setenv("ICP_NETWORK_URL", "")
+    store = EntryStore(str(tmp_path / "entries.db"))
+    monkeypatch.setattr(sa, "get_entry_store", lambda: store)
+    monkeypatch.setattr(anchoring, "get_entry_store", lambda: store)
+
+    stored = [await sa.handle_store_chat(ctx, "test", sa.StoreChat(entry_id=f"an{i}", entry=f"anchored entry {i}")) for i in range(3)]
+    svc = AnchorService()
+    monkeypatch.setattr(svc, "_publish", lambda root, batch_id: {"called": True, "ok": True, "result": None})
+    res = await svc.anchor_async(hashes=[r["content_hash"] for r in stored[:2]], batch_id="b-e2e")
+    assert res["tagged"] == 2
+    batches = {item["entry_id"]: item["anchor_batch"] for item in store.query()["items"]}
+    assert batches == {"an0": "b-e2e", "an1": "b-e2e", "an2": None}
+
+    # a failed canister call leaves the entries untagged
+    monkeypatch.setattr(svc, "_publish", lambda root, batch_id: {"called": True, "ok": False, "error": "down"})
+    failed = svc.anchor(hashes=[stored[2]["content_hash"]], batch_id="b-down")
+    assert failed["tagged"] == 0 and store.query(q="entry 2")["items"][0]["anchor_batch"] is None
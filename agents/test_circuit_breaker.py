@@ -0,0 +1,65 @@
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _breaker(clock, **kw):
+    opts = dict(failure_rate=0.5, min_calls=4, window=4, open_seconds=10, slow_call_seconds=1.0, slow_call_rate=0.75)
+    opts.update(kw)
+    return CircuitBreaker("test", clock=clock, **opts)
+
+
+def test_opens_on_failure_rate_and_fails_fast():
+    clock = Clock()
+    b = _breaker(clock)
+    for ok in (True, False, True, False):
+        assert b.allow()
+        b.record(ok)
+    assert b.state == OPEN
+    assert not b.allow()
+    assert b.rejected == 1
+    assert b.retry_after() == 10
+
+
+def test_half_open_admits_single_probe_and_closes_on_success():
+    clock = Clock()
+    b = _breaker(clock)
+    for _ in range(4):
+        b.allow()
+        b.record(False)
+    clock.now = 10
+    assert b.allow()  # the probe
+    assert b.state == HALF_OPEN
+    assert not b.allow()  # everyone else still fails fast
+    b.record(True, 0.1)
+    assert b.state == CLOSED
+    assert [t["to"] for t in b.stats()["transitions"]] == [OPEN, HALF_OPEN, CLOSED]
+
+
+def test_failed_probe_reopens():
+    clock = Clock()
+    b = _breaker(clock)
+    for _ in range(4):
+        b.allow()
+        b.record(False)
+    clock.now = 10
+    assert b.allow()
+    b.record(False)
+    assert b.state == OPEN
+    assert not b.allow()
+
+
+def test_opens_on_slow_calls():
+    clock = Clock()
+    b = _breaker(clock)
+    for _ in range(4):
+        b.allow()
+        b.record(True, elapsed=5.0)
+    assert b.state == OPEN
+    assert "slow" in b.stats()["transitions"][-1]["reason"]
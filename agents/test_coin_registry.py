@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from coin_registry import CoinRegistry, load_registry
+
+COINS = [
+    {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+    {"id": "ethereum", "symbol": "eth", "name": "Ethereum"},
+    {"id": "bitcoin-cash", "symbol": "bch", "name": "Bitcoin Cash"},
+    {"id": "fake-btc", "symbol": "btc", "name": "Fake BTC"},
+]
+
+
+def test_exact_lookup_by_id_ticker_and_name():
+    reg = CoinRegistry(COINS)
+    assert reg.resolve("BTC") == "bitcoin"
+    assert reg.resolve("bitcoin cash") == "bitcoin-cash"
+    assert reg.resolve("ethereum") == "ethereum"
+    assert reg.resolve("fake-btc") == "fake-btc"
+
+
+def test_fuzzy_fallback_is_bounded():
+    reg = CoinRegistry(COINS)
+    assert reg.resolve("etherium") == "ethereum"
+    assert reg.resolve("bitcon") == "bitcoin"
+    assert reg.resolve("btx") is None
+    assert reg.resolve("dogecoin") is None
+
+
+def test_short_or_ambiguous_typos_are_suggested_not_resolved():
+    reg = CoinRegistry(COINS + [{"id": "terra-luna", "symbol": "luna", "name": "Terra"}, {"id": "lina", "symbol": "lina", "name": "Linear"}])
+    # one edit from two coins, and too short to auto-correct anyway
+    assert reg.resolve("lena") is None
+    assert [c["id"] for c in reg.suggest("lena")] == ["terra-luna", "lina"]
+    # a short word one edit from a single ticker is still not priced as it
+    assert reg.resolve("lunar") is None
+    assert [c["id"] for c in reg.suggest("lunar")] == ["terra-luna"]
+    assert reg.suggest("dogecoin") == []
+
+
+def test_complete_returns_ranked_prefix_matches():
+    reg = CoinRegistry(COINS)
+    assert [c["id"] for c in reg.complete("bitc")] == ["bitcoin", "bitcoin-cash"]
+
+
+def test_load_registry_reuses_pickled_index(tmp_path):
+    snap = tmp_path / "coins.json"
+    snap.write_text(json.dumps(COINS))
+    first = load_registry(snap)
+    assert (tmp_path / "coins.json.idx.pickle").exists()
+    second = load_registry(snap)
+    assert second.resolve("eth") == first.resolve("eth") == "ethereum"
+
+
+@pytest.mark.asyncio
+async def test_unknown_symbol_skips_network(monkeypatch):
+    import price_agent as pa
+
+    def boom():
+        raise AssertionError("network client must not be used")
+
+    monkeypatch.setattr(pa, "get_client", boom)
+    assert await pa.get_price_async("definitely-not-a-coin") == "unknown"
@@ -0,0 +1,46 @@
+from dedup import BloomFilter, DedupIndex
+
+
+def test_exact_window_returns_original_result_by_id_or_content():
+    d = DedupIndex(lru_size=8, bloom_capacity=100)
+    original = {"ok": True, "entry_id": "e1"}
+    assert d.lookup("e1", "h1") is None
+    d.remember("e1", "h1", original)
+
+    assert d.lookup("e1", "other") is original  # client retry, same entry_id
+    assert d.lookup("e2", "h1") is original  # identical content
+    assert d.stats()["exact_hits"] == 2
+    assert d.stats()["hit_rate"] == 2 / 3
+
+
+def test_evicted_keys_are_still_caught_by_bloom():
+    d = DedupIndex(lru_size=2, bloom_capacity=100)
+    for i in range(5):
+        d.remember(f"e{i}", None, {"ok": True, "entry_id": f"e{i}"})
+    hit = d.lookup("e0", None)
+    assert hit["duplicate"] is True and hit["probable"] is True
+    assert d.stats()["bloom_hits"] == 1
+    assert d.stats()["lru_size"] == 2
+
+
+def test_bloom_generations_bound_memory():
+    d = DedupIndex(lru_size=1, bloom_capacity=10, generations=2)
+    for i in range(50):
+        d.remember(f"e{i}", None, {"ok": True})
+    assert d.stats()["bloom_generations"] == 2
+    assert d.lookup("e0", None) is None  # aged out of every generation
+
+
+def test_bloom_false_positive_rate_is_bounded():
+    b = BloomFilter(capacity=5000, error_rate=0.01)
+    for i in range(5000):
+        b.add(f"in-{i}")
+    assert all(f"in-{i}" in b for i in range(5000))
+    false_positives = sum(f"out-{i}" in b for i in range(5000))
+    assert false_positives < 5000 * 0.03
+
+
+def test_content_dedup_can_be_disabled():
+    d = DedupIndex(by_content=False)
+    d.remember("e1", "h1", {"ok": True})
+    assert d.lookup("e2", "h1") is None
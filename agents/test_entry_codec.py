@@ -0,0 +1,54 @@
+import hashlib
+import json
+
+import pytest
+
+from entry_codec import FLAG_ZLIB, CodecError, decode_record, encode_record, is_record
+
+HASH = hashlib.sha256(b"hello").hexdigest()
+# DER-encoded ECDSA P-256 signatures are 70-72 bytes
+SIG = "30450221" + "ab" * 33 + "0220" + "cd" * 32
+
+
+def test_round_trip_with_metadata_is_smaller_than_json():
+    rec = encode_record("hello", HASH, SIG, compression="none")
+    assert is_record(rec)
+    assert decode_record(rec) == {"version": 1, "entry": "hello", "content_hash": HASH, "signature": SIG, "merkle_root": None, "proof": None}
+    legacy = json.dumps({"entry": "hello", "content_hash": HASH, "signature": SIG})
+    assert len(rec) < len(legacy) / 2
+
+
+def test_round_trip_with_merkle_proof():
+    proof = [{"position": "left", "hash": "11" * 32}, {"position": "right", "hash": "22" * 32}]
+    rec = encode_record("hello", HASH, SIG, merkle_root="33" * 32, proof=proof)
+    out = decode_record(rec)
+    assert out["merkle_root"] == "33" * 32 and out["proof"] == proof
+    with pytest.raises(CodecError):
+        decode_record(rec[:40] + rec[-10:])
+
+
+def test_long_entries_are_compressed_above_threshold():
+    text = "Q: harga bitcoin hari ini? A: " + "BTC naik ke 1.000.000.000 IDR. " * 40
+    small = encode_record(text, HASH, None, compression="zlib", compress_threshold=10**6)
+    packed = encode_record(text, HASH, None, compression="zlib", compress_threshold=256)
+    assert packed[2] & FLAG_ZLIB and not small[2] & FLAG_ZLIB
+    assert len(packed) < len(small) / 4
+    assert decode_record(packed)["entry"] == text
+
+
+def test_incompressible_entry_is_kept_plain():
+    rec = encode_record("ab", None, None, compression="zlib", compress_threshold=0)
+    assert not rec[2] & FLAG_ZLIB
+    assert decode_record(rec) == {"version": 1, "entry": "ab", "content_hash": None, "signature": None, "merkle_root": None, "proof": None}
+
+
+def test_rejects_truncated_foreign_and_future_records():
+    rec = encode_record("hello", HASH, SIG)
+    with pytest.raises(CodecError):
+        decode_record(rec[:-1])
+    with pytest.raises(CodecError):
+        decode_record(b'{"entry": "hello"}')
+    with pytest.raises(CodecError):
+        decode_record(rec[:1] + b"\x02" + rec[2:])
+    with pytest.raises(CodecError):
+        encode_record("x", "abcd")
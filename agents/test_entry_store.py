@@ -0,0 +1,53 @@
+from entry_store import EntryStore, fts_query
+
+
+def _store(tmp_path, n=0):
+    store = EntryStore(str(tmp_path / "entries.db"))
+    if n:
+        store.add_many([{"entry_id": f"e{i}", "ts": 1000 + i, "text": f"Q: harga bitcoin {i} A: ok", "content_hash": f"h{i}"} for i in range(n)])
+    return store
+
+
+def test_cursor_pagination_walks_newest_first_without_gaps(tmp_path):
+    store = _store(tmp_path, 25)
+    seen, cursor = [], None
+    while True:
+        page = store.query(limit=10, cursor=cursor)
+        seen += [item["entry_id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"e{i}" for i in range(24, -1, -1)]
+
+
+def test_full_text_search_and_time_bounds(tmp_path):
+    store = _store(tmp_path, 5)
+    store.add("n1", "Q: berita ethereum A: ada kabar baru", ts=2000)
+    assert [i["entry_id"] for i in store.query(q="ethereum")["items"]] == ["n1"]
+    assert [i["entry_id"] for i in store.query(q="ETH")["items"]] == ["n1"]  # prefix match
+    assert len(store.query(q="harga bitcoin")["items"]) == 5
+    assert [i["entry_id"] for i in store.query(since=1003, until=1005)["items"]] == ["e4", "e3"]
+    assert store.query(q='"; DROP TABLE entries; --')["items"] == []
+
+
+def test_upsert_keeps_one_row_and_updates_status(tmp_path):
+    store = _store(tmp_path)
+    store.add("e1", "hello", content_hash="h", status="queued")
+    store.add("e1", "hello", content_hash="h", status="stored")
+    store.set_anchor_batch(["h"], "batch-7")
+    (item,) = store.query()["items"]
+    assert item["status"] == "stored" and item["anchor_batch"] == "batch-7"
+    assert store.count() == 1
+
+
+def test_fts_query_quotes_every_word():
+    assert fts_query('btc "eth') == '"btc" """eth"*'
+    assert fts_query("   ") == ""
+
+
+def test_find_by_entry_id_then_content_hash(tmp_path):
+    store = _store(tmp_path, 3)
+    assert store.find("e1")["content_hash"] == "h1"
+    assert store.find(None, "h2")["entry_id"] == "e2"
+    assert store.find("missing", "h0")["entry_id"] == "e0"
+    assert store.find("missing") is None
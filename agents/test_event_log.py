@@ -0,0 +1,71 @@
+import json
+
+from event_log import AccessLogMiddleware, EventLog
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_emit_buffers_until_flush_then_writes_json_lines(tmp_path):
+    path = tmp_path / "events.log"
+    log = EventLog(str(path), flush_interval=60)
+    log.emit("audit", "token_rotated", client="1.2.3.4", old_present=True)
+    log.emit("storage", "stored", entry_id="e1", attempts=1)
+    assert log.stats()["buffered"] == 2
+
+    assert log.flush() == 2
+    records = _lines(path)
+    assert [(r["kind"], r["event"]) for r in records] == [("audit", "token_rotated"), ("storage", "stored")]
+    assert records[0]["client"] == "1.2.3.4" and records[0]["ts"].endswith("Z")
+    log.close()
+
+
+def test_ring_buffer_drops_oldest_when_full(tmp_path):
+    path = tmp_path / "events.log"
+    log = EventLog(str(path), capacity=3, flush_interval=60)
+    for i in range(5):
+        log.emit("access", "request", n=i)
+    log.close()
+    assert [r["n"] for r in _lines(path)] == [2, 3, 4]
+    assert log.dropped == 2
+
+
+def test_rotation_keeps_backups(tmp_path):
+    path = tmp_path / "events.log"
+    log = EventLog(str(path), max_bytes=200, backups=2, flush_interval=60)
+    for i in range(6):
+        log.emit("access", "request", n=i, pad="x" * 80)
+        log.flush()
+    log.close()
+    assert log.rotations >= 2
+    assert (tmp_path / "events.log.1").exists() and (tmp_path / "events.log.2").exists()
+    assert not (tmp_path / "events.log.3").exists()
+
+
+def test_close_flushes_records_from_writer_thread(tmp_path):
+    path = tmp_path / "events.log"
+    log = EventLog(str(path), flush_interval=60)
+    log.emit("audit", "schedule_started", symbol="btc")
+    assert log._thread is not None
+    log.close()
+    assert _lines(path)[0]["event"] == "schedule_started"
+
+
+def test_access_middleware_records_status(tmp_path):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    path = tmp_path / "access.log"
+    log = EventLog(str(path), flush_interval=60)
+    app = FastAPI()
+    app.add_middleware(AccessLogMiddleware, log=log)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    TestClient(app).get("/ping")
+    log.close()
+    (record,) = _lines(path)
+    assert record["kind"] == "access" and record["path"] == "/ping" and record["status"] == 200
@@ -0,0 +1,63 @@
+import asyncio
+import time
+import types
+
+import pytest
+
+from fanout import ERROR, OK, TIMEOUT, fan_out
+
+
+@pytest.mark.asyncio
+async def test_fan_out_runs_concurrently_and_marks_failures():
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def fast(v):
+        await asyncio.sleep(0.05)
+        return v
+
+    async def boom():
+        raise RuntimeError("down")
+
+    start = time.perf_counter()
+    outcomes = await fan_out([
+        ("a", lambda: fast(1), 0.5),
+        ("b", slow, 0.1),
+        ("c", lambda: fast(2), 0.5),
+        ("d", boom, 0.5),
+    ])
+    elapsed = time.perf_counter() - start
+    assert [o.status for o in outcomes] == [OK, TIMEOUT, OK, ERROR]
+    assert [o.value for o in outcomes if o.ok] == [1, 2]
+    assert elapsed < 0.3
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_agent_answers_all_intents_within_deadline(monkeypatch):
+    import orchestrator_agent as oa
+
+    class Ctx:
+        logger = types.SimpleNamespace(info=lambda *a, **k: None)
+
+        async def query(self, destination, message, timeout):
+            if destination == "price-addr":
+                if message.coin_id == "ethereum":
+                    await asyncio.sleep(5)
+                return oa.PriceResponse(price=1.0, currency="usd", success=True)
+            return oa.NewsResponse(articles=[{"title": "t"}], success=True)
+
+        async def send(self, *a):
+            return True
+
+    monkeypatch.setattr(oa, "PRICE_AGENT_ADDRESS", "price-addr")
+    monkeypatch.setattr(oa, "NEWS_AGENT_ADDRESS", "news-addr")
+    monkeypatch.setattr(oa, "STORAGE_AGENT_ADDRESS", None)
+    monkeypatch.setattr(oa, "PRICE_QUERY_TIMEOUT", 0.1)
+    monkeypatch.setattr(oa, "HttpyResponse", lambda status_code, json: json)
+
+    request = types.SimpleNamespace(json={"text": "harga btc dan eth, berita sol"})
+    out = await oa.handle_query(request, Ctx())
+    lines = out["response"].splitlines()
+    assert lines[0].startswith("Harga Bitcoin")
+    assert "waktu habis" in lines[1]
+    assert "berita teratas tentang SOL" in lines[2]
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+import pytest
+
+from icp_connection import ICPConnectionError, ICPConnectionManager
+
+
+class FakeAgent:
+    def __init__(self):
+        self.calls = []
+
+    def update_raw(self, canister_id, method_name, arg, **kwargs):
+        self.calls.append((canister_id, method_name, arg, threading.current_thread().name))
+        return "ok"
+
+
+def _factory(builds):
+    def build(url, identity_path):
+        builds.append((url, identity_path))
+        return object(), object(), FakeAgent()
+    return build
+
+
+@pytest.mark.asyncio
+async def test_connection_is_built_once_per_url_and_identity():
+    builds = []
+    m = ICPConnectionManager(max_workers=2, factory=_factory(builds))
+    for _ in range(5):
+        assert await m.update("http://replica", None, "aaaaa-aa", "add_chat_entry", b"x") == "ok"
+    assert builds == [("http://replica", None)]
+
+    # a config change (other identity) gets its own connection
+    await m.update("http://replica", "/keys/id.pem", "aaaaa-aa", "add_chat_entry", b"x")
+    assert len(builds) == 2
+    assert m.stats()["connections"] == 2
+
+    m.invalidate()
+    await m.update("http://replica", None, "aaaaa-aa", "add_chat_entry", b"x")
+    assert len(builds) == 3
+    m.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_blocking_calls_run_on_bounded_pool():
+    m = ICPConnectionManager(max_workers=2, factory=_factory([]))
+    await asyncio.gather(*[m.update("http://replica", None, "c", "m", b"") for _ in range(6)])
+    agent = m.connection("http://replica").agent
+    threads = {name for *_, name in agent.calls}
+    assert all(name.startswith("icp") for name in threads)
+    assert len(threads) <= 2
+    m.shutdown()
+
+
+def test_build_failure_is_reported_and_not_cached():
+    def broken(url, identity_path):
+        raise FileNotFoundError(identity_path)
+
+    m = ICPConnectionManager(factory=broken)
+    with pytest.raises(ICPConnectionError):
+        m.connection("http://replica", "/missing.pem")
+    assert m.stats()["connections"] == 0
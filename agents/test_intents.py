@@ -0,0 +1,29 @@
+from intents import INTENT_KEYWORDS, IntentEngine, get_engine
+
+
+def test_parse_extracts_all_intents_and_coins():
+    parsed = get_engine().parse("Harga BTC dan ethereum, juga beritanya?")
+    assert parsed.intents == ["price", "news"]
+    assert parsed.coin_ids == ["bitcoin", "ethereum"]
+
+
+def test_entities_are_scoped_to_their_intent_clause():
+    parsed = get_engine().parse("harga btc dan berita eth")
+    assert [m.value for m in parsed.entities_for("price")] == ["bitcoin"]
+    assert [m.value for m in parsed.entities_for("news")] == ["ethereum"]
+    assert [m.value for m in get_engine().parse("btc price").entities_for("price")] == ["bitcoin"]
+
+
+def test_aliases_match_whole_words_and_prefer_longest():
+    engine = IntentEngine(INTENT_KEYWORDS, {"eth": "ethereum", "bitcoin": "bitcoin", "bitcoin cash": "bitcoin-cash"})
+    assert engine.parse("price of bitcoin cash").coin_ids == ["bitcoin-cash"]
+    assert engine.parse("price of methane").coin_ids == []
+    assert engine.parse("apa kabar").intents == []  # a greeting, not a news request
+    assert engine.parse("kabar terbaru eth").intents == ["news"]
+    assert engine.parse("halo").intents == []
+
+
+def test_large_alias_table():
+    aliases = {f"coin{i}": f"id-{i}" for i in range(5000)}
+    engine = IntentEngine(INTENT_KEYWORDS, aliases)
+    assert engine.parse("harga coin4999 dan coin12").coin_ids == ["id-4999", "id-12"]
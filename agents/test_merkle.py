@@ -0,0 +1,30 @@
+import hashlib
+import sys
+from pathlib import Path
+
+import pytest
+
+import merkle
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "icp_canister"))
+from anchor_job import merkle_root_from_hex  # noqa: E402
+
+
+def _hashes(n):
+    return [hashlib.sha256(str(i).encode()).hexdigest() for i in range(n)]
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 5, 8, 13])
+def test_every_proof_leads_to_the_anchor_job_root(n):
+    hashes = _hashes(n)
+    root, proofs = merkle.build(hashes)
+    assert root == merkle_root_from_hex(hashes)
+    assert all(merkle.verify_proof(h, p, root) for h, p in zip(hashes, proofs))
+
+
+def test_proof_does_not_verify_another_leaf_or_root():
+    hashes = _hashes(4)
+    root, proofs = merkle.build(hashes)
+    assert not merkle.verify_proof(hashes[1], proofs[0], root)
+    assert not merkle.verify_proof(hashes[0], proofs[0], "00" * 32)
+    assert not merkle.verify_proof(hashes[0], [{"position": "left"}], root)
@@ -1,4 +1,5 @@
 import asyncio
+import time
 from unittest.mock import AsyncMock, patch
 
 from fastapi.testclient import TestClient
@@ -42,3 +43,216 @@ def test_health_endpoint_exposes_status(monkeypatch):
     assert resp.status_code == 200
     data = resp.json()
     assert data.get("status") == "ok"
+
+
+def test_query_stream_emits_partial_events_then_done(monkeypatch):
+    import orchestrator_simple as orch
+
+    async def fake_price(symbol, *args, **kwargs):
+        return "$1.00"
+
+    async def fake_news(topic):
+        return f"news about {topic}"
+
+    submitted = []
+
+    async def fake_submit(msg):
+        submitted.append(msg)
+
+    monkeypatch.setattr(orch, "get_price_async", fake_price)
+    monkeypatch.setattr(orch, "get_news_reply", fake_news)
+    orch.reply_cache.clear()
+    monkeypatch.setattr(orch.storage_queue, "submit", fake_submit)
+
+    client = TestClient(orch.app)
+    resp = client.post("/query/stream", json={"text": "harga btc dan berita eth"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = [line.split(": ", 1)[1] for line in resp.text.splitlines() if line.startswith("event: ")]
+    assert sorted(events[:2]) == ["news", "price"]
+    assert events[-1] == "done"
+    assert len(submitted) == 1
+    assert submitted[0].entry_id in resp.text
+    assert "news about ETH" in resp.text
+
+
+def test_equivalent_queries_share_cached_reply_but_get_own_entry_ids(monkeypatch):
+    import orchestrator_simple as orch
+
+    calls = []
+
+    async def fake_price(symbol, *args, **kwargs):
+        calls.append(symbol)
+        return "$2.00"
+
+    async def fake_submit(msg):
+        return None
+
+    monkeypatch.setattr(orch, "get_price_async", fake_price)
+    monkeypatch.setattr(orch.storage_queue, "submit", fake_submit)
+    orch.reply_cache.clear()
+
+    client = TestClient(orch.app)
+    replies = [client.post("/query", json={"text": t}).json() for t in ("berapa harga bitcoin", "Harga Bitcoin?", "price btc")]
+    assert calls == ["bitcoin"]
+    assert len({r["reply"] for r in replies}) == 1
+    assert len({r["entry_id"] for r in replies}) == 3
+
+
+def test_query_batch_dedupes_and_submits_once(monkeypatch):
+    import orchestrator_simple as orch
+
+    priced, submitted = [], []
+
+    async def fake_get_prices(coin_ids, currencies):
+        priced.append(list(coin_ids))
+        return []
+
+    async def fake_price(symbol, *args, **kwargs):
+        return "$3.00"
+
+    async def fake_submit(item):
+        submitted.append(item)
+
+    monkeypatch.setattr(orch, "get_prices", fake_get_prices)
+    monkeypatch.setattr(orch, "get_price_async", fake_price)
+    monkeypatch.setattr(orch.storage_queue, "submit", fake_submit)
+    orch.reply_cache.clear()
+
+    texts = ["harga btc", "Harga Bitcoin?", "price eth", "halo"]
+    client = TestClient(orch.app)
+    data = client.post("/query/batch", json={"texts": texts}).json()
+    assert data["distinct"] == 3
+    assert priced == [["bitcoin", "ethereum"]]
+    assert [r["reply"] for r in data["results"]][:2] == ["Harga BTC saat ini adalah $3.00"] * 2
+    assert data["results"][3]["reply"] == orch.FALLBACK_REPLY
+    assert len(submitted) == 1 and len(submitted[0]) == 4
+    assert [m.entry_id for m in submitted[0]] == [r["entry_id"] for r in data["results"]]
+
+    # large batches are queued in chunks, keeping the input order
+    submitted.clear()
+    monkeypatch.setattr(orch, "QUERY_BATCH_STORE_CHUNK", 3)
+    data = client.post("/query/batch", json={"texts": texts * 2}).json()
+    assert [len(chunk) for chunk in submitted] == [3, 3, 2]
+    assert [m.entry_id for chunk in submitted for m in chunk] == [r["entry_id"] for r in data["results"]]
+
+
+def test_scheduled_job_queues_entry_for_the_storage_transport(monkeypatch):
+    import orchestrator_simple as orch
+
+    submitted = []
+
+    async def fake_price(symbol, *args, **kwargs):
+        return "$3.00"
+
+    async def fake_submit(item):
+        submitted.append(item)
+
+    monkeypatch.setattr(orch, "get_price_async", fake_price)
+    monkeypatch.setattr(orch.storage_queue, "submit", fake_submit)
+
+    asyncio.run(orch._scheduled_fetch_and_store("bitcoin"))
+    assert [m.entry for m in submitted] == ["Scheduled price bitcoin: $3.00"]
+
+
+def test_repeated_scheduled_price_is_stored_once(monkeypatch, tmp_path):
+    import orchestrator_simple as orch
+    import storage_agent as sa
+    from entry_store import EntryStore
+    from storage_transport import InProcessTransport
+
+    async def fake_price(symbol, *args, **kwargs):
+        return "$3.00"
+
+    monkeypatch.setenv("ICP_NETWORK_URL", "")
+    store = EntryStore(str(tmp_path / "entries.db"))
+    monkeypatch.setattr(sa, "get_entry_store", lambda: store)
+    monkeypatch.setattr(orch, "get_price_async", fake_price)
+    monkeypatch.setattr(orch, "storage_transport", InProcessTransport(sa))
+
+    async def run_twice():
+        await orch._scheduled_fetch_and_store("bitcoin")
+        await orch._scheduled_fetch_and_store("bitcoin")
+        await orch.storage_queue.drain()
+
+    asyncio.run(run_twice())
+    assert [i["text"] for i in store.query()["items"]] == ["Scheduled price bitcoin: $3.00"]
+    assert sa.health()["dedup"]["exact_hits"] == 1
+
+
+def test_lifespan_replays_and_closes_the_in_process_outbox(monkeypatch, tmp_path):
+    import orchestrator_simple as orch
+    import storage_agent as sa
+    from outbox import Outbox
+    from storage_transport import InProcessTransport
+
+    async def down(records):
+        raise ConnectionError("replica down")
+
+    async def leave_backlog():
+        ob = Outbox(down, directory=str(tmp_path), retry_base=60)
+        await ob.append("crashed", "payload")
+        await ob.close()
+
+    asyncio.run(leave_backlog())
+
+    shipped = []
+
+    async def ship(records):
+        shipped.extend(r.entry_id for r in records)
+        return [{"ok": True} for _ in records]
+
+    monkeypatch.setenv("ICP_NETWORK_URL", "http://replica.local")
+    monkeypatch.setattr(sa, "STORAGE_OUTBOX", True)
+    outbox = Outbox(ship, directory=str(tmp_path)).open()
+    monkeypatch.setattr(sa, "_outbox", outbox)
+    monkeypatch.setattr(orch, "storage_transport", InProcessTransport(sa))
+
+    with TestClient(orch.app):
+        # the backlog ships at startup, before any new write arrives
+        for _ in range(200):
+            if outbox.acked_seq == 1:
+                break
+            time.sleep(0.01)
+        assert shipped == ["crashed"]
+    assert outbox._file is None and outbox._shipper is None
+
+
+def test_schedule_rotate_applies_new_token_immediately(monkeypatch, tmp_path):
+    import orchestrator_simple as orch
+    import runtime_config
+
+    token_file = tmp_path / "token"
+    token_file.write_text("old-token")
+    monkeypatch.setenv("SCHEDULE_TOKEN_FILE", str(token_file))
+    monkeypatch.setenv("SCHEDULE_TOKEN_AUDIT", str(tmp_path / "audit.log"))
+    runtime_config.reload()
+
+    client = TestClient(orch.app)
+    assert client.get("/schedule/status").status_code == 401
+    resp = client.post("/schedule/rotate", json={"new_token": "new-token"}, headers={"X-Scheduler-Token": "old-token"})
+    assert resp.status_code == 200
+
+    # no watcher running: the rotate endpoint itself refreshed the snapshot
+    assert client.post("/admin/config/reload", headers={"X-Scheduler-Token": "old-token"}).status_code == 401
+    resp = client.post("/admin/config/reload", headers={"Authorization": "Bearer new-token"})
+    assert resp.status_code == 200
+    assert resp.json()["config"]["schedule_token_set"] is True
+
+
+def test_history_endpoint_returns_mirrored_entries(monkeypatch, tmp_path):
+    import orchestrator_simple as orch
+    from entry_store import EntryStore
+
+    store = EntryStore(str(tmp_path / "entries.db"))
+    store.add_many([{"entry_id": f"e{i}", "ts": 1000 + i, "text": f"Q: harga btc {i}"} for i in range(3)])
+    store.add("n1", "Q: berita eth", ts=2000)
+    monkeypatch.setattr(orch, "get_entry_store", lambda: store)
+
+    client = TestClient(orch.app)
+    page = client.get("/history", params={"limit": 2}).json()
+    assert [i["entry_id"] for i in page["items"]] == ["n1", "e2"]
+    page2 = client.get("/history", params={"limit": 2, "cursor": page["next_cursor"]}).json()
+    assert [i["entry_id"] for i in page2["items"]] == ["e1", "e0"] and page2["next_cursor"] is None
+    assert [i["entry_id"] for i in client.get("/history", params={"q": "berita"}).json()["items"]] == ["n1"]
+    assert client.get("/history", params={"cursor": "abc"}).status_code == 400
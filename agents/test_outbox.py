@@ -0,0 +1,143 @@
+import asyncio
+import os
+
+import pytest
+
+from outbox import Outbox, read_segment
+
+
+def _ok(calls):
+    async def ship(records):
+        calls.append([r.entry_id for r in records])
+        return [{"ok": True} for _ in records]
+    return ship
+
+
+async def _until(pred, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not pred():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.005)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_appends_share_fsyncs_and_ship_in_order(tmp_path):
+    calls = []
+    ob = Outbox(_ok(calls), directory=str(tmp_path), ship_batch=100)
+    seqs = await asyncio.gather(*[ob.append(f"e{i}", f"p{i}") for i in range(20)])
+    assert seqs == list(range(1, 21))
+    assert ob.commits < 20  # group commit
+    await _until(lambda: ob.acked_seq == 20)
+    assert [e for batch in calls for e in batch] == [f"e{i}" for i in range(20)]
+    await ob.close()
+
+
+@pytest.mark.asyncio
+async def test_unacked_records_are_replayed_after_restart(tmp_path):
+    async def down(records):
+        raise ConnectionError("replica down")
+
+    ob = Outbox(down, directory=str(tmp_path), retry_base=60)
+    for i in range(3):
+        await ob.append(f"e{i}", "payload", content_hash="h", signature="s")
+    await ob.close()
+
+    calls = []
+    ob2 = Outbox(_ok(calls), directory=str(tmp_path))
+    await ob2.start()
+    await _until(lambda: ob2.acked_seq == 3)
+    assert calls == [["e0", "e1", "e2"]]
+    # new appends continue the sequence
+    assert await ob2.append("e3", "payload") == 4
+    await ob2.close()
+
+
+@pytest.mark.asyncio
+async def test_ship_retries_same_batch_until_canister_recovers(tmp_path):
+    attempts = []
+
+    async def flaky(records):
+        attempts.append([r.entry_id for r in records])
+        if len(attempts) < 3:
+            return [{"ok": False, "error": "timeout"} for _ in records]
+        return [{"ok": True} for _ in records]
+
+    ob = Outbox(flaky, directory=str(tmp_path), retry_base=0.001)
+    await ob.append("a", "x")
+    await _until(lambda: ob.acked_seq == 1)
+    assert attempts == [["a"], ["a"], ["a"]]
+    assert ob.ship_failures == 2
+    await ob.close()
+
+
+def test_torn_tail_is_truncated_on_open(tmp_path):
+    async def write():
+        ob = Outbox(_ok([]), directory=str(tmp_path), retry_base=60)
+        ob._ship = lambda records: asyncio.sleep(3600)
+        await ob.append("a", "x")
+        await ob.append("b", b"\xce\x01binary")
+        await ob.close()
+
+    asyncio.run(write())
+    (seg,) = [p for p in tmp_path.iterdir() if p.name.startswith("seg-")]
+    with open(seg, "ab") as f:
+        f.write(b"\x00\x00\x00\x40garbage")
+    ob = Outbox(_ok([]), directory=str(tmp_path)).open()
+    assert [r.entry_id for r in ob._unshipped] == ["a", "b"]
+    assert [r.payload for r in ob._unshipped] == ["x", b"\xce\x01binary"]
+    assert read_segment(str(seg))[1] == os.path.getsize(seg)
+
+
+@pytest.mark.asyncio
+async def test_acknowledged_segments_are_compacted(tmp_path):
+    ob = Outbox(_ok([]), directory=str(tmp_path), segment_bytes=64)
+    for i in range(6):
+        await ob.append(f"e{i}", "payload-" + "x" * 40)
+    await _until(lambda: ob.acked_seq == 6)
+    segs = [p for p in tmp_path.iterdir() if p.name.startswith("seg-")]
+    assert len(segs) == 1  # only the active segment remains
+    assert ob.compacted >= 1
+    await ob.close()
+
+
+@pytest.mark.asyncio
+async def test_individually_rejected_record_does_not_block_the_outbox(tmp_path):
+    attempts = []
+
+    async def reject(records):
+        attempts.append([r.entry_id for r in records])
+        return [{"ok": False, "rejected": True, "error": "malformed record"} for _ in records]
+
+    ob = Outbox(reject, directory=str(tmp_path), retry_base=0.001)
+    await ob.append("bad", b"\xce\xff")
+    await _until(lambda: ob.acked_seq == 1)
+    assert attempts == [["bad"]]
+    assert ob.rejected == 1 and ob.ship_failures == 0
+    await ob.close()
+
+
+def test_failed_write_does_not_strand_later_records_behind_a_torn_frame(tmp_path):
+    async def write():
+        ob = Outbox(_ok([]), directory=str(tmp_path), retry_base=60)
+        ob._ship = lambda records: asyncio.sleep(3600)
+        await ob.append("a", "x")
+        real = ob._file
+
+        class DiskFull:
+            def write(self, data):
+                real.write(data[:7])
+                real.flush()
+                raise OSError("no space left on device")
+
+            def __getattr__(self, name):
+                return getattr(real, name)
+
+        ob._file = DiskFull()
+        with pytest.raises(OSError):
+            await ob.append("b", "y")
+        await ob.append("c", "z")
+        await ob.close()
+
+    asyncio.run(write())
+    ob = Outbox(_ok([]), directory=str(tmp_path)).open()
+    assert [r.entry_id for r in ob._unshipped] == ["a", "c"]
@@ -1,11 +1,20 @@
+import asyncio
 import json
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, AsyncMock
 
+import httpx
 import pytest
 
 import price_agent as pa
 
 
+@pytest.fixture(autouse=True)
+def _clear_price_cache():
+    pa.price_cache.clear()
+    yield
+    pa.price_cache.clear()
+
+
 def test_get_price_success(monkeypatch):
     fake_json = {"bitcoin": {"usd": 65000}}
 
@@ -13,14 +22,57 @@ def test_get_price_success(monkeypatch):
     mock_resp.json.return_value = fake_json
     mock_resp.raise_for_status.return_value = None
 
-    with patch("price_agent.requests.get", return_value=mock_resp) as p:
+    with patch("price_agent.httpx.AsyncClient.get", new=AsyncMock(return_value=mock_resp)) as p:
         s = pa.get_price("bitcoin")
         assert s.startswith("$")
         assert "65000" in s.replace(",", "")
 
 
 def test_get_price_failure(monkeypatch):
-    # Simulate requests raising an exception
-    with patch("price_agent.requests.get", side_effect=Exception("boom")):
+    # Simulate the HTTP client raising an exception
+    with patch("price_agent.httpx.AsyncClient.get", new=AsyncMock(side_effect=Exception("boom"))):
         s = pa.get_price("bitcoin")
         assert s == "unknown"
+
+
+@pytest.mark.asyncio
+async def test_price_client_enforces_deadline():
+    async def slow(request):
+        await asyncio.sleep(1)
+        return httpx.Response(200, json={"bitcoin": {"usd": 1}})
+
+    async with pa.PriceClient(transport=httpx.MockTransport(slow)) as client:
+        assert await client.get_price("btc", timeout=0.05) == "unknown"
+
+
+@pytest.mark.asyncio
+async def test_get_client_is_shared_within_loop():
+    try:
+        assert pa.get_client() is pa.get_client()
+    finally:
+        await pa.close_client()
+
+
+@pytest.mark.asyncio
+async def test_get_prices_batches_symbols_into_one_request(monkeypatch):
+    requests_seen = []
+
+    async def handler(request):
+        requests_seen.append(request.url.params)
+        return httpx.Response(200, json={"bitcoin": {"usd": 65000, "eur": 60000}, "ethereum": {"usd": 3000}})
+
+    client = pa.PriceClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(pa, "get_client", lambda: client)
+    try:
+        quotes = await pa.get_prices(["btc", "eth", "bitcoin"], ["usd", "eur"])
+    finally:
+        await client.aclose()
+
+    assert len(requests_seen) == 1
+    assert requests_seen[0]["ids"] == "bitcoin,ethereum"
+    assert [(q.symbol, q.currency, q.price) for q in quotes] == [
+        ("btc", "usd", 65000.0), ("btc", "eur", 60000.0),
+        ("eth", "usd", 3000.0), ("eth", "eur", None),
+        ("bitcoin", "usd", 65000.0), ("bitcoin", "eur", 60000.0),
+    ]
+    assert quotes[0].fetched_at is not None
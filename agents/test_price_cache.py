@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from price_cache import PriceCache, parse_ttl_overrides
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_fetch():
+    cache = PriceCache(ttl=10)
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 100.0
+
+    results = await asyncio.gather(*[cache.get_or_fetch("bitcoin", "usd", fetch) for _ in range(50)])
+    assert results == [100.0] * 50
+    assert calls == 1
+    assert cache.stats()["coalesced"] == 49
+    assert await cache.get_or_fetch("bitcoin", "usd", fetch) == 100.0
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate_serves_old_value_and_refreshes():
+    clock = FakeClock()
+    cache = PriceCache(ttl=5, stale_ttl=30, clock=clock)
+    cache.put("bitcoin", "usd", 1.0)
+    clock.now = 10
+
+    async def fetch():
+        return 2.0
+
+    assert await cache.get_or_fetch("bitcoin", "usd", fetch) == 1.0
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert cache.peek("bitcoin", "usd")[0] == 2.0
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_lru_eviction_and_ttl_overrides():
+    cache = PriceCache(max_entries=2, ttl_overrides=parse_ttl_overrides("bitcoin:usd=3,ethereum=20"))
+    cache.put("a", "usd", 1.0)
+    cache.put("b", "usd", 2.0)
+    cache.put("c", "usd", 3.0)
+    assert cache.peek("a", "usd") == (None, None)
+    assert cache.stats()["evictions"] == 1
+    assert cache.ttl_for("bitcoin", "usd") == 3
+    assert cache.ttl_for("ethereum", "eur") == 20
+    assert cache.ttl_for("solana", "usd") == cache.ttl
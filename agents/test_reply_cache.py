@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from reply_cache import ReplyCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_per_intent_ttl_and_coalescing():
+    clock = FakeClock()
+    cache = ReplyCache(ttls={"price": 5, "news": 300}, clock=clock)
+    calls = []
+
+    async def compute(tag):
+        calls.append(tag)
+        await asyncio.sleep(0.01)
+        return f"reply-{tag}", True
+
+    out = await asyncio.gather(*[cache.get_or_compute("price", ["bitcoin"], lambda: compute("p")) for _ in range(10)])
+    assert out == ["reply-p"] * 10 and calls == ["p"]
+    assert cache.stats()["coalesced"] == 9
+    await cache.get_or_compute("news", ["bitcoin"], lambda: compute("n"))
+
+    clock.now = 60
+    await cache.get_or_compute("price", ["bitcoin"], lambda: compute("p2"))
+    await cache.get_or_compute("news", ["bitcoin"], lambda: compute("n2"))
+    assert calls == ["p", "n", "p2"]
+
+
+@pytest.mark.asyncio
+async def test_uncacheable_replies_are_not_stored():
+    cache = ReplyCache()
+
+    async def failing():
+        return "unknown", False
+
+    await cache.get_or_compute("price", ["x"], failing)
+    assert cache.stats()["size"] == 0
+
+
+def test_byte_bound_evicts_lru():
+    cache = ReplyCache(max_bytes=10)
+    cache._store(("price", ("a",)), "12345")
+    cache._store(("price", ("b",)), "12345")
+    cache._store(("price", ("c",)), "12345")
+    assert cache.get(("price", ("a",))) is None
+    assert cache.stats()["bytes"] == 10
@@ -0,0 +1,55 @@
+import os
+import time
+
+import runtime_config
+
+
+def test_snapshot_is_cached_until_reload(monkeypatch, tmp_path):
+    token_file = tmp_path / "token"
+    token_file.write_text("first\n")
+    monkeypatch.setenv("SCHEDULE_TOKEN_FILE", str(token_file))
+    monkeypatch.setenv("ICP_NETWORK_URL", "")
+    monkeypatch.setenv("ICP_REPLICA_URL", "http://replica")
+
+    cfg = runtime_config.reload()
+    assert cfg.schedule_token == "first"
+    # explicit empty ICP_NETWORK_URL wins over ICP_REPLICA_URL (dry-run)
+    assert cfg.icp_network_url is None
+
+    monkeypatch.setenv("ICP_NETWORK_URL", "http://local")
+    token_file.write_text("second")
+    assert runtime_config.current() is cfg
+
+    cfg2 = runtime_config.reload()
+    assert cfg2.schedule_token == "second"
+    assert cfg2.icp_network_url == "http://local"
+    assert "second" not in str(cfg2.summary())
+
+
+def test_env_token_used_when_file_missing(monkeypatch, tmp_path):
+    monkeypatch.setenv("SCHEDULE_TOKEN_FILE", str(tmp_path / "absent"))
+    monkeypatch.setenv("SCHEDULE_TOKEN", "from-env")
+    cfg = runtime_config.reload()
+    assert cfg.schedule_token == "from-env"
+    assert cfg.token_file_signature is None
+
+
+def test_watcher_reloads_when_token_file_changes(monkeypatch, tmp_path):
+    token_file = tmp_path / "token"
+    token_file.write_text("old")
+    monkeypatch.setenv("SCHEDULE_TOKEN_FILE", str(token_file))
+    runtime_config.reload()
+
+    watcher = runtime_config.ConfigWatcher(interval=0.01)
+    watcher.start()
+    try:
+        token_file.write_text("rotated-by-hand")
+        st = token_file.stat()
+        os.utime(token_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        deadline = time.monotonic() + 2
+        while runtime_config.current().schedule_token != "rotated-by-hand" and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        watcher.stop()
+        watcher.join(1)
+    assert runtime_config.current().schedule_token == "rotated-by-hand"
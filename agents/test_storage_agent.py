@@ -1,7 +1,10 @@
 import asyncio
+import types
 from unittest.mock import patch, AsyncMock
 import pytest
 
+from entry_codec import decode_record, encode_record
+
 # We will import the module under test and patch ic-py related calls
 import storage_agent as sa
 
@@ -29,3 +32,247 @@ def test_storage_health_helper():
     h = sa.health()
     assert "canister" in h
     assert "icpy" in h
+
+
+@pytest.mark.asyncio
+async def test_concurrent_store_chat_is_one_batched_canister_call(monkeypatch, ctx):
+    monkeypatch.setenv("ICP_NETWORK_URL", "http://replica.local")
+    monkeypatch.setenv("CANISTER_ID", "aaaaa-aa")
+    monkeypatch.setattr(sa, "Client", object)
+    monkeypatch.setattr(sa, "STORAGE_OUTBOX", False)
+    monkeypatch.setattr(sa, "STORAGE_BATCH_MAX", 3)
+    monkeypatch.setattr(sa, "chat_batcher", sa.WriteBatcher(sa._flush_chat_batch, max_batch=3, window=60))
+
+    calls = []
+
+    async def fake_many(entries):
+        calls.append([entry_id for entry_id, _ in entries])
+        return [{"ok": entry_id != "e2", "attempts": 1, "error": "rejected" if entry_id == "e2" else None} for entry_id, _ in entries]
+
+    monkeypatch.setattr(sa, "call_add_chat_entries_direct", fake_many)
+
+    msgs = [sa.StoreChat(entry_id=f"e{i}", entry=f"text {i}") for i in range(1, 4)]
+    results = await asyncio.gather(*[sa.handle_store_chat(ctx, "test", m) for m in msgs])
+    assert calls == [["e1", "e2", "e3"]]
+    assert [r["ok"] for r in results] == [True, False, True]
+    assert [r["entry_id"] for r in results] == ["e1", "e2", "e3"]
+
+
+def test_entry_outcomes_map_canister_results():
+    entries = [("a", "x"), ("b", "y")]
+    reply = [{"type": "vec", "value": [{"entry_id": "a", "ok": True, "error": []}, {"entry_id": "b", "ok": False, "error": ["dup"]}]}]
+    out = sa._entry_outcomes(reply, entries, attempts=1)
+    assert out[0]["ok"] is True
+    assert out[1] == {"ok": False, "rejected": True, "error": "dup", "attempts": 1}
+
+
+@pytest.mark.asyncio
+async def test_direct_calls_reuse_one_icp_connection(monkeypatch):
+    from icp_connection import ICPConnectionManager
+
+    monkeypatch.setenv("ICP_NETWORK_URL", "http://replica.local")
+    monkeypatch.setenv("CANISTER_ID", "aaaaa-aa")
+    monkeypatch.setattr(sa, "Client", object)
+    monkeypatch.setattr(sa, "ICAgent", object)
+    monkeypatch.setattr(sa, "encode", lambda *a, **k: b"arg")
+
+    builds = []
+
+    class FakeAgent:
+        def update_raw(self, canister_id, method_name, arg, **kwargs):
+            return {"canister": canister_id, "method": method_name}
+
+    def factory(url, identity_path):
+        builds.append(url)
+        return object(), object(), FakeAgent()
+
+    manager = ICPConnectionManager(max_workers=1, factory=factory)
+    monkeypatch.setattr(sa, "get_icp_manager", lambda: manager)
+
+    for i in range(3):
+        res = await sa.call_add_chat_entry_direct(f"id-{i}", "payload")
+        assert res["ok"] is True and res["result"]["canister"] == "aaaaa-aa"
+    assert builds == ["http://replica.local"]
+    manager.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_store_chat_appends_to_outbox_and_ships_in_background(monkeypatch, tmp_path, ctx):
+    from outbox import Outbox
+
+    monkeypatch.setenv("ICP_NETWORK_URL", "http://replica.local")
+    monkeypatch.setattr(sa, "Client", object)
+    shipped = asyncio.Event()
+    calls, payloads = [], []
+
+    async def fake_many(entries):
+        calls.append([entry_id for entry_id, _ in entries])
+        payloads.extend(payload for _, payload in entries)
+        shipped.set()
+        return [{"ok": True, "attempts": 1} for _ in entries]
+
+    monkeypatch.setattr(sa, "call_add_chat_entries_direct", fake_many)
+    monkeypatch.setattr(sa, "_outbox", Outbox(sa._ship_outbox, directory=str(tmp_path)))
+
+    res = await sa.handle_store_chat(ctx, "test", sa.StoreChat(entry_id="e1", entry="hello"))
+    assert res["queued"] is True and res["seq"] == 1
+    await asyncio.wait_for(shipped.wait(), 2)
+    assert calls == [["e1"]]
+    # compact binary record survives the outbox round trip
+    assert decode_record(payloads[0])["entry"] == "hello"
+    await sa._outbox.close()
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_canister_calls_fast(monkeypatch):
+    from circuit_breaker import CircuitBreaker
+    from icp_connection import ICPConnectionManager
+
+    monkeypatch.setenv("ICP_NETWORK_URL", "http://replica.local")
+    monkeypatch.setenv("CANISTER_ID", "aaaaa-aa")
+    monkeypatch.setattr(sa, "Client", object)
+    monkeypatch.setattr(sa, "ICAgent", object)
+    monkeypatch.setattr(sa, "encode", lambda *a, **k: b"arg")
+    monkeypatch.setattr(sa, "STORAGE_BACKOFF_BASE", 0)
+    breaker = CircuitBreaker("canister", failure_rate=0.5, min_calls=2, window=2, open_seconds=60)
+    monkeypatch.setattr(sa, "canister_breaker", breaker)
+
+    calls = []
+
+    class DownAgent:
+        def update_raw(self, **kwargs):
+            calls.append(kwargs["method_name"])
+            raise ConnectionError("replica down")
+
+    manager = ICPConnectionManager(max_workers=1, factory=lambda url, ident: (None, None, DownAgent()))
+    monkeypatch.setattr(sa, "get_icp_manager", lambda: manager)
+
+    first = await sa.call_add_chat_entry_direct("id-1", "payload")
+    assert first["ok"] is False and first["circuit_open"] is True
+    assert len(calls) == 2  # tripped after min_calls instead of all retries
+
+    second = await sa.call_add_chat_entry_direct("id-2", "payload")
+    assert second["circuit_open"] is True and second["attempts"] == 0
+    assert len(calls) == 2
+    assert sa.health()["circuit"]["state"] == "open"
+    manager.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_duplicate_store_chat_returns_original_without_resigning(monkeypatch, ctx):
+    monkeypatch.setenv("ICP_NETWORK_URL", "")
+    signed = []
+    monkeypatch.setattr(sa, "sign_hex", lambda h: signed.append(h) or "sig")
+
+    first = await sa.handle_store_chat(ctx, "test", sa.StoreChat(entry_id="a1", entry="Scheduled price btc: 1"))
+    retry = await sa.handle_store_chat(ctx, "test", sa.StoreChat(entry_id="a1", entry="Scheduled price btc: 1"))
+    no_id = await sa.handle_store_chat(ctx, "test", sa.StoreChat(entry_id=None, entry="Scheduled price btc: 1"))
+    other_id = await sa.handle_store_chat(ctx, "test", sa.StoreChat(entry_id="a2", entry="Scheduled price btc: 1"))
+    assert first["content_hash"] and first.get("duplicate") is None
+    assert retry["duplicate"] is True and retry["entry_id"] == "a1"
+    assert no_id["duplicate"] is True and no_id["entry_id"] == "a1"
+    # an explicit entry_id is stored under that id even for identical text
+    assert other_id.get("duplicate") is None and other_id["entry_id"] == "a2"
+    assert len(signed) == 2
+    assert sa.health()["dedup"]["exact_hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_accepted_entries_are_mirrored_locally(monkeypatch, tmp_path, ctx):
+    from entry_store import EntryStore
+
+    monkeypatch.setenv("ICP_NETWORK_URL", "")
+    store = EntryStore(str(tmp_path / "entries.db"))
+    monkeypatch.setattr(sa, "get_entry_store", lambda: store)
+
+    await sa.handle_store_chat(ctx, "test", sa.StoreChat(entry_id="m1", entry="Q: harga eth A: 1"))
+    (item,) = store.query(q="eth")["items"]
+    assert item["entry_id"] == "m1" and item["status"] == "dry_run" and item["content_hash"]
+
+
+@pytest.mark.asyncio
+async def test_mixed_text_and_binary_batch_uses_one_call_per_method(monkeypatch):
+    monkeypatch.setenv("ICP_NETWORK_URL", "http://replica.local")
+    monkeypatch.setenv("CANISTER_ID", "aaaaa-aa")
+    monkeypatch.setattr(sa, "Client", object)
+    monkeypatch.setattr(sa, "ICAgent", object)
+    monkeypatch.setattr(sa, "Types", types.SimpleNamespace(Record=lambda f: f, Vec=lambda t: t, Text="text", Bool="bool", Opt=lambda t: t))
+    methods = []
+
+    async def fake_update(cfg, method, encode_args, **kwargs):
+        methods.append(method)
+        return {"ok": True, "result": None, "attempts": 1}
+
+    monkeypatch.setattr(sa, "_update_with_retries", fake_update)
+    record = encode_record("b", "00" * 32, None)
+    out = await sa.call_add_chat_entries_direct([("t1", "a"), ("r1", record), ("t2", "c")])
+    assert sorted(methods) == ["add_chat_entries", "add_chat_records"]
+    assert [o["ok"] for o in out] == [True, True, True]
+
+
+@pytest.mark.asyncio
+async def test_batch_signing_signs_one_merkle_root_per_batch(monkeypatch, ctx):
+    import merkle
+
+    calls = []
+
+    def fake_sign_batch(hashes):
+        calls.append(list(hashes))
+        root, proofs = merkle.build(hashes)
+        return {"root": root, "signature": "ab" * 70, "proofs": proofs}
+
+    monkeypatch.setattr(sa, "STORAGE_SIGNING", "batch")
+    monkeypatch.setattr(sa, "sign_batch_hex", fake_sign_batch)
+    monkeypatch.setattr(sa, "STORAGE_MIRROR", False)
+
+    msgs = [sa.StoreChat(entry_id=f"s{i}", entry=f"entry {i}") for i in range(3)]
+    results = await asyncio.gather(*[sa.handle_store_chat(ctx, "test", m) for m in msgs])
+    assert len(calls) == 1 and len(calls[0]) == 3
+    roots = {r["merkle_root"] for r in results}
+    assert len(roots) == 1
+    for r in results:
+        assert r["signature"] == "ab" * 70
+        assert merkle.verify_proof(r["content_hash"], r["proof"], r["merkle_root"])
+    payload = decode_record(sa.build_payload("x", results[0]["content_hash"], results[0]["signature"], results[0]["merkle_root"], results[0]["proof"]))
+    assert payload["proof"] == results[0]["proof"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["entry", "batch"])
+async def test_store_chat_signs_with_the_real_provenance_signer(monkeypatch, mode, ctx):
+    import provenance
+
+    monkeypatch.setenv("ICP_NETWORK_URL", "")
+    monkeypatch.setattr(sa, "STORAGE_SIGNING", mode)
+    monkeypatch.setattr(sa, "STORAGE_MIRROR", False)
+
+    res = await sa.handle_store_chat(ctx, "test", sa.StoreChat(entry_id=f"real-{mode}", entry=f"signed in {mode} mode"))
+    assert res["signature"]
+    if mode == "batch":
+        assert provenance.verify_proof_hex(res["content_hash"], res["signature"], res["merkle_root"], res["proof"])
+    else:
+        assert provenance.verify_hex(res["content_hash"], res["signature"])
+
+
+@pytest.mark.asyncio
+async def test_probable_duplicates_are_confirmed_against_the_mirror(monkeypatch, tmp_path, ctx):
+    from dedup import DedupIndex
+    from entry_store import EntryStore
+
+    monkeypatch.setenv("ICP_NETWORK_URL", "")
+    store = EntryStore(str(tmp_path / "entries.db"))
+    monkeypatch.setattr(sa, "get_entry_store", lambda: store)
+    monkeypatch.setattr(sa, "dedup_index", DedupIndex(lru_size=1, bloom_capacity=100))
+
+    await sa.handle_store_chat(ctx, "test", sa.StoreChat(entry_id="p1", entry="first"))
+    await sa.handle_store_chat(ctx, "test", sa.StoreChat(entry_id="p2", entry="second"))
+    # p1 left the exact LRU; the bloom hit is confirmed by the mirrored row
+    retry = await sa.handle_store_chat(ctx, "test", sa.StoreChat(entry_id="p1", entry="first"))
+    assert retry["duplicate"] is True and retry["entry_id"] == "p1" and retry["content_hash"]
+
+    # a bloom false positive for an entry that was never stored is written
+    marker = {"ok": True, "duplicate": True, "probable": True, "entry_id": "p3"}
+    monkeypatch.setattr(sa.dedup_index, "lookup", lambda entry_id, content_hash: marker)
+    fresh = await sa.handle_store_chat(ctx, "test", sa.StoreChat(entry_id="p3", entry="third"))
+    assert fresh.get("duplicate") is None and fresh["ok"] is True
+    assert store.find("p3")["text"] == "third"
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from storage_queue import QueueFullError, WriteBehindQueue
+
+
+@pytest.mark.asyncio
+async def test_submit_returns_before_delivery_and_drain_flushes():
+    delivered = []
+    gate = asyncio.Event()
+
+    async def send(msg):
+        await gate.wait()
+        delivered.append(msg)
+
+    q = WriteBehindQueue(send, maxsize=10, workers=2)
+    for i in range(5):
+        await q.submit(i)
+    assert delivered == []
+    gate.set()
+    assert await q.drain(timeout=1) is True
+    assert sorted(delivered) == [0, 1, 2, 3, 4]
+    assert q.stats()["delivered"] == 5
+
+
+@pytest.mark.asyncio
+async def test_reject_and_drop_oldest_policies():
+    gate = asyncio.Event()
+    delivered = []
+
+    async def send(msg):
+        await gate.wait()
+        delivered.append(msg)
+
+    rejecting = WriteBehindQueue(send, maxsize=1, workers=1, policy="reject")
+    await rejecting.submit("a")
+    await asyncio.sleep(0)  # worker takes "a"
+    await rejecting.submit("b")
+    with pytest.raises(QueueFullError):
+        await rejecting.submit("c")
+
+    dropping = WriteBehindQueue(send, maxsize=1, workers=1, policy="drop-oldest")
+    await dropping.submit("x")
+    await asyncio.sleep(0)
+    await dropping.submit("y")
+    await dropping.submit("z")
+    assert dropping.stats()["dropped"] == 1
+
+    gate.set()
+    await rejecting.drain(timeout=1)
+    await dropping.drain(timeout=1)
+    assert sorted(delivered) == ["a", "b", "x", "z"]
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        WriteBehindQueue(lambda m: None, policy="spill")
+
+
+@pytest.mark.asyncio
+async def test_batch_items_are_counted_per_message():
+    async def send(batch):
+        return [{"ok": True}, {"ok": False, "error": "rejected"}, ConnectionError("reset")]
+
+    q = WriteBehindQueue(send, maxsize=10, workers=1)
+    await q.submit(["a", "b", "c"])
+    assert await q.drain(timeout=1) is True
+    stats = q.stats()
+    assert (stats["enqueued"], stats["delivered"], stats["failed"]) == (3, 1, 2)
@@ -0,0 +1,63 @@
+import json
+import types
+
+import httpx
+import pytest
+
+from storage_transport import HttpTransport, InProcessTransport, TransportError, UAgentsTransport, create_transport
+from uamodels import StoreChat
+
+
+@pytest.mark.asyncio
+async def test_http_transport_send_and_batch():
+    seen = []
+
+    async def handler(request):
+        body = json.loads(request.content)
+        seen.append((request.url.path, body))
+        if request.url.path.endswith("/batch"):
+            return httpx.Response(202, json={"results": [{"ok": True} for _ in body["messages"]]})
+        return httpx.Response(202, json={"ok": True})
+
+    t = HttpTransport(submit_url="http://storage/submit", batch_url="http://storage/submit/batch", transport=httpx.MockTransport(handler))
+    try:
+        assert await t.send(StoreChat(entry_id="1", entry="a")) is True
+        results = await t.send_many([StoreChat(entry_id=str(i), entry="x") for i in range(3)])
+    finally:
+        await t.aclose()
+    assert results == [{"ok": True}] * 3
+    assert [path for path, _ in seen] == ["/submit", "/submit/batch"]
+    assert seen[0][1]["message"] == {"entry_id": "1", "entry": "a"}
+    assert len(seen[1][1]["messages"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_http_transport_send_raises_when_ingress_reports_failure():
+    async def handler(request):
+        return httpx.Response(202, json={"ok": False, "entry_id": "1", "error": "CANISTER_ID not set"})
+
+    t = HttpTransport(submit_url="http://storage/submit", transport=httpx.MockTransport(handler))
+    try:
+        with pytest.raises(TransportError, match="CANISTER_ID not set"):
+            await t.send(StoreChat(entry_id="1", entry="a"))
+    finally:
+        await t.aclose()
+
+
+@pytest.mark.asyncio
+async def test_inprocess_transport_calls_handler_once_resolved():
+    calls = []
+
+    async def handle_store_chat(ctx, sender, msg):
+        calls.append((sender, msg.entry_id))
+        return {"ok": True}
+
+    t = InProcessTransport(module=types.SimpleNamespace(handle_store_chat=handle_store_chat))
+    assert await t.send(StoreChat(entry_id="e1", entry="x")) == {"ok": True}
+    assert calls == [("orchestrator_simple", "e1")]
+
+
+def test_auto_prefers_uagents_then_falls_back():
+    assert isinstance(create_transport("auto"), UAgentsTransport)
+    with pytest.raises(ValueError):
+        create_transport("carrier-pigeon")
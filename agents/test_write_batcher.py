@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from write_batcher import WriteBatcher
+
+
+@pytest.mark.asyncio
+async def test_flushes_when_batch_is_full():
+    calls = []
+
+    async def flush(items):
+        calls.append(list(items))
+        return [f"ok:{i}" for i in items]
+
+    b = WriteBatcher(flush, max_batch=3, window=60)
+    results = await asyncio.gather(*[b.submit(i) for i in range(3)])
+    assert results == ["ok:0", "ok:1", "ok:2"]
+    assert calls == [[0, 1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_flushes_partial_batch_after_window():
+    calls = []
+
+    async def flush(items):
+        calls.append(list(items))
+        return list(items)
+
+    b = WriteBatcher(flush, max_batch=100, window=0.01)
+    assert await asyncio.gather(b.submit("a"), b.submit("b")) == ["a", "b"]
+    assert calls == [["a", "b"]]
+    assert b.stats()["batches"] == 1
+
+
+@pytest.mark.asyncio
+async def test_outcomes_are_reported_per_item():
+    async def flush(items):
+        return [ValueError(i) if i == "bad" else i for i in items]
+
+    b = WriteBatcher(flush, max_batch=2, window=60)
+    good, bad = await asyncio.gather(b.submit("good"), b.submit("bad"), return_exceptions=True)
+    assert good == "good"
+    assert isinstance(bad, ValueError)
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_fails_every_caller():
+    async def flush(items):
+        raise RuntimeError("canister down")
+
+    b = WriteBatcher(flush, max_batch=2, window=60)
+    results = await asyncio.gather(b.submit(1), b.submit(2), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert b.failed_batches == 1
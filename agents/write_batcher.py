@@ -0,0 +1,109 @@
+"""Size/time-window batching of individual writes into one bulk call.
+
+Callers `await batcher.submit(item)` and get back their own item's result.
+Items are accumulated until `max_batch` are pending or `window` seconds have
+passed since the first one arrived, then handed to the flush coroutine as a
+single list. The flush must return one result per item, in order; a result
+that is an exception is raised in that item's caller only, and if the flush
+itself raises every caller in the batch sees the error.
+
+Usage:
+  batcher = WriteBatcher(write_many, max_batch=50, window=0.2)
+  result = await batcher.submit(("entry-id", "payload"))
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger("write_batcher")
+
+Flush = Callable[[list], Awaitable[list]]
+
+
+class WriteBatcher:
+    def __init__(self, flush: Flush, max_batch: int = 50, window: float = 0.2):
+        self._flush = flush
+        self.max_batch = max(1, max_batch)
+        self.window = window
+        self._pending: list[tuple[Any, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._loop = None
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+        self.failed_batches = 0
+
+    def _ensure_loop(self, loop):
+        # pending futures and timers belong to the loop that created them
+        if self._loop is loop:
+            return
+        if self._pending:
+            logger.warning("Event loop changed; abandoning %d pending batched writes", len(self._pending))
+        self._loop = loop
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, item: Any) -> Any:
+        """Queue `item` for the next batch and wait for its own result."""
+        loop = asyncio.get_running_loop()
+        self._ensure_loop(loop)
+        fut = loop.create_future()
+        self._pending.append((item, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush_now)
+        return await fut
+
+    def _flush_now(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = self._loop.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list):
+        self.batches += 1
+        self.items += len(batch)
+        self.largest = max(self.largest, len(batch))
+        try:
+            results = await self._flush([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"batch flush returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            self.failed_batches += 1
+            logger.exception("Batched write of %d items failed", len(batch))
+            results = [e] * len(batch)
+        for (_, fut), res in zip(batch, results):
+            if fut.done():
+                continue
+            if isinstance(res, BaseException):
+                fut.set_exception(res)
+            else:
+                fut.set_result(res)
+
+    async def flush(self):
+        """Send whatever is pending now and wait for every in-flight batch."""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        self._flush_now()
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch": self.max_batch,
+            "window": self.window,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "items": self.items,
+            "largest": self.largest,
+            "avg_batch": self.items / self.batches if self.batches else 0.0,
+            "failed_batches": self.failed_batches,
+        }
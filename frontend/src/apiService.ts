@@ -4,6 +4,14 @@ export type QueryResponse = {
   success: boolean
   reply?: string
   error?: string
+  entryId?: string
+  // true when partial answers were already delivered through onPartial
+  streamed?: boolean
+}
+
+export type PartialAnswer = {
+  intent: string
+  reply: string
 }
 
 function randomPrice(base = 10000) {
@@ -37,7 +45,51 @@ async function mockResponse(text: string): Promise<QueryResponse> {
   return { success: true, reply: `Mock reply: saya mengerti — "${text}"` }
 }
 
-export async function sendQuery(text: string): Promise<QueryResponse> {
+type SseEvent = { event: string; data: string }
+
+function parseSseBlock(block: string): SseEvent | null {
+  let event = 'message'
+  const data: string[] = []
+  for (const line of block.split('\n')) {
+    if (line.startsWith('event:')) event = line.slice(6).trim()
+    else if (line.startsWith('data:')) data.push(line.slice(5).trimStart())
+  }
+  return data.length ? { event, data: data.join('\n') } : null
+}
+
+// POST /query/stream and hand each partial answer to onPartial as soon as it arrives.
+export async function streamQuery(text: string, onPartial: (part: PartialAnswer) => void): Promise<QueryResponse> {
+  const res = await fetch(`${DEFAULT_ORCHESTRATOR}/query/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+    body: JSON.stringify({ text }),
+  })
+  if (!res.ok || !res.body) throw new Error(`stream failed: HTTP ${res.status}`)
+
+  const reader = res.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  for (;;) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    let sep = buffer.indexOf('\n\n')
+    while (sep !== -1) {
+      const evt = parseSseBlock(buffer.slice(0, sep))
+      buffer = buffer.slice(sep + 2)
+      sep = buffer.indexOf('\n\n')
+      if (!evt) continue
+      const payload = JSON.parse(evt.data)
+      if (evt.event === 'done') {
+        return { success: true, reply: payload.reply, entryId: payload.entry_id, streamed: true }
+      }
+      onPartial({ intent: payload.intent ?? evt.event, reply: payload.reply })
+    }
+  }
+  throw new Error('stream ended without a done event')
+}
+
+export async function sendQuery(text: string, onPartial?: (part: PartialAnswer) => void): Promise<QueryResponse> {
   // Priority: runtime localStorage toggle (useMockServer), then VITE_USE_MOCK env var
   try {
     const runtimeFlag = typeof window !== 'undefined' && window.localStorage?.getItem('useMockServer')
@@ -46,6 +98,19 @@ export async function sendQuery(text: string): Promise<QueryResponse> {
 
     if (useMockRuntime || useMockEnv) return mockResponse(text)
 
+    if (onPartial) {
+      let delivered = false
+      try {
+        return await streamQuery(text, (part) => {
+          delivered = true
+          onPartial(part)
+        })
+      } catch (e) {
+        // fall through to the single-shot endpoint unless the user already saw partial answers
+        if (delivered) return { success: false, error: String(e), streamed: true }
+      }
+    }
+
     const url = `${DEFAULT_ORCHESTRATOR}/query`
     const res = await fetch(url, {
       method: 'POST',
@@ -14,8 +14,14 @@ export default function ChatInput() {
     setValue('')
     setLoading(true)
 
-    const res = await sendQuery(userText)
+    let n = 0
+    const res = await sendQuery(userText, (part) => {
+      // show each partial answer as soon as the orchestrator streams it
+      setLoading(false)
+      addMessage({ id: `${Date.now()}-${++n}`, text: part.reply, sender: 'pluto' })
+    })
     setLoading(false)
+    if (res.streamed && res.success) return
     if (res.success) {
       addMessage({ id: String(Date.now() + 1), text: res.reply ?? 'No reply', sender: 'pluto' })
     } else {
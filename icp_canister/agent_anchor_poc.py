@@ -4,7 +4,8 @@ POC: Agent -> ICP anchor flow
 This script uses the local AgentVerse POC client to generate summaries for a
 list of queries, computes content hashes (sha256), signs them using the
 provenance HMAC POC, appends the hex hashes to `data/hashes.json`, and then
-invokes `anchor_job.py` to compute the Merkle root and optionally call the
+runs the in-process anchoring service (`agents/anchoring.py`, the same one
+behind `anchor_job.py`) to compute the Merkle root and optionally call the
 ICP canister if `ICP_REPLICA_URL` and `CANISTER_ID` are set.
 
 Usage:
@@ -20,10 +21,10 @@ from pathlib import Path
 from datetime import datetime
 import hashlib
 import os
-import subprocess
 
 from agents.agentverse import AgentVerseClient
 from agents.provenance import sign_hex
+from agents.anchoring import AnchorService
 
 DATA_DIR = Path(__file__).parent / "data"
 HASHES_FILE = DATA_DIR / "hashes.json"
@@ -52,11 +53,16 @@ def save_hashes(hashes: list[str]):
     HASHES_FILE.write_text(json.dumps(hashes, indent=2))
 
 def run_anchor_job():
-    print("Running anchor_job.py to compute merkle root...")
-    proc = subprocess.run(["python", str(Path(__file__).parent / "anchor_job.py"), str(HASHES_FILE)], capture_output=True, text=True)
-    print(proc.stdout)
-    if proc.returncode != 0:
-        print("anchor_job failed:", proc.stderr)
+    print("Anchoring merkle root of", HASHES_FILE)
+    try:
+        result = AnchorService().anchor(path=str(HASHES_FILE))
+    except (OSError, ValueError) as e:
+        print("anchor failed:", e)
+        return None
+    print(json.dumps(result, indent=2, default=str))
+    if not result["ok"]:
+        print("anchor failed:", result["canister"].get("error"))
+    return result
 
 def main():
     ensure_data_dir()